@@ -1 +1 @@
-__all__ = ["PGExtractor"]
+__all__ = ["ExtractResult", "PGExtractor", "PGExtractorOptions", "PGObject"]
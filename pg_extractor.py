@@ -1,19 +1,168 @@
 #!/usr/bin/env python3
 
 import argparse
+import configparser
+import contextlib
+import copy
 import errno
 import fileinput
+import hashlib
+import heapq
+import json
+import math
 import os
 import os.path
 import random
 import re
 import shutil
+import signal
+import socket
+import sqlite3
 import subprocess
 import sys
+import tarfile
 import tempfile
 import time
+from collections import OrderedDict
+from collections import namedtuple
+from collections.abc import Mapping
+from multiprocessing import Pipe
 from multiprocessing import Process
-from multiprocessing import ProcessError
+from multiprocessing.connection import wait as wait_connections
+import zipfile
+
+# Object types as they appear in a pg_restore -l list. The index in this tuple is the integer type code
+# stored in each PGObject. A PGObject of any other type stores the type string itself.
+OBJECT_TYPES = ("ACL", "AGGREGATE", "COMMENT", "CONSTRAINT", "DATABASE", "DEFAULT ACL", "DEFAULT"
+    , "DOMAIN", "EXTENSION", "FK CONSTRAINT", "FOREIGN TABLE", "FUNCTION"
+    , "INDEX ATTACH", "INDEX", "RULE", "SCHEMA", "SEQUENCE OWNED BY", "SEQUENCE SET", "SEQUENCE"
+    , "TABLE ATTACH", "TABLE DATA", "TABLE", "TRIGGER", "TYPE", "VIEW", "MATERIALIZED VIEW DATA", "MATERIALIZED VIEW"
+    , "SERVER", "USER MAPPING", "PROCEDURE")
+OBJECT_TYPE_CODES = dict((t, i) for i, t in enumerate(OBJECT_TYPES))
+
+# Result for each file extracted by PGExtractor.iter_extract()
+#   path: full path of the output file
+#   bytes: size of the file, None if it failed or is not known (role files added to an --output_archive)
+#   duration: seconds the extraction took
+#   error: None if extraction succeeded, otherwise the error message
+ExtractResult = namedtuple('ExtractResult', ['path', 'bytes', 'duration', 'error'])
+
+
+# Options that a --profiles profile can set. All others are shared by every profile of the run.
+PROFILE_OPTIONS = ["basedir", "hostnamedir", "dbnamedir", "nodbnamedir", "schemadir"
+    , "getall", "getschemata", "gettables", "getviews", "getfuncs", "gettypes", "getextensions", "getroles", "getdefaultprivs"
+    , "getservers", "getusermappings", "getsequences", "gettriggers", "getrules", "getdata", "Fc"
+    , "table_include", "table_include_file", "table_exclude", "table_exclude_file", "view_include", "view_include_file"
+    , "view_exclude", "view_exclude_file", "function_include_file", "function_exclude_file", "owner_include", "owner_include_file"
+    , "owner_exclude", "owner_exclude_file", "regex_include_file", "regex_exclude_file"
+    , "delete", "clean", "orreplace", "group_partitions", "remove_passwords", "data_chunk_size", "inserts", "column_inserts"
+    , "wait", "priority", "priority_file", "plan"]
+
+# Rate in bytes per second that --explain assumes each job extracts table data at
+EXPLAIN_DATA_RATE = 50 * 1024 * 1024
+
+# Object types extracted with pg_dump. All others are extracted with pg_restore.
+PGDUMP_TYPES = ["TABLE", "MATERIALIZED VIEW", "VIEW", "FOREIGN TABLE"]
+
+
+class PGObject(Mapping):
+    """
+    Compact, read-only record for a single object line from a pg_restore -l list.
+    Can be used the same as the dictionary objects build_main_object_list() used to return.
+    objdeps (a tuple of the dump ids this object depends on) is only set when the list was read with dependencies.
+    """
+    __slots__ = ('objid', 'typecode', 'objschema', 'objname', 'objbasename', 'objowner', 'objdeps', '_extra')
+    _core_keys = ('objid', 'objtype', 'objschema', 'objname', 'objbasename', 'objowner', 'objdeps')
+
+    def __init__(self, objid, objtype, objschema=None, objname=None, objbasename=None, objowner=None, **extra):
+        self.objid = objid
+        typecode = OBJECT_TYPE_CODES.get(objtype)
+        if typecode is None:
+            typecode = sys.intern(objtype)
+        self.typecode = typecode
+        self.objschema = None if objschema is None else sys.intern(objschema)
+        self.objname = objname
+        self.objbasename = objbasename
+        self.objowner = None if objowner is None else sys.intern(objowner)
+        self.objdeps = None
+        # Rarely used fields (objsubtype, objrole, etc) are kept as a flat (key, value, key, value...) tuple
+        if extra:
+            flat = []
+            for k, v in extra.items():
+                flat.append(sys.intern(k))
+                flat.append(sys.intern(v))
+            self._extra = tuple(flat)
+        else:
+            self._extra = ()
+
+    @property
+    def objtype(self):
+        typecode = self.typecode
+        return OBJECT_TYPES[typecode] if typecode.__class__ is int else typecode
+
+    @property
+    def dumpid(self):
+        """ The archive's dump id for this object (the first number of objid) """
+        return int(self.objid[:self.objid.index(';')])
+
+    def get(self, key, default=None):
+        if key == 'objtype':
+            return self.objtype
+        if key in self._core_keys:
+            value = getattr(self, key)
+            return default if value is None else value
+        extra = self._extra
+        for i in range(0, len(extra), 2):
+            if extra[i] == key:
+                return extra[i+1]
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        for k in self._core_keys:
+            if k == 'objtype' or getattr(self, k) is not None:
+                yield k
+        extra = self._extra
+        for i in range(0, len(extra), 2):
+            yield extra[i]
+
+    def __len__(self):
+        return sum(1 for k in self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+# end PGObject class
+
+
+class PGExtractorOptions(argparse.Namespace):
+    """
+    Options for PGExtractor.iter_extract(), one attribute for every command line option named after its long option
+    (ex: getall, jobs). Options not given are set to their command line default.
+
+        options = PGExtractorOptions(dbname="mydb", basedir="/var/lib/ddl", getall=True, jobs=4)
+
+    Raises TypeError if a keyword argument is not a pg_extractor option.
+    """
+
+    def __init__(self, **kwargs):
+        p = PGExtractor()
+        p._parse_arguments([])
+        option_dict = vars(p.args)
+        for k in kwargs:
+            if k not in option_dict:
+                raise TypeError("Unknown pg_extractor option: " + k)
+        option_dict.update(kwargs)
+        super().__init__(**option_dict)
+# end PGExtractorOptions class
+
 
 class PGExtractor:
     """
@@ -23,10 +172,28 @@ class PGExtractor:
     """
 
     def __init__(self):
-        self.version = "2.4.1"
+        self.version = "2.5.0"
         self.args = False
         self.temp_filelist = []
         self.error_list = []
+        self.start_time = time.time()
+        self.journal_fh = None
+        self.journal_done = set()
+        self.resume_dump = False
+        self.sync_file_list = []
+        self.output_archive = None
+        self.output_archive_fh_list = []
+        self.archive_temp_dir = None
+        self.index_db = None
+        self.index_object_map = {}
+        self.index_pending_count = 0
+        self.jobs_auto = False
+        self.extract_job_list = []
+        self.slice_group_list = []
+        self.trace_events = None
+        self.job_exit_code = None
+        self.catalog_session = None
+        self.role_statements = None
 
 ######################################################################################
 #
@@ -34,263 +201,93 @@ class PGExtractor:
 #
 ######################################################################################
 
-    def build_main_object_list(self, restore_file="#default#"):
+    def apply_plan(self, plan_file):
         """
-        Build a list of all objects contained in the dump file 
-
-        * restore_file: full path to a custom format (-Fc) pg_dump file 
+        Apply the extracted files listed in a plan file written by --plan to the database given by the connection options.
+        Up to --jobs files of a wave are applied at the same time, and no further wave is started once a file has failed.
 
-        Returns a list containing a dictionary object for each line obtained when running pg_restore -l
+        * plan_file: full path to the plan file. The file paths in the plan are relative to the folder it is in.
         """
-        main_object_list = []
-        if restore_file == "#default#":
-            restore_file = self.tmp_dump_file.name
-        pg_restore_cmd = ["pg_restore", "--list", restore_file]
+        self._set_environment()
+        if "PGDATABASE" in os.environ:
+            target_db = os.environ["PGDATABASE"]
+        elif "PGSERVICE" in os.environ:
+            target_db = "service=" + os.environ["PGSERVICE"]
+        else:
+            print("Must set --dbname or --service to the database the plan is applied to.")
+            sys.exit(2)
         try:
-            restore_object_list = subprocess.check_output(pg_restore_cmd, universal_newlines=True).splitlines()
-        except subprocess.CalledProcessError as e:
-            print("Error in pg_restore when generating main object list: " + str(e.cmd))
+            fh = open(plan_file, 'r', encoding='utf-8')
+            plan = json.load(fh)
+            fh.close()
+        except (OSError, ValueError) as e:
+            print("Unable to read plan file " + plan_file + ": " + str(e))
             sys.exit(2)
-
-        p_objid = '\d+;\s\d+\s\d+'
-        # Actual types extracted is controlled in create_extract_files(). This is list format mapping choices.
-        # Order of this list matters if the string starts with the same word (ex TABLE DATA before TABLE).
-        # Last object in this list cannot have a space in it.
-        # If an object type is missing, please let me know and I'll add it.
-        p_types = "ACL|AGGREGATE|COMMENT|CONSTRAINT|DATABASE|DEFAULT\sACL|DEFAULT|"
-        p_types += "DOMAIN|EXTENSION|FK\sCONSTRAINT|FOREIGN\sTABLE|FUNCTION|"
-        p_types += "INDEX|RULE|SCHEMA|SEQUENCE\sOWNED\sBY|SEQUENCE\sSET|SEQUENCE|"
-        p_types += "TABLE\sDATA|TABLE|TRIGGER|TYPE|VIEW|MATERIALIZED\sVIEW\sDATA|MATERIALIZED\sVIEW|"
-        p_types += "SERVER|USER\sMAPPING|PROCEDURE"
-        p_main_object_type = re.compile(p_objid + r'\s(?P<type>' + p_types + ')')
-        p_object_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>' + p_types + ')\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_extension_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>' + p_types + ')\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objname>\S+)\s')
-        p_function_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>\S+)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objname>.*\))\s'
-                r'(?P<objowner>\S+)')
-        p_comment_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>\S+)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_comment_extension_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>COMMENT)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objname>\S+)\s')
-        p_comment_function_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>COMMENT)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objname>.*\))\s'
-                r'(?P<objowner>\S+)')
-        p_comment_dash_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>COMMENT)\s'
-                r'(?P<objschema>\-)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_comment_for_db_dash_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>COMMENT)\s'
-                r'(?P<objschema>\-)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_comment_on_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>COMMENT)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objsource>ON\s\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_default_acl_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>DEFAULT ACL)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objstatement>DEFAULT PRIVILEGES FOR)\s'
-                r'(?P<objsubtype>\S+)\s'
-                r'(?P<objrole>\S+)')
-        p_96_rule_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>RULE)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objtable>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_server_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>SERVER)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objname>\S+)\s'
-                r'(?P<objowner>\S+)')
-        p_user_mapping_mapping = re.compile(r'(?P<objid>' + p_objid + ')\s'
-                r'(?P<objtype>USER MAPPING)\s'
-                r'(?P<objschema>\S+)\s'
-                r'(?P<objstatement>USER MAPPING)\s'
-                r'(?P<objusermapping>\S+)\s'
-                r'(?P<objserverstatement>\S+)\s'
-                r'(?P<objservername>\S+)\s'
-                r'(?P<objowner>\S+)')
-        if self.args and self.args.debug:
-            self._debug_print("\nPG_RESTORE LIST:")
-            for o in restore_object_list:
-                self._debug_print(o)
-        for o in restore_object_list:
-            if re.match(r'^;', o):
-                continue
-            obj_type = p_main_object_type.match(o)
-            if obj_type != None:
-                if ( re.match(p_objid + r'\s(FUNCTION|AGGREGATE|PROCEDURE)', o)
-                    # Matches function/agg or the ACL for them
-                        or (obj_type.group('type').strip() == "ACL" and re.search(r'\(.*\)', o)) ):
-                    obj_mapping = p_function_mapping.match(o)
-                    objname = obj_mapping.group('objname')
-                    basename = objname[:objname.find("(")]
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objname', obj_mapping.group('objname'))
-                        , ('objbasename', basename)
-                        , ('objowner', obj_mapping.group('objowner'))
-                        ])
-                    main_object_list.append(object_dict)
-                    continue
-                if obj_type.group('type').strip() == "EXTENSION":
-                    obj_mapping = p_extension_mapping.match(o)
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objname', obj_mapping.group('objname'))
-                        ])
-                    main_object_list.append(object_dict)
-                    continue
-                if obj_type.group('type').strip() == "COMMENT":
-                    if re.match(p_objid + r'\sCOMMENT\s\S+\s(FUNCTION|AGGREGATE|PROCEDURE)', o):
-                        obj_mapping = p_comment_function_mapping.match(o)
-                        objname = obj_mapping.group('objname')
-                        basename = objname[:objname.find("(")]
-                        object_dict = dict([('objid', obj_mapping.group('objid'))
-                            , ('objtype', obj_mapping.group('objtype'))
-                            , ('objschema', obj_mapping.group('objschema'))
-                            , ('objsubtype', obj_mapping.group('objsubtype'))
-                            , ('objname', obj_mapping.group('objname'))
-                            , ('objbasename', basename)
-                            , ('objowner', obj_mapping.group('objowner'))
-                            ])
-                        main_object_list.append(object_dict)
-                        continue
-                    elif re.match(p_objid + r'\sCOMMENT\s\-\sEXTENSION', o):
-                        obj_mapping = p_comment_extension_mapping.match(o)
-                        object_dict = dict([('objid', obj_mapping.group('objid'))
-                            , ('objtype', obj_mapping.group('objtype'))
-                            , ('objschema', obj_mapping.group('objschema'))
-                            , ('objsubtype', obj_mapping.group('objsubtype'))
-                            , ('objname', obj_mapping.group('objname'))
-                            ])
-                        main_object_list.append(object_dict)
-                        continue
-                    elif re.match(p_objid + r'\sCOMMENT\s\-\s', o):
-                        obj_mapping = p_comment_dash_mapping.match(o)
-                        if obj_mapping is None:
-                            obj_mapping = p_comment_for_db_dash_mapping.match(o)
-                            if obj_mapping is None:
-                                raise ValueError('unexpected line in pg_restore list: {!r}'.format(o))
-                            # we don't want saving a database's comment, so we're just skipping this line
-                            continue
-                        object_dict = dict([('objid', obj_mapping.group('objid'))
-                            , ('objtype', obj_mapping.group('objtype'))
-                            , ('objsubtype', obj_mapping.group('objsubtype'))
-                            , ('objname', obj_mapping.group('objname'))
-                            , ('objowner', obj_mapping.group('objowner'))
-                            ])
-                        main_object_list.append(object_dict)
-                        continue
-                    elif re.match(p_objid + r'\sCOMMENT\s\S+\sRULE', o):
-                        obj_mapping = p_comment_on_mapping.match(o)
-                        object_dict = dict([('objid', obj_mapping.group('objid'))
-                            , ('objtype', obj_mapping.group('objtype'))
-                            , ('objschema', obj_mapping.group('objschema'))
-                            , ('objsubtype', obj_mapping.group('objsubtype'))
-                            , ('objname', obj_mapping.group('objname'))
-                            , ('objsource', obj_mapping.group('objsource'))
-                            , ('objowner', obj_mapping.group('objowner'))
-                            ])
-                        main_object_list.append(object_dict)
-                        continue
+        plan_dir = os.path.dirname(os.path.abspath(plan_file))
+        max_jobs = 1
+        if self.args and self.args.jobs == "auto":
+            max_jobs = os.cpu_count() or 1
+        elif self.args and self.args.jobs > 0:
+            max_jobs = self.args.jobs
+        quiet = self.args and self.args.quiet
+        temp_dir = None
+        if self.args:
+            temp_dir = self.args.temp
+
+        wave_list = plan['waves']
+        for wave_number, wave in enumerate(wave_list, 1):
+            if not quiet:
+                print("Applying wave " + str(wave_number) + " of " + str(len(wave_list)) + " (" + str(len(wave)) + " files)...")
+            pending_list = list(wave)
+            running_list = []
+            failed_list = []
+            while len(running_list) > 0 or (len(pending_list) > 0 and len(failed_list) == 0):
+                while len(pending_list) > 0 and len(running_list) < max_jobs and len(failed_list) == 0:
+                    file_name = pending_list.pop(0)
+                    full_file_name = os.path.join(plan_dir, file_name)
+                    fh = open(full_file_name, 'rb')
+                    header = fh.read(5)
+                    fh.close()
+                    if header == b"PGDMP":
+                        apply_cmd = ["pg_restore", "--single-transaction", "--exit-on-error", "--dbname=" + target_db, full_file_name]
                     else:
-                        obj_mapping = p_comment_mapping.match(o)
-                        object_dict = dict([('objid', obj_mapping.group('objid'))
-                            , ('objtype', obj_mapping.group('objtype'))
-                            , ('objschema', obj_mapping.group('objschema'))
-                            , ('objsubtype', obj_mapping.group('objsubtype'))
-                            , ('objname', obj_mapping.group('objname'))
-                            , ('objowner', obj_mapping.group('objowner'))
-                            ])
-                        main_object_list.append(object_dict)
-                        continue
-                if obj_type.group('type').strip() == "DEFAULT ACL":
-                    obj_mapping = p_default_acl_mapping.match(o)
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objstatement', obj_mapping.group('objstatement'))
-                        , ('objsubtype', obj_mapping.group('objsubtype'))
-                        , ('objrole', obj_mapping.group('objrole'))
-                        ])
-                    main_object_list.append(object_dict)
-                    continue
-                if obj_type.group('type').strip() == "SERVER":
-                    obj_mapping = p_server_mapping.match(o)
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objname', obj_mapping.group('objname'))
-                        , ('objowner', obj_mapping.group('objowner'))
-                        ])
-                    main_object_list.append(object_dict)
-                    continue
-                if obj_type.group('type').strip() == "USER MAPPING":
-                    obj_mapping = p_user_mapping_mapping.match(o)
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objstatement', obj_mapping.group('objstatement'))
-                        , ('objusermapping', obj_mapping.group('objusermapping'))
-                        , ('objserverstatement', obj_mapping.group('objserverstatement'))
-                        , ('objservername', obj_mapping.group('objservername'))
-                        , ('objowner', obj_mapping.group('objowner'))
-                        ])
-                    main_object_list.append(object_dict)
-                    continue
-                if self._check_bin_version("pg_restore", "9.6") == True and obj_type.group('type').strip() == "RULE":
-                    if self.args.debug:
-                        print("VERSION EXCEPTION: 9.6 rule build_main_object_list")
-                    # The pg_restore -l line changed in 9.6 for RULES
-                    obj_mapping = p_96_rule_mapping.match(o)
-                    object_dict = dict([('objid', obj_mapping.group('objid'))
-                        , ('objtype', obj_mapping.group('objtype'))
-                        , ('objschema', obj_mapping.group('objschema'))
-                        , ('objtable', obj_mapping.group('objtable'))
-                        , ('objname', obj_mapping.group('objname'))
-                        , ('objowner', obj_mapping.group('objowner'))
-                        ])
-                    main_object_list.append(object_dict)
+                        apply_cmd = ["psql", "--no-psqlrc", "--quiet", "--single-transaction", "--set=ON_ERROR_STOP=1", "--file=" + full_file_name]
+                    if self.args and self.args.debug:
+                        self._debug_print("APPLY PLAN COMMAND: " + str(apply_cmd))
+                    # stderr goes to a file so a session printing lots of notices can never block on a full pipe
+                    error_fh = tempfile.TemporaryFile(dir=temp_dir)
+                    proc = subprocess.Popen(apply_cmd, stdout=subprocess.DEVNULL, stderr=error_fh)
+                    running_list.append((file_name, proc, error_fh))
+                finished_list = [r for r in running_list if r[1].poll() != None]
+                if len(finished_list) == 0:
+                    time.sleep(0.05)
                     continue
-                # all the other common object formats
-                obj_mapping = p_object_mapping.match(o)
-                object_dict = dict([('objid', obj_mapping.group('objid'))
-                    , ('objtype', obj_mapping.group('objtype'))
-                    , ('objschema', obj_mapping.group('objschema'))
-                    , ('objname', obj_mapping.group('objname'))
-                    , ('objowner', obj_mapping.group('objowner'))
-                    ])
-                main_object_list.append(object_dict)
+                for r in finished_list:
+                    file_name, proc, error_fh = r
+                    running_list.remove(r)
+                    if proc.returncode != 0:
+                        error_fh.seek(0)
+                        failed_list.append(file_name + ": " + error_fh.read().decode('utf-8', 'replace').strip())
+                    error_fh.close()
+            if len(failed_list) > 0:
+                for f in failed_list:
+                    print("Error applying " + f)
+                print("Plan stopped at wave " + str(wave_number) + " of " + str(len(wave_list)) + ". Files of the earlier waves were applied.")
+                sys.exit(2)
+    # end apply_plan()
+
+
+    def build_main_object_list(self, restore_file="#default#", dependencies=False):
+        """
+        Build a list of all objects contained in the dump file 
+
+        * restore_file: full path to a custom format (-Fc) pg_dump file 
+        * dependencies: if True, also read the dump ids each object depends on (pg_restore -l --verbose)
+            into the objdeps field of each object.
+
+        Returns a list containing a PGObject (a dictionary-like record) for each line obtained when running pg_restore -l
+        """
+        main_object_list = list(self._iter_restore_list(restore_file, dependencies))
 
         if self.args and self.args.debug:
             self._debug_print("\nMAIN OBJECT LIST")
@@ -310,12 +307,9 @@ class PGExtractor:
 
         Returns a filtered list in the same format as object_list
         """
-        type_object_list = []
-        for o in object_list:
-            for t in list_types:
-                # Ensure it matches only the exact type given (ex. "SEQUENCE", not "SEQUENCE SET"
-                if re.match(r'^' + t + '$', o.get('objtype')):
-                    type_object_list.append(o)
+        # Ensure it matches only the exact type given (ex. "SEQUENCE", not "SEQUENCE SET")
+        type_set = set(list_types)
+        type_object_list = [o for o in object_list if o.get('objtype') in type_set]
 
         if self.args and self.args.debug:
             self._debug_print("\nTYPE OBJECT LIST " + str(list_types))
@@ -347,357 +341,27 @@ class PGExtractor:
 
     def create_extract_files(self, object_list, target_dir="#default#"):
         """
-        Create extracted DDL files in an organized folder structure. 
-        Many of the additional folder & filter options are not available when this is called directly. 
-        pg_dump command uses environment variables for several settings (add list to docstring). 
+        Create extracted DDL files in an organized folder structure.
+        Many of the additional folder & filter options are not available when this is called directly.
+        pg_dump command uses environment variables for several settings (add list to docstring).
 
-        * object_list - a list in the format created by build_main_object_list 
+        * object_list - a list in the format created by build_main_object_list
         * target_dir - full path to a directory to use as output for extracted files.
             Will be created if it doesn't exist.
             Used in same manner as --basedir option to command line version.
+
+        Returns a list of the full paths to all extracted files, including those --deadline carried over to the next run.
         """
-        extract_file_list = []
         if target_dir == "#default#":
             # Allows direct calls to this function to be able to have a working base directory
             target_dir = self.args.basedir
 
-        acl_list = self.build_type_object_list(object_list, ["ACL"])
-        comment_list = self.build_type_object_list(object_list, ["COMMENT"])
-        process_list = []
-        process_count = 0
-
-        # Objects extracted with pg_dump
-        pgdump_list = self.build_type_object_list(object_list, ["TABLE", "MATERIALIZED VIEW", "VIEW", "FOREIGN TABLE"])
-        if len(pgdump_list) > 0 and self.args and not self.args.quiet:
-            print("Extracting tables...")
-        for o in pgdump_list:
-            output_file = target_dir
-            if self.args and self.args.schemadir:
-                if o.get('objschema') != "-":
-                    output_file = self.create_dir(os.path.join(output_file, o.get('objschema')))
-
-            if o.get('objtype') == "TABLE" or o.get('objtype') == "FOREIGN TABLE":
-                output_file = self.create_dir(os.path.join(output_file, "tables"))
-            elif o.get('objtype') == "VIEW" or o.get('objtype') == "MATERIALIZED VIEW":
-                output_file = self.create_dir(os.path.join(output_file, "views"))
-            else:
-                print("Invalid dump type in create_extract_files() module")
-                sys.exit(2)
-
-            # replace any non-alphanumeric characters with ",hexcode,"
-            objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-            objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-            output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
-            extract_file_list.append(output_file)
-            if self.args and self.args.jobs > 0:
-                p = Process(target=self._run_pg_dump, args=([o, output_file]))
-                if self.args and self.args.debug:
-                    self._debug_print("PG_DUMP PROCESS CREATED: " + str(p.name))
-                process_list.append(p)
-                if (len(process_list) % self.args.jobs) == 0:
-                    if self.args and self.args.debug:
-                        self._debug_print("PG_DUMP PROCESS RUN JOB COUNT REACHED: " + str(len(process_list)))
-                    self._start_jobs(process_list)
-                    self._wait_jobs(process_list)
-                    process_list = []
-                process_count += 1
-            else:
-                self._run_pg_dump(o, output_file)
-        # If --jobs value was not reached, finish off any that were left in the queue
-        if len(process_list) > 0:
-            if self.args and self.args.debug:
-                self._debug_print("PG_DUMP PROCESS RUN REMAINING JOBS: " + str(len(process_list)))
-            self._start_jobs(process_list)
-            self._wait_jobs(process_list)
-
-
-        # Objects that can be overloaded
-        process_list = []
-        process_count = 0
-        tmp_restore_list = None
-        func_agg_list = self.build_type_object_list(object_list, ["FUNCTION", "AGGREGATE", "PROCEDURE"])
-        dupe_list = func_agg_list
-        if len(func_agg_list) > 0 and self.args and not self.args.quiet:
-            print("Extracting functions & aggregates...")
-        for o in func_agg_list:
-            output_file = target_dir
-            if self.args and self.args.schemadir:
-                if o.get('objschema') != "-":
-                    output_file = self.create_dir(os.path.join(output_file, o.get('objschema')))
-            if o.get('objtype') == "FUNCTION":
-                output_file = self.create_dir(os.path.join(output_file, 'functions'))
-            elif o.get('objtype') == "AGGREGATE":
-                output_file = self.create_dir(os.path.join(output_file, 'aggregates'))
-            elif o.get('objtype') == "PROCEDURE":
-                output_file = self.create_dir(os.path.join(output_file, 'procedures'))
-            else:
-                print("Invalid object type found while creating function/aggregate extraction files: " + o.get('objtype'))
-            # replace any non-alphanumeric characters with ",hexcode,"
-            objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-            objbasename_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objbasename'))
-            output_file = os.path.join(output_file, objschema_filename + "." + objbasename_filename + ".sql")
-            extract_file_list.append(output_file)
-            if self.args and self.args.temp != None:
-                tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', dir=self.args.temp, delete=False)
-            else:
-                tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', delete=False)
-            self.temp_filelist.append(tmp_restore_list.name)
-            fh = open(tmp_restore_list.name, 'w', encoding='utf-8', newline='\n')
-            # loop over same list to find overloaded functions
-            for d in dupe_list:
-                if ( o.get('objschema') == d.get('objschema') and 
-                        o.get('objbasename') == d.get('objbasename') ):
-                    fh.write(d.get('objid') + '\n')
-            # Should grab all overloaded ACL & COMMENTS since it's matching on basename
-            for a in acl_list:
-                if "objbasename" in a:
-                    if o.get('objschema') == a.get('objschema') and o.get('objbasename') == a.get('objbasename'):
-                        fh.write(a.get('objid') + '\n')
-            for c in comment_list:
-                if re.match(r'(FUNCTION|AGGREGATE|PROCEDURE)', c.get('objsubtype')):
-                    if o.get('objschema') == c.get('objschema') and o.get('objbasename') == c.get('objbasename'):
-                        fh.write(c.get('objid') + '\n')
-            fh.close()
-            if self.args and self.args.jobs > 0:
-                p = Process(target=self._run_pg_restore, args=([tmp_restore_list.name, output_file]))
-                if self.args and self.args.debug:
-                    self._debug_print("PG_RESTORE FUNCTIONS PROCESS CREATED: " + str(p.name))
-                process_list.append(p)
-                if (len(process_list) % self.args.jobs) == 0:
-                    if self.args and self.args.debug:
-                        self._debug_print("PG_RESTORE FUNCTIONS PROCESS RUN JOB COUNT REACHED: " + str(len(process_list)))
-                    self._start_jobs(process_list)
-                    self._wait_jobs(process_list)
-                    process_list = []
-                process_count += 1
-            else:
-                self._run_pg_restore(tmp_restore_list.name, output_file)
-        # If --jobs value was not reached, finish off any that were left in the queue
-        if len(process_list) > 0:
-            if self.args and self.args.debug:
-                self._debug_print("PG_RESTORE FUNCTIONS PROCESS RUN REMAINING JOBS: " + str(len(process_list)))
-            self._start_jobs(process_list)
-            self._wait_jobs(process_list)
-
-        # Handle if --orreplace is set with --schemadir. This must be done after view & function files have been exported.
-        if self.args.orreplace:
-            schema_list = self.build_type_object_list(object_list, ["SCHEMA"])
-            for o in schema_list:
-                target_dir_funcs = os.path.join(target_dir, o.get('objname'), "functions")
-                target_dir_views = os.path.join(target_dir, o.get('objname'), "views")
-                self.or_replace(target_dir_funcs, target_dir_views)
-
-        # Sequences are special little snowflakes
-        process_list = []
-        process_count = 0
-        tmp_restore_list = None
-        if self.args and self.args.getsequences:
-            sequence_list = self.build_type_object_list(object_list, ["SEQUENCE"])
-            dupe_list = self.build_type_object_list(object_list, ["SEQUENCE SET", "SEQUENCE OWNED BY"])
-            if len(sequence_list) > 0 and self.args and not self.args.quiet:
-                print("Extracting sequences...")
-            for o in sequence_list:
-                output_file = target_dir
-                if self.args and self.args.schemadir:
-                    if o.get('objschema') != "-":
-                        output_file = self.create_dir(os.path.join(output_file, o.get('objschema')))
-                output_file = self.create_dir(os.path.join(output_file, 'sequences'))
-                # replace any non-alphanumeric characters with ",hexcode,"
-                objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
-                extract_file_list.append(output_file)
-                if self.args and self.args.temp != None:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', dir=self.args.temp, delete=False)
-                else:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', delete=False)
-                self.temp_filelist.append(tmp_restore_list.name)
-                fh = open(tmp_restore_list.name, 'w', encoding='utf-8', newline='\n')
-                fh.write(o.get('objid') + '\n')
-                for d in dupe_list:
-                    if o.get('objschema') == d.get('objschema') and o.get('objname') == d.get('objname'):
-                        fh.write(d.get('objid') + '\n')
-                for a in acl_list:
-                    if o.get('objschema') == a.get('objschema') and o.get('objname') == a.get('objname'):
-                        fh.write(a.get('objid') + '\n')
-                for c in comment_list:
-                    if re.search(r'SEQUENCE', c.get('objsubtype')):
-                        if o.get('objschema') == c.get('objschema') and o.get('objname') == c.get('objname'):
-                            fh.write(c.get('objid') + '\n')
-                fh.close()
-                if self.args and self.args.jobs > 0:
-                    p = Process(target=self._run_pg_restore, args=([tmp_restore_list.name, output_file]))
-                    if self.args and self.args.debug:
-                        self._debug_print("PG_RESTORE SEQUENCE PROCESS CREATED: " + str(p.name))
-                    process_list.append(p)
-                    if (len(process_list) % self.args.jobs) == 0:
-                        if self.args and self.args.debug:
-                            self._debug_print("PG_RESTORE SEQUENCE PROCESS RUN JOB COUNT REACHED: " + str(process_count))
-                        self._start_jobs(process_list)
-                        self._wait_jobs(process_list)
-                        process_list = []
-                    process_count += 1
-                else:
-                    self._run_pg_restore(tmp_restore_list.name, output_file)
-            # If --jobs value was not reached, finish off any that were left in the queue
-            if len(process_list) > 0:
-                if self.args and self.args.debug:
-                    self._debug_print("PG_RESTORE SEQUENCE PROCESS RUN REMAINING JOBS: " + str(len(process_list)))
-                self._start_jobs(process_list)
-                self._wait_jobs(process_list)
-
-
-        process_list = []
-        process_count = 0
-        tmp_restore_list = None
-        # Default privileges for roles
-        if self.args and self.args.getdefaultprivs:
-            acl_default_list = self.build_type_object_list(object_list, ["DEFAULT ACL"])
-            dupe_list = acl_default_list
-            if len(acl_default_list) > 0 and self.args and not self.args.quiet:
-                print("Extracting default privileges...")
-            for o in acl_default_list:
-                output_file = self.create_dir(os.path.join(target_dir, "roles"))
-                output_file = os.path.join(output_file, o.get('objrole') + ".sql")
-                extract_file_list.append(output_file)
-                if self.args and self.args.temp != None:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', dir=self.args.temp, delete=False)
-                else:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', delete=False)
-                self.temp_filelist.append(tmp_restore_list.name)
-                fh = open(tmp_restore_list.name, 'w', encoding='utf-8', newline='\n')
-                for d in dupe_list:
-                    if o.get('objrole') == d.get('objrole'):
-                        fh.write(d.get('objid') + '\n')
-                fh.close()
-                if self.args and self.args.jobs > 0:
-                    p = Process(target=self._run_pg_restore, args=([tmp_restore_list.name, output_file]))
-                    if self.args and self.args.debug:
-                        self._debug_print("PG_RESTORE DEFAULT PRIVS PROCESS CREATED: " + str(p.name))
-                    process_list.append(p)
-                    if (len(process_list) % self.args.jobs) == 0:
-                        if self.args and self.args.debug:
-                            self._debug_print("PG_RESTORE DEFAULT PRIVS PROCESS RUN JOB COUNT REACHED: " + str(len(process_list)))
-                        self._start_jobs(process_list)
-                        self._wait_jobs(process_list)
-                        process_list = []
-                    process_count += 1
-                else:
-                    self._run_pg_restore(tmp_restore_list.name, output_file)
-            # If --jobs value was not reached, finish off any that were left in the queue
-            if len(process_list) > 0:
-                if self.args and self.args.debug:
-                    self._debug_print("PG_RESTORE DEFAULT PRIVS PROCESS RUN REMAINING JOBS: " + str(len(process_list)))
-                self._start_jobs(process_list)
-                self._wait_jobs(process_list)
-
-
-        # All other objects extracted via _run_pg_restore()
-        process_list = []
-        process_count = 0
-        tmp_restore_list = None
-        other_object_list = self.build_type_object_list(object_list, ["RULE", "SCHEMA", "TRIGGER", "TYPE", "EXTENSION", "DOMAIN", "SERVER", "USER MAPPING"])
-        if len(other_object_list) > 0:
-            if self.args and not self.args.quiet:
-                print("Extracting remaining objects...")
-            for o in other_object_list:
-                output_file = target_dir
-                if self.args and self.args.schemadir:
-                    if o.get('objschema') != "-":
-                        output_file = self.create_dir(os.path.join(output_file, o.get('objschema')))
-
-                if o.get('objtype') == "RULE":
-                    output_file = self.create_dir(os.path.join(output_file, 'rules'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
-
-                if o.get('objtype') == "SCHEMA":
-                    if self.args and self.args.schemadir:
-                        output_file = self.create_dir(os.path.join(output_file, o.get('objname')))
-                    else:
-                        output_file = self.create_dir(os.path.join(output_file, 'schemata'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objname_filename + ".sql")
-
-                if o.get('objtype') == "TRIGGER":
-                    output_file = self.create_dir(os.path.join(output_file, 'triggers'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
-
-                if o.get('objtype') == "TYPE" or o.get('objtype') == "DOMAIN":
-                    output_file = self.create_dir(os.path.join(output_file, 'types'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
-
-                if o.get('objtype') == "EXTENSION":
-                    output_file = self.create_dir(os.path.join(output_file, 'extensions'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objname_filename + ".sql")
-
-                if o.get('objtype') == "SERVER":
-                    output_file = self.create_dir(os.path.join(output_file, 'servers'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
-                    output_file = os.path.join(output_file, objname_filename + ".sql")
-
-                if o.get('objtype') == "USER MAPPING":
-                    output_file = self.create_dir(os.path.join(output_file, 'user_mappings'))
-                    # replace any non-alphanumeric characters with ",hexcode,"
-                    objusermapping_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objusermapping'))
-                    objservername_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objservername'))
-                    output_file = os.path.join(output_file, objusermapping_filename + "_" + objservername_filename + ".sql")
-
-                extract_file_list.append(output_file)
-                if self.args and self.args.temp != None:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', dir=self.args.temp, delete=False)
-                else:
-                    tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', delete=False)
-                self.temp_filelist.append(tmp_restore_list.name)
-                fh = open(tmp_restore_list.name, 'w', encoding='utf-8', newline='\n')
-                fh.write(o.get('objid') + '\n')
-                for a in acl_list:
-                    if o.get('objschema') == a.get('objschema') and o.get('objname') == a.get('objname'):
-                        fh.write(a.get('objid') + '\n')
-                for c in comment_list:
-                    if re.search(r'(RULE|SCHEMA|TRIGGER|TYPE|EXTENSION|DOMAIN)', c.get('objsubtype')):
-                        if o.get('objschema') == c.get('objschema') and o.get('objname') == c.get('objname'):
-                            fh.write(c.get('objid') + '\n')
-                fh.close()
-                if self.args and self.args.jobs > 0:
-                    p = Process(target=self._run_pg_restore, args=([tmp_restore_list.name, output_file]))
-                    if self.args and self.args.debug:
-                        self._debug_print("PG_RESTORE PROCESS CREATED: " + str(p.name))
-                    process_list.append(p)
-                    if (len(process_list) % self.args.jobs) == 0:
-                        if self.args and self.args.debug:
-                            self._debug_print("PG_RESTORE PROCESS RUN JOB COUNT REACHED: " + str(len(process_list)))
-                        self._start_jobs(process_list)
-                        self._wait_jobs(process_list)
-                        process_list = []
-                    process_count += 1
-                else:
-                    self._run_pg_restore(tmp_restore_list.name, output_file)
-            # If --jobs value was not reached, finish off any that were left in the queue
-            if len(process_list) > 0:
-                if self.args and self.args.debug:
-                    self._debug_print("PG_RESTORE PROCESS RUN REMAINING JOBS: " + str(len(process_list)))
-                self._start_jobs(process_list)
-                self._wait_jobs(process_list)
-        # end if block for other_object_list
-
-        if self.args and self.args.debug:
-            self._debug_print("\nEXTRACT FILE LIST")
-            for f in extract_file_list:
-               self._debug_print(f)
-
+        extract_file_list = []
+        with contextlib.closing(self._iter_extract_files(object_list, target_dir, extract_file_list)) as result_iter:
+            for result in result_iter:
+                if result.error != None:
+                    print(result.error)
+                    sys.exit(2)
         return extract_file_list
     # end create_extract_files()
 
@@ -705,6 +369,7 @@ class PGExtractor:
     def delete_files(self, keep_file_list, target_dir="#default#"):
         """
         Delete files with .sql extension that don't exist in a list of given files. 
+        The --data_chunk_size folder of a deleted table file is deleted with it.
         Delete folders in a given path if they are empty. 
 
         * keep_file_list: list object containing full paths to files that SHOULD REMAIN
@@ -725,6 +390,12 @@ class PGExtractor:
                     if self.args and self.args.debug:
                         self._debug_print("DELETE FILE: " + full_file_name)
                     os.remove(full_file_name)
+                    chunk_dir = self._data_chunk_dir(full_file_name)
+                    if os.path.isdir(chunk_dir):
+                        # --data_chunk_size files of a table go along with the table's file
+                        if self.args and self.args.debug:
+                            self._debug_print("DELETE DATA CHUNK DIR: " + chunk_dir)
+                        shutil.rmtree(chunk_dir)
 
         # Clean up empty folders excluding top root
         for root, dirs, files in os.walk(target_dir):
@@ -737,35 +408,327 @@ class PGExtractor:
     # end delete_files()
 
 
+    def explain(self, options=None):
+        """
+        Dry run that prints the number of objects and files an extraction with the given options would make, along with
+        estimates of its subprocesses, output size, temp space and wall time. No output files are written.
+
+        * options: a PGExtractorOptions object, the same as for iter_extract(). explain is always set.
+
+        Returns a dictionary of the estimates. Sizes are in bytes and times in seconds.
+        """
+        if options == None:
+            options = PGExtractorOptions()
+        self.args = copy.copy(options)
+        self.args.explain = True
+        try:
+            self._set_config()
+            dump_start_time = time.time()
+            self._create_temp_dump()
+            dump_duration = 0
+            if self.args.use_dump == None:
+                dump_duration = time.time() - dump_start_time
+            parse_start_time = time.time()
+            main_object_list = self.build_main_object_list()
+            filtered_list = self._filter_object_list(main_object_list)
+            job_list = self._build_extract_jobs(filtered_list, self.args.basedir)
+            parse_duration = time.time() - parse_start_time
+
+            object_counts = OrderedDict()
+            for o in filtered_list:
+                object_counts[o.get('objtype')] = object_counts.get(o.get('objtype'), 0) + 1
+            # Table data is always dumped from the database, never restored from the temp dump
+            restore_ids = [o.get('objid') for o in filtered_list if not o.get('objtype').endswith(" DATA")]
+            restore_cmd = ["pg_restore", "--use-list=" + self._create_restore_list_file(restore_ids)]
+            if self.args.no_owner:
+                restore_cmd.append("--no-owner")
+            restore_cmd.append(self.tmp_dump_file.name)
+            ddl_bytes = self._explain_output_bytes(restore_cmd)[0]
+            weight_map = self._shard_weights(job_list)
+
+            dump_sample_time = 0
+            restore_sample_time = 0
+            dump_job_list = [j for j in job_list if j['command'] == "pg_dump"]
+            restore_job_list = [j for j in job_list if j['command'] == "pg_restore"]
+            if len(dump_job_list) > 0:
+                # The smallest table, so the sample only measures what every pg_dump call costs
+                o = min(dump_job_list, key=lambda j: weight_map[j['output_file']])['object']
+                dump_sample_time = self._explain_output_bytes(["pg_dump", "--schema-only"
+                    , r'--table="' + o.get('objschema') + r'"."' + o.get('objname') + r'"'])[1]
+            if len(restore_job_list) > 0:
+                restore_sample_time = self._explain_output_bytes(["pg_restore"
+                    , "--use-list=" + self._create_restore_list_file(restore_job_list[0]['restore_ids']), self.tmp_dump_file.name])[1]
+
+            # Every job, with each --table_slices slice as a job of its own, as (seconds, bytes written)
+            category_files = OrderedDict()
+            file_count = 0
+            subprocess_count = 1 + len(job_list)
+            if self.args.use_dump == None:
+                subprocess_count += 1
+            if self.args.getdata and (self.args.shard != None or self.args.table_slices != None):
+                subprocess_count += 1
+            ddl_job_bytes = ddl_bytes // max(len(job_list), 1)
+            data_bytes = 0
+            task_list = []
+            for job in job_list:
+                category_files[job['category']] = category_files.get(job['category'], 0) + 1
+                file_count += 1
+                if job['command'] == "pg_restore":
+                    task_list.append((restore_sample_time + self.args.wait, ddl_job_bytes))
+                    continue
+                job_data_bytes = 0
+                if self.args.getdata:
+                    job_data_bytes = weight_map[job['output_file']] - 8192
+                data_bytes += job_data_bytes
+                if ( self.args.table_slices != None and job.get('partition_list') == None and
+                        job['object'].get('objtype') == "TABLE" and job_data_bytes >= self.args.slice_min_size * 1024 * 1024 ):
+                    # Assumes the table can be sliced. The DDL job and every slice start a process, plus the psql snapshot session.
+                    subprocess_count += self.args.table_slices + 1
+                    file_count += self.args.table_slices + 1
+                    task_list.append((dump_sample_time + self.args.wait, ddl_job_bytes))
+                    slice_bytes = job_data_bytes // self.args.table_slices
+                    for i in range(self.args.table_slices):
+                        task_list.append((dump_sample_time + self.args.wait + slice_bytes / EXPLAIN_DATA_RATE, slice_bytes))
+                    continue
+                if self.args.data_chunk_size != None and job_data_bytes > 0:
+                    file_count += int(math.ceil(job_data_bytes / (self.args.data_chunk_size * 1024 * 1024))) + 1
+                task_list.append((dump_sample_time + self.args.wait + job_data_bytes / EXPLAIN_DATA_RATE, ddl_job_bytes + job_data_bytes))
+
+            # Jobs start in order on whichever of the --jobs processes is free first
+            worker_count = max(self.args.jobs, 1)
+            worker_list = [0.0] * worker_count
+            for duration, output_bytes in task_list:
+                heapq.heappush(worker_list, heapq.heappop(worker_list) + duration)
+            extract_duration = max(worker_list)
+            if self.args.getroles:
+                subprocess_count += 2
+                extract_duration += dump_sample_time
+            if self.args.plan:
+                file_count += 1
+            if self.args.index:
+                file_count += 1
+            temp_dump_bytes = os.path.getsize(self.tmp_dump_file.name)
+            # Every file is written under a temporary name until it is complete, so up to --jobs of them at once
+            in_progress_bytes = sum(sorted([t[1] for t in task_list], reverse=True)[:worker_count])
+
+            explain_result = {'object_counts': object_counts
+                , 'category_files': category_files
+                , 'files': file_count
+                , 'subprocesses': subprocess_count
+                , 'ddl_bytes': ddl_bytes
+                , 'data_bytes': data_bytes
+                , 'temp_dump_bytes': temp_dump_bytes
+                , 'temp_bytes': temp_dump_bytes + in_progress_bytes
+                , 'dump_seconds': dump_duration
+                , 'pg_dump_seconds': dump_sample_time
+                , 'pg_restore_seconds': restore_sample_time
+                , 'wall_seconds': dump_duration + parse_duration + extract_duration}
+            if not self.args.quiet:
+                print("\nObjects selected:")
+                for objtype, count in object_counts.items():
+                    print("    " + objtype + ": " + str(count))
+                print("Output files:")
+                for category, count in category_files.items():
+                    print("    " + category + ": " + str(count))
+                print("    total: " + str(file_count) + (" plus one file per role" if self.args.getroles else ""))
+                print("Subprocesses: " + str(subprocess_count))
+                print("Output size: " + str(ddl_bytes + data_bytes) + " bytes (" + str(ddl_bytes) + " DDL, " + str(data_bytes) + " table data)")
+                print("Temp space: " + str(explain_result['temp_bytes']) + " bytes (" + str(temp_dump_bytes) + " temp dump)")
+                print("Measured: temp dump " + "%.1f" % dump_duration + "s, pg_dump call " + "%.2f" % dump_sample_time
+                    + "s, pg_restore call " + "%.2f" % restore_sample_time + "s. Table data assumed at "
+                    + str(EXPLAIN_DATA_RATE // (1024 * 1024)) + "MB/s per job.")
+                print("Estimated wall time with --jobs " + str(worker_count) + ": " + "%.1f" % explain_result['wall_seconds'] + "s")
+            return explain_result
+        finally:
+            if hasattr(self, 'tmp_dump_file') and not self.tmp_dump_file.closed:
+                self.tmp_dump_file.close()
+            self._cleanup_temp_files()
+    # end explain()
+
+
     def extract_roles(self, output_dir="#default#"):
         """
-        Extract the roles from the database cluster (uses pg_dumpall -r)
+        Extract the roles from the database cluster (uses pg_dumpall -r) into one <role>.role.sql file per role.
+        Statements that do not belong to a single role are written to roles.sql.
 
-        * output_dir: full path to folder where file will be created. 
+        * output_dir: full path to folder where files will be created. 
             Full directory tree will be created if it does not exist.
 
-        Returns the full path to the output_file that was created.
+        Returns a list of the full paths to the output files that were created.
         """
-        pg_dumpall_cmd = ["pg_dumpall", "--roles-only"]
-        if (self._check_bin_version("pg_dumpall", "9.0") == True) and (self.args.dbname != None):
-            if self.args.debug:
-                print("VERSION EXCEPTION: 9.0 pg_dumpall rule")
-            pg_dumpall_cmd.append("--database=" + self.args.dbname)
         if output_dir == "#default#":
-            output_file = self.create_dir(os.path.join(self.args.basedir, "roles"))
+            output_dir = os.path.join(self.args.basedir, "roles")
+            if self.output_archive == None:
+                self.create_dir(output_dir)
         else:
-            output_file = self.create_dir(output_dir)
-        output_file = os.path.join(output_file, "roles.sql")
-        pg_dumpall_cmd.append("--file=" + output_file)
-        if self.args.debug:
-            self._debug_print("\nEXTRACT ROLE STATEMENT: " + str(pg_dumpall_cmd))
+            output_dir = self.create_dir(output_dir)
+        # --profiles reads the roles once for all profiles
+        role_statements = self.role_statements
+        if role_statements == None:
+            role_statements = self._read_roles()
+        remove_passwords = self.args and self.args.remove_passwords
+
+        output_file_list = []
+        for role, statement_list in role_statements.items():
+            if role == None:
+                output_file = os.path.join(output_dir, "roles.sql")
+            else:
+                # replace any non-alphanumeric characters with ",hexcode,"
+                output_file = os.path.join(output_dir, re.sub(r'\W', self.replace_char_with_hex, role) + ".role.sql")
+            temp_file = self._temp_output_file(output_file)
+            if remove_passwords:
+                statement_list = [self._strip_password(st) if st.startswith("ALTER ROLE") else st for st in statement_list]
+            fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+            fh.write("".join(statement_list))
+            fh.close()
+            self._commit_output_file(temp_file, output_file)
+            output_file_list.append(output_file)
+        if len(self.sync_file_list) > 0:
+            self._sync_output_dirs()
+        return output_file_list
+    # end extract_roles()
+
+
+    def iter_extract(self, options=None):
+        """
+        Generator that runs a complete extraction the same way the command line script does and yields an
+        ExtractResult(path, bytes, duration, error) for every file as soon as it has been extracted.
+        Connection options are set as PG* environment variables of this process, so use a new PGExtractor object for every call.
+
+        * options: a PGExtractorOptions object. Defaults to all command line defaults (which extracts nothing).
+        """
+        if options == None:
+            options = PGExtractorOptions()
+        self.args = copy.copy(options)
+        error_count = 0
+        extracted_files_list = []
         try:
-            subprocess.check_output(pg_dumpall_cmd, stderr=subprocess.STDOUT)
-        except subprocess.CalledProcessError as e:
-            print("Error in pg_dumpall command while extracting roles: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            self._set_config()
+            if self.args.profiles != None:
+                yield from self._iter_extract_profiles()
+                return
+            self._trace_event("B", "temp dump", "phase")
+            self._create_temp_dump()
+            self._trace_event("E", "temp dump", "phase")
+            if self._stream_extract(self.args.basedir):
+                # Extraction starts while the object list is read
+                self._trace_event("B", "extract", "phase")
+                result_iter = self._iter_extract_stream(self.args.basedir, extracted_files_list)
+            else:
+                self._trace_event("B", "object list", "phase")
+                main_object_list = self.build_main_object_list(dependencies=self.args.group_partitions or self.args.plan)
+                filtered_list = self._filter_object_list(main_object_list)
+                self._trace_event("E", "object list", "phase", args={'objects': len(main_object_list), 'selected': len(filtered_list)})
+                self._trace_event("B", "extract", "phase")
+                result_iter = self._iter_extract_files(filtered_list, self.args.basedir, extracted_files_list)
+            with contextlib.closing(result_iter):
+                for result in result_iter:
+                    if result.error != None:
+                        error_count += 1
+                    yield result
+            self._trace_event("E", "extract", "phase", args={'errors': error_count})
+            # Every shard knows all of the jobs, so the first one writes the plan and the cluster wide roles
+            first_shard = self.args.shard == None or self.args.shard[0] == 1
+            if self.args.plan and first_shard:
+                if self._deadline_passed():
+                    if not self.args.quiet:
+                        print("Deadline reached. The apply plan was not written.")
+                else:
+                    self._trace_event("B", "plan", "phase")
+                    self._write_apply_plan(main_object_list, self.args.basedir)
+                    self._trace_event("E", "plan", "phase")
+            if self.args.getroles and first_shard:
+                if self._deadline_passed():
+                    # The role files of an earlier run are kept, the same as the files of objects that were carried over
+                    extracted_files_list.extend(self._role_files())
+                    if not self.args.quiet:
+                        print("Deadline reached. Roles were not extracted.")
+                else:
+                    yield from self._iter_extract_roles(extracted_files_list)
+            if self.args.delete:
+                self._trace_event("B", "delete", "phase")
+                self.delete_files(extracted_files_list)
+                self._trace_event("E", "delete", "phase")
+            if self.args.shard != None:
+                self._write_shard_manifest(extracted_files_list, error_count)
+            if self.args.output_archive != None:
+                self._close_output_archive()
+            elif self.args.orreplace and self.args.shard == None and self.args.deadline == None:
+                self.or_replace()
+            if self.args.resume and error_count == 0:
+                self._finish_journal()
+        finally:
+            if self.journal_fh != None and not self.journal_fh.closed:
+                self.journal_fh.close()
+                if not self.args.quiet:
+                    print("Run did not finish. Run again with the same options and --resume to continue where it stopped.")
+            if hasattr(self, 'tmp_dump_file') and not self.tmp_dump_file.closed:
+                self.tmp_dump_file.close()
+            self._close_catalog_snapshot()
+            self._cleanup_temp_files()
+            if self.trace_events != None:
+                self._write_trace_file()
+    # end iter_extract()
+
+
+    def merge_shards(self, target_dir="#default#"):
+        """
+        Combine the results of the --shard runs of all hosts once every shard has finished: run --delete over the files
+        of all shards and merge their --index databases.
+
+        * target_dir: full path to the output directory shared by the shards. Defaults to --basedir with the same
+            --hostnamedir/--dbname folders an extraction with the current options would use.
+
+        Returns a list of the full paths to all files of the shards
+        """
+        if target_dir == "#default#":
+            self._set_environment()
+            self._set_basedir()
+            target_dir = self.args.basedir
+        shard_file = os.path.join(target_dir, ".pg_extractor_shards.json")
+        if not os.path.isfile(shard_file):
+            print("No sharded run found in " + target_dir)
             sys.exit(2)
-        return output_file
-    # end extract_roles()
+        fh = open(shard_file, 'r', encoding='utf-8')
+        shard_count = json.load(fh)['shards']
+        fh.close()
+
+        keep_file_list = []
+        manifest_file_list = []
+        index_file_list = []
+        for shard in range(1, shard_count + 1):
+            manifest_file = os.path.join(target_dir, ".pg_extractor_manifest.shard" + str(shard) + "of" + str(shard_count) + ".json")
+            if not os.path.isfile(manifest_file):
+                print("Shard " + str(shard) + " of " + str(shard_count) + " has not finished. No manifest found: " + manifest_file)
+                sys.exit(2)
+            fh = open(manifest_file, 'r', encoding='utf-8')
+            manifest = json.load(fh)
+            fh.close()
+            if manifest['errors'] > 0 and self.args and not self.args.quiet:
+                print("Warning: " + str(manifest['errors']) + " objects failed to extract in shard " + str(shard) + " of " + str(shard_count))
+            keep_file_list.extend([os.path.join(target_dir, f) for f in manifest['files']])
+            manifest_file_list.append(manifest_file)
+            index_file = os.path.join(target_dir, ".pg_extractor_index.shard" + str(shard) + "of" + str(shard_count) + ".db")
+            if os.path.isfile(index_file):
+                index_file_list.append(index_file)
+
+        if self.args and self.args.delete:
+            self.delete_files(keep_file_list, target_dir)
+        if len(index_file_list) > 0:
+            self._open_index([], target_dir)
+            for index_file in index_file_list:
+                self.index_db.execute("ATTACH DATABASE ? AS shard", (index_file,))
+                self.index_db.execute("DELETE FROM objects WHERE output_file IN (SELECT output_file FROM shard.objects)")
+                self.index_db.execute("INSERT INTO objects SELECT * FROM shard.objects")
+                self.index_db.commit()
+                self.index_db.execute("DETACH DATABASE shard")
+            self._close_index(keep_file_list, target_dir)
+        for f in manifest_file_list + index_file_list + [shard_file]:
+            os.remove(f)
+        if self.args and not self.args.quiet:
+            print("Merged " + str(shard_count) + " shards with " + str(len(keep_file_list)) + " files.")
+        return keep_file_list
+    # end merge_shards()
 
 
     def print_version(self):
@@ -795,10 +758,7 @@ class PGExtractor:
                     full_file_name = os.path.join(root, name)
                     if self.args and self.args.debug:
                         self._debug_print(full_file_name)
-                    for line in fileinput.input(full_file_name, inplace=True, mode='rb'):
-                        sys.stdout.buffer.write(
-                            re.sub(r'^CREATE FUNCTION\b', "CREATE OR REPLACE FUNCTION", line.decode()).encode()
-                        )
+                    self._or_replace_file(full_file_name, "FUNCTION")
         if os.path.exists(target_dir_views):
             for root, dirs, files in os.walk(target_dir_views):
                 files = [f for f in files if not f[0] == '.'] # ignore hidden files
@@ -807,11 +767,7 @@ class PGExtractor:
                     full_file_name = os.path.join(root, name)
                     if self.args and self.args.debug:
                         self._debug_print(full_file_name)
-                    for line in fileinput.input(full_file_name, inplace=True, mode='rb'):
-                        # As of V9.4beta2 MATERIALIZED VIEWS cannot use the "CREATE OR REPLACE" syntax
-                        sys.stdout.buffer.write(
-                            re.sub(r'^CREATE VIEW\b', "CREATE OR REPLACE VIEW", line.decode()).encode()
-                        )
+                    self._or_replace_file(full_file_name, "VIEW")
     # end or_replace()
 
 
@@ -836,12 +792,12 @@ class PGExtractor:
         """
         if os.path.isfile(role_file):
             for line in fileinput.input(role_file, inplace=True, mode='rb'):
-                if re.match(r'ALTER ROLE', line.decode()):
-                    sys.stdout.buffer.write(
-                        re.sub(r'(.*)\sPASSWORD\s.*(;)$', r'\1\2', line.decode()).encode()
-                    )
+                # Newer versions of python already redirect stdout to a binary file when mode is 'rb'
+                out = getattr(sys.stdout, 'buffer', sys.stdout)
+                if line.startswith(b'ALTER ROLE'):
+                    out.write(self._strip_password(line.decode()).encode())
                 else:
-                    sys.stdout.buffer.write(line)
+                    out.write(line)
         else:
             print("Given role file does not exist: " + role_file)
     # end remove_passwords()
@@ -894,12 +850,305 @@ class PGExtractor:
 #
 ######################################################################################
 
-    def _build_filter_list(self, list_type, list_items, list_prefix="#none#"):
+    def _build_apply_plan(self, object_list, job_list, target_dir):
         """
-        Build a list object based on script filter arguments
+        Sort the output files of the given extraction jobs into waves for --plan, where each file only depends on files in earlier waves.
+        Files that depend on each other are listed as cycles.
 
-        * list_type: Format that the list_items paramter is in ("csv" or "file")
-        * list_items: either a csv list of items or a file with line separated items
+        * object_list: the full list from build_main_object_list(dependencies=True), not only the extracted objects
+        * job_list: list of jobs as created by _build_extract_jobs()
+        * target_dir: full path to the base output directory. Files in the plan are relative to it.
+
+        Returns a dictionary with the list of waves (each a sorted list of files) and the list of files in a cycle
+        """
+        object_map = dict((o.dumpid, o) for o in object_list)
+        objid_map = dict((o.get('objid'), o) for o in object_list)
+        file_map = {}
+        table_file_map = {}
+        for job in job_list:
+            if job['command'] == "pg_dump":
+                job_object_list = [job['object']]
+                if job.get('partition_list') != None:
+                    job_object_list.extend(job['partition_list'])
+                for o in job_object_list:
+                    table_file_map[(o.get('objschema'), o.get('objname'))] = job['output_file']
+            else:
+                job_object_list = [objid_map[i] for i in job['restore_ids'] if i in objid_map]
+            for o in job_object_list:
+                file_map[o.dumpid] = job['output_file']
+        # pg_dump puts a table's constraints, indexes, defaults, triggers, etc in the table's file. Their list entries
+        # are named after the table.
+        for o in object_list:
+            if o.dumpid not in file_map and (o.get('objschema'), o.get('objname')) in table_file_map:
+                file_map[o.dumpid] = table_file_map[(o.get('objschema'), o.get('objname'))]
+
+        resolved_map = {}
+        def dependency_files(dumpid):
+            if dumpid in file_map:
+                return set([file_map[dumpid]])
+            if dumpid in resolved_map:
+                return resolved_map[dumpid]
+            # Set before following the object's dependencies so a dependency loop ends here
+            resolved_map[dumpid] = set()
+            files = set()
+            o = object_map.get(dumpid)
+            if o != None and o.get('objdeps') != None:
+                for d in o.get('objdeps'):
+                    files.update(dependency_files(d))
+            resolved_map[dumpid] = files
+            return files
+
+        depends_on = dict((job['output_file'], set()) for job in job_list)
+        first_dumpid = {}
+        for dumpid, output_file in file_map.items():
+            first_dumpid[output_file] = min(first_dumpid.get(output_file, dumpid), dumpid)
+            for d in object_map[dumpid].get('objdeps', ()):
+                for f in dependency_files(d):
+                    if f != output_file:
+                        depends_on[output_file].add(f)
+
+        dependent_map = dict((f, []) for f in depends_on)
+        wait_count = {}
+        for f, dependency_set in depends_on.items():
+            wait_count[f] = len(dependency_set)
+            for d in dependency_set:
+                dependent_map[d].append(f)
+        cycle_map = {}
+        for cycle_set in self._find_dependency_cycles(depends_on):
+            for f in cycle_set:
+                cycle_map[f] = cycle_set
+        wave_list = []
+        placed = set()
+        wave = sorted(f for f in depends_on if wait_count[f] == 0)
+        while len(placed) < len(depends_on):
+            if len(wave) == 0:
+                # Only files in a cycle can be left waiting. Start on a cycle that no longer waits on anything outside of it.
+                ready_list = [f for f in cycle_map if f not in placed
+                    and all(d in placed or d in cycle_map[f] for d in depends_on[f])]
+                wave = [min(ready_list, key=lambda f: (first_dumpid.get(f, 0), f))]
+            wave_list.append(wave)
+            placed.update(wave)
+            next_wave = []
+            for f in wave:
+                for d in dependent_map[f]:
+                    wait_count[d] -= 1
+                    if wait_count[d] == 0 and d not in placed:
+                        next_wave.append(d)
+            wave = sorted(next_wave)
+
+        if self.args and self.args.debug:
+            self._debug_print("\nAPPLY PLAN")
+            for i, wave in enumerate(wave_list, 1):
+                self._debug_print("WAVE " + str(i) + ": " + str([os.path.relpath(f, target_dir) for f in wave]))
+
+        return {'waves': [[os.path.relpath(f, target_dir) for f in wave] for wave in wave_list]
+            , 'cycles': sorted(os.path.relpath(f, target_dir) for f in cycle_map)}
+    # end _build_apply_plan()
+
+
+    def _build_extract_jobs(self, object_list, target_dir):
+        """
+        Work out every extraction that create_extract_files() has to run for the given objects and create their output directories.
+
+        * object_list - a list in the format created by build_main_object_list
+        * target_dir - full path to the base output directory
+
+        Returns a list of job dictionaries in default extraction order. Every job has the keys
+            category: tables, functions, sequences, defaultprivs or other
+            object: the main object the job is for
+            output_file: full path of the file the job creates
+            command: pg_dump (tables, views) or pg_restore (everything else)
+            partition_list: partition objects dumped along with a table (pg_dump jobs, may be None)
+            restore_ids: objids to give to pg_restore with --use-list (pg_restore jobs)
+        """
+        job_list = []
+        acl_list = self.build_type_object_list(object_list, ["ACL"])
+        comment_list = self.build_type_object_list(object_list, ["COMMENT"])
+
+        # Objects extracted with pg_dump
+        pgdump_list = self.build_type_object_list(object_list, PGDUMP_TYPES)
+        partition_map = {}
+        partition_set = set()
+        if self.args and self.args.group_partitions:
+            partition_map = self._build_partition_map(object_list)
+            for partition_list in partition_map.values():
+                for p in partition_list:
+                    partition_set.add((p.get('objschema'), p.get('objname')))
+        for o in pgdump_list:
+            if (o.get('objschema'), o.get('objname')) in partition_set:
+                # Extracted along with its parent table
+                continue
+            job_list.append(self._table_job(o, target_dir, partition_map.get((o.get('objschema'), o.get('objname')))))
+
+        # Objects that can be overloaded
+        func_agg_list = self.build_type_object_list(object_list, ["FUNCTION", "AGGREGATE", "PROCEDURE"])
+        dupe_list = func_agg_list
+        func_file_set = set()
+        for o in func_agg_list:
+            output_file = target_dir
+            if self.args and self.args.schemadir:
+                if o.get('objschema') != "-":
+                    output_file = os.path.join(output_file, o.get('objschema'))
+            if o.get('objtype') == "FUNCTION":
+                output_file = os.path.join(output_file, 'functions')
+            elif o.get('objtype') == "AGGREGATE":
+                output_file = os.path.join(output_file, 'aggregates')
+            elif o.get('objtype') == "PROCEDURE":
+                output_file = os.path.join(output_file, 'procedures')
+            else:
+                print("Invalid object type found while creating function/aggregate extraction files: " + o.get('objtype'))
+            # replace any non-alphanumeric characters with ",hexcode,"
+            objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+            objbasename_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objbasename'))
+            output_file = os.path.join(output_file, objschema_filename + "." + objbasename_filename + ".sql")
+            if output_file in func_file_set:
+                # All overloads go into the same file, so it only has to be extracted once
+                continue
+            func_file_set.add(output_file)
+            restore_ids = []
+            # loop over same list to find overloaded functions
+            for d in dupe_list:
+                if ( o.get('objschema') == d.get('objschema') and
+                        o.get('objbasename') == d.get('objbasename') ):
+                    restore_ids.append(d.get('objid'))
+            # Should grab all overloaded ACL & COMMENTS since it's matching on basename
+            for a in acl_list:
+                if "objbasename" in a:
+                    if o.get('objschema') == a.get('objschema') and o.get('objbasename') == a.get('objbasename'):
+                        restore_ids.append(a.get('objid'))
+            for c in comment_list:
+                if re.match(r'(FUNCTION|AGGREGATE|PROCEDURE)', c.get('objsubtype')):
+                    if o.get('objschema') == c.get('objschema') and o.get('objbasename') == c.get('objbasename'):
+                        restore_ids.append(c.get('objid'))
+            job_list.append({'category': 'functions', 'object': o, 'output_file': output_file, 'command': 'pg_restore'
+                , 'restore_ids': restore_ids})
+
+        # Sequences are special little snowflakes
+        if self.args and self.args.getsequences:
+            sequence_list = self.build_type_object_list(object_list, ["SEQUENCE"])
+            dupe_list = self.build_type_object_list(object_list, ["SEQUENCE SET", "SEQUENCE OWNED BY"])
+            for o in sequence_list:
+                output_file = target_dir
+                if self.args and self.args.schemadir:
+                    if o.get('objschema') != "-":
+                        output_file = os.path.join(output_file, o.get('objschema'))
+                output_file = os.path.join(output_file, 'sequences')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
+                restore_ids = [o.get('objid')]
+                for d in dupe_list:
+                    if o.get('objschema') == d.get('objschema') and o.get('objname') == d.get('objname'):
+                        restore_ids.append(d.get('objid'))
+                for a in acl_list:
+                    if o.get('objschema') == a.get('objschema') and o.get('objname') == a.get('objname'):
+                        restore_ids.append(a.get('objid'))
+                for c in comment_list:
+                    if re.search(r'SEQUENCE', c.get('objsubtype')):
+                        if o.get('objschema') == c.get('objschema') and o.get('objname') == c.get('objname'):
+                            restore_ids.append(c.get('objid'))
+                job_list.append({'category': 'sequences', 'object': o, 'output_file': output_file, 'command': 'pg_restore'
+                    , 'restore_ids': restore_ids})
+
+        # Default privileges for roles
+        if self.args and self.args.getdefaultprivs:
+            acl_default_list = self.build_type_object_list(object_list, ["DEFAULT ACL"])
+            dupe_list = acl_default_list
+            role_file_set = set()
+            for o in acl_default_list:
+                output_file = os.path.join(target_dir, "roles")
+                output_file = os.path.join(output_file, o.get('objrole') + ".sql")
+                if output_file in role_file_set:
+                    # Every default privilege of a role goes into the same file
+                    continue
+                role_file_set.add(output_file)
+                restore_ids = []
+                for d in dupe_list:
+                    if o.get('objrole') == d.get('objrole'):
+                        restore_ids.append(d.get('objid'))
+                job_list.append({'category': 'defaultprivs', 'object': o, 'output_file': output_file, 'command': 'pg_restore'
+                    , 'restore_ids': restore_ids})
+
+        # All other objects extracted via _run_pg_restore()
+        other_object_list = self.build_type_object_list(object_list, ["RULE", "SCHEMA", "TRIGGER", "TYPE", "EXTENSION", "DOMAIN", "SERVER", "USER MAPPING"])
+        for o in other_object_list:
+            output_file = target_dir
+            if self.args and self.args.schemadir:
+                if o.get('objschema') != "-":
+                    output_file = os.path.join(output_file, o.get('objschema'))
+
+            if o.get('objtype') == "RULE":
+                output_file = os.path.join(output_file, 'rules')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
+
+            if o.get('objtype') == "SCHEMA":
+                if self.args and self.args.schemadir:
+                    output_file = os.path.join(output_file, o.get('objname'))
+                else:
+                    output_file = os.path.join(output_file, 'schemata')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objname_filename + ".sql")
+
+            if o.get('objtype') == "TRIGGER":
+                output_file = os.path.join(output_file, 'triggers')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
+
+            if o.get('objtype') == "TYPE" or o.get('objtype') == "DOMAIN":
+                output_file = os.path.join(output_file, 'types')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
+
+            if o.get('objtype') == "EXTENSION":
+                output_file = os.path.join(output_file, 'extensions')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objname_filename + ".sql")
+
+            if o.get('objtype') == "SERVER":
+                output_file = os.path.join(output_file, 'servers')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+                output_file = os.path.join(output_file, objname_filename + ".sql")
+
+            if o.get('objtype') == "USER MAPPING":
+                output_file = os.path.join(output_file, 'user_mappings')
+                # replace any non-alphanumeric characters with ",hexcode,"
+                objusermapping_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objusermapping'))
+                objservername_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objservername'))
+                output_file = os.path.join(output_file, objusermapping_filename + "_" + objservername_filename + ".sql")
+
+            restore_ids = [o.get('objid')]
+            for a in acl_list:
+                if o.get('objschema') == a.get('objschema') and o.get('objname') == a.get('objname'):
+                    restore_ids.append(a.get('objid'))
+            for c in comment_list:
+                if re.search(r'(RULE|SCHEMA|TRIGGER|TYPE|EXTENSION|DOMAIN)', c.get('objsubtype')):
+                    if o.get('objschema') == c.get('objschema') and o.get('objname') == c.get('objname'):
+                        restore_ids.append(c.get('objid'))
+            job_list.append({'category': 'other', 'object': o, 'output_file': output_file, 'command': 'pg_restore'
+                , 'restore_ids': restore_ids})
+
+        self._create_output_dirs(job_list)
+        return job_list
+    # end _build_extract_jobs()
+
+
+    def _build_filter_list(self, list_type, list_items, list_prefix="#none#"):
+        """
+        Build a list object based on script filter arguments
+
+        * list_type: Format that the list_items paramter is in ("csv" or "file")
+        * list_items: either a csv list of items or a file with line separated items
         * list_prefix: a string that is placed on the front of every item in the result list
             Ex: put "-n " before every item for schema filtering the pg_dump command
 
@@ -928,6 +1177,380 @@ class PGExtractor:
             return [(list_prefix + x) for x in split_list]
     # end _build_filter_list()
 
+    def _build_partition_map(self, object_list):
+        """
+        Find the tables in the given object list that are partitions of another table in the same list (uses TABLE ATTACH).
+
+        * object_list: a list in the format created by build_main_object_list(dependencies=True)
+
+        Returns a dictionary of the (schema, name) of each top level partitioned table to a list of its partition table objects
+        """
+        table_list = self.build_type_object_list(object_list, ["TABLE", "FOREIGN TABLE"])
+        tables_by_id = dict((t.dumpid, t) for t in table_list)
+        tables_by_name = dict(((t.get('objschema'), t.get('objname')), t) for t in table_list)
+        parent_of = {}
+        for a in self.build_type_object_list(object_list, ["TABLE ATTACH"]):
+            child_key = (a.get('objschema'), a.get('objname'))
+            if child_key not in tables_by_name or a.get('objdeps') == None:
+                continue
+            # A TABLE ATTACH entry depends on both the partition and its parent table
+            for d in a.get('objdeps'):
+                parent = tables_by_id.get(d)
+                if parent != None and (parent.get('objschema'), parent.get('objname')) != child_key:
+                    parent_of[child_key] = (parent.get('objschema'), parent.get('objname'))
+
+        partition_map = {}
+        for t in table_list:
+            child_key = (t.get('objschema'), t.get('objname'))
+            if child_key not in parent_of:
+                continue
+            parent_key = parent_of[child_key]
+            seen = set([child_key])
+            while parent_key in parent_of and parent_key not in seen:
+                seen.add(parent_key)
+                parent_key = parent_of[parent_key]
+            partition_map.setdefault(parent_key, []).append(t)
+
+        if self.args and self.args.debug:
+            self._debug_print("\nPARTITION MAP")
+            for parent_key, partition_list in partition_map.items():
+                self._debug_print(str(parent_key) + ": " + str([(p.get('objschema'), p.get('objname')) for p in partition_list]))
+
+        return partition_map
+    # end _build_partition_map()
+
+
+    def _cas_clone(self, source_file, dest_file):
+        """
+        Make dest_file a reflink (copy-on-write clone) of source_file for --cas_link reflink.
+
+        * source_file: full path of the file to clone
+        * dest_file: full path of the clone. Replaced if it exists.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            print("--cas_link reflink is not supported on this platform")
+            sys.exit(2)
+        ficlone = 0x40049409
+        try:
+            with open(source_file, 'rb') as src_fh, open(dest_file, 'wb') as dest_fh:
+                fcntl.ioctl(dest_fh.fileno(), ficlone, src_fh.fileno())
+        except OSError as e:
+            if os.path.isfile(dest_file):
+                os.remove(dest_file)
+            print("Error making reflink for --cas_dir. The filesystem may not support reflinks, use --cas_link hard instead: " + str(e))
+            sys.exit(2)
+    # end _cas_clone()
+
+
+    def _cas_store(self, temp_file):
+        """
+        Add a finished output file to the --cas_dir store under its SHA-256 hash, or replace it with a link to the stored copy.
+
+        * temp_file: full path of the file as written, see _temp_output_file()
+        """
+        file_hash = hashlib.sha256()
+        with open(temp_file, 'rb') as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b''):
+                file_hash.update(block)
+        file_hash = file_hash.hexdigest()
+        store_file = os.path.join(self.args.cas_dir, file_hash[:2], file_hash[2:])
+        stored = os.path.isfile(store_file)
+        if not stored:
+            if not os.path.isdir(os.path.dirname(store_file)):
+                os.makedirs(os.path.dirname(store_file), exist_ok=True)
+            try:
+                if self.args.cas_link == "hard":
+                    os.link(temp_file, store_file)
+                else:
+                    # Each process clones to its own name first, so another job storing the same content can't see a partial file
+                    store_temp_file = store_file + "." + str(os.getpid()) + ".tmp"
+                    self._cas_clone(temp_file, store_temp_file)
+                    os.replace(store_temp_file, store_file)
+            except FileExistsError:
+                # Another job stored the same content first
+                stored = True
+            except OSError as e:
+                print("Error adding output file to --cas_dir: " + str(e))
+                sys.exit(2)
+        linked = stored
+        if stored:
+            # Linked to a side name first, so the output file is only replaced by a complete link
+            link_file = temp_file + ".cas"
+            try:
+                if self.args.cas_link == "hard":
+                    os.link(store_file, link_file)
+                else:
+                    self._cas_clone(store_file, link_file)
+                os.replace(link_file, temp_file)
+            except OSError as e:
+                if os.path.isfile(link_file):
+                    os.remove(link_file)
+                if e.errno not in (errno.EMLINK, errno.ENOENT):
+                    print("Error linking output file to --cas_dir entry " + store_file + ": " + str(e))
+                    sys.exit(2)
+                # The stored copy has too many links or was removed since, so the output file stays a full copy
+                linked = False
+        if self.args.debug:
+            self._debug_print("CAS " + ("LINKED: " if linked else ("KEPT COPY: " if stored else "STORED: ")) + temp_file + " -> " + store_file)
+    # end _cas_store()
+
+
+    def _catalog_extract_jobs(self, job_list):
+        """
+        Switch the jobs of functions, views and types to --backend catalog, reading their definitions with a few batched
+        catalog queries. A job keeps its pg_dump or pg_restore call if any of its objects can't be fully written that way.
+
+        * job_list: list of jobs as created by _build_extract_jobs()
+
+        Returns the job list. The switched jobs have the command "catalog" and the file contents in 'definition'.
+        """
+        kind_map = {"FUNCTION": "function", "PROCEDURE": "function", "VIEW": "view", "TYPE": "type", "DOMAIN": "type"}
+        if not self.args.Fc and not self.args.getdata:
+            # pg_dump also writes a materialized view's data and --Fc files are in custom format
+            kind_map["MATERIALIZED VIEW"] = "view"
+        elif not self.args.Fc:
+            kind_map["MATERIALIZED VIEW"] = None
+        if self.args.Fc:
+            kind_map["VIEW"] = None
+        class_map = {"function": "1255", "view": "1259", "type": "1247"}
+        candidate_list = []
+        oid_map = {"function": [], "view": [], "type": []}
+        for job in job_list:
+            kind = kind_map.get(job['object'].get('objtype'))
+            if kind == None or job['command'] not in ("pg_dump", "pg_restore") or job.get('partition_list') != None:
+                continue
+            if job['command'] == "pg_dump":
+                id_list = [job['object'].get('objid')]
+            else:
+                id_list = job['restore_ids']
+            # objid is "<dump id>; <catalog oid> <object oid>". ACLs and comments are listed with 0 0 and read along with their object.
+            oid_list = [i.split()[2] for i in id_list if i.split()[1] == class_map[kind]]
+            candidate_list.append((job, kind, oid_list))
+            oid_map[kind].extend(oid_list)
+        if len(candidate_list) == 0:
+            return job_list
+        if self.catalog_session == None:
+            # The temp dump was not made by this run (ex: --resume), so the catalog may no longer match it
+            if not self.args.quiet:
+                print("Temp dump was not made by this run. Extracting with pg_dump and pg_restore instead of --backend catalog.")
+            return job_list
+
+        if not self.args.quiet:
+            print("Reading definitions from the catalog...")
+        section_map = {}
+        session = self.catalog_session
+        try:
+            version = int(self._psql_session_query(session, "SELECT pg_catalog.current_setting('server_version_num')")[0][0])
+            # Names in the definitions are schema qualified, the same as pg_dump makes them
+            self._psql_session_query(session, "SELECT pg_catalog.set_config('search_path', '', false)")
+            for kind in ("function", "view", "type"):
+                for i in range(0, len(oid_map[kind]), 5000):
+                    sql = self._catalog_query(kind, oid_map[kind][i:i+5000], version)
+                    for row in self._psql_session_query(session, sql):
+                        section_map[(kind, row[0])] = bytes.fromhex(row[1]).decode('utf-8') if row[1] != "" else None
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while reading definitions for --backend catalog: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+
+        # The settings pg_restore output starts with, so the files load the same way
+        header = ("SET statement_timeout = 0;\nSET lock_timeout = 0;\nSET client_encoding = 'UTF8';\nSET standard_conforming_strings = on;\n"
+            + "SELECT pg_catalog.set_config('search_path', '', false);\nSET check_function_bodies = false;\nSET client_min_messages = warning;\n\n")
+        catalog_count = 0
+        for job, kind, oid_list in candidate_list:
+            section_list = [section_map.get((kind, oid)) for oid in oid_list]
+            if len(section_list) == 0 or None in section_list:
+                continue
+            job['command'] = "catalog"
+            job['definition'] = header + "".join(section_list)
+            catalog_count += 1
+            if self.args.debug:
+                self._debug_print("CATALOG JOB: " + job['output_file'])
+        if not self.args.quiet and catalog_count < len(candidate_list):
+            print(str(len(candidate_list) - catalog_count) + " objects not supported by --backend catalog are extracted with pg_dump or pg_restore.")
+        return job_list
+    # end _catalog_extract_jobs()
+
+
+    def _catalog_fingerprint(self):
+        """
+        Work out a fingerprint of the system catalogs that a schema-only pg_dump of the database depends on, for --dump_cache.
+
+        Returns the fingerprint, or None if the server is older than 9.5 and no fingerprint can be made
+        """
+        catalog_list = ["pg_namespace", "pg_attribute", "pg_attrdef", "pg_constraint", "pg_index", "pg_inherits", "pg_type", "pg_enum"
+            , "pg_range", "pg_proc", "pg_aggregate", "pg_operator", "pg_opclass", "pg_opfamily", "pg_amop", "pg_amproc", "pg_cast"
+            , "pg_collation", "pg_conversion", "pg_language", "pg_trigger", "pg_event_trigger", "pg_rewrite", "pg_description"
+            , "pg_seclabel", "pg_depend", "pg_extension", "pg_foreign_data_wrapper", "pg_foreign_server", "pg_foreign_table"
+            , "pg_default_acl", "pg_policy", "pg_transform", "pg_ts_config", "pg_ts_config_map", "pg_ts_dict"
+            , "pg_ts_parser", "pg_ts_template", "pg_am"]
+        # With --backend catalog, read in the same snapshot as the temp dump and the catalog queries
+        session = self.catalog_session or self._psql_session_open()
+        try:
+            version = int(self._psql_session_query(session, "SELECT pg_catalog.current_setting('server_version_num')")[0][0])
+            if version < 90500:
+                return None
+            if version >= 90600:
+                catalog_list.append("pg_init_privs")
+            if version >= 100000:
+                catalog_list.extend(["pg_sequence", "pg_partitioned_table", "pg_statistic_ext", "pg_publication", "pg_publication_rel"])
+            if version >= 150000:
+                catalog_list.append("pg_publication_namespace")
+
+            def row_hash(row_text):
+                # First 64 bits of the row's md5 as a bigint, so they can be summed
+                return "pg_catalog.sum(('x' || pg_catalog.substr(pg_catalog.md5(" + row_text + "), 1, 16))::pg_catalog.bit(64)::bigint)"
+            part_list = ["SELECT 'pg_class', pg_catalog.count(*), " + row_hash("(pg_catalog.to_jsonb(t) - 'relpages' - 'reltuples' - 'relallvisible'"
+                + " - 'relallfrozen' - 'relfrozenxid' - 'relminmxid' - 'relfilenode' - 'relhasindex' - 'relhassubclass' - 'relhaspkey' - 'relrewrite')::text || t.oid")
+                + " FROM pg_catalog.pg_class t"]
+            # Owners and tablespaces are dumped by name
+            part_list.append("SELECT 'pg_roles', pg_catalog.count(*), " + row_hash("t.oid || ' ' || t.rolname") + " FROM pg_catalog.pg_roles t")
+            part_list.append("SELECT 'pg_tablespace', pg_catalog.count(*), " + row_hash("t.oid || ' ' || t.spcname") + " FROM pg_catalog.pg_tablespace t")
+            for c in catalog_list:
+                part_list.append("SELECT '" + c + "', pg_catalog.count(*), " + row_hash("t::text") + " FROM pg_catalog." + c + " t")
+            # Only superusers can read pg_user_mapping and pg_subscription.subconninfo, so the view and the other columns are used
+            part_list.append("SELECT 'pg_user_mappings', pg_catalog.count(*), " + row_hash("(t.umid, t.srvid, t.umuser, t.umoptions)::text")
+                + " FROM pg_catalog.pg_user_mappings t")
+            if version >= 100000:
+                part_list.append("SELECT 'pg_subscription', pg_catalog.count(*), " + row_hash("(t.oid, t.subdbid, t.subname, t.subowner, t.subenabled"
+                    + ", t.subslotname, t.subsynccommit, t.subpublications)::text") + " FROM pg_catalog.pg_subscription t")
+            fingerprint_sql = ("SELECT pg_catalog.md5(pg_catalog.string_agg(c || ' ' || n || ' ' || coalesce(h::text, ''), ',' ORDER BY c)) FROM ("
+                + " UNION ALL ".join(part_list) + ") AS s (c, n, h)")
+            fingerprint = str(version) + "-" + self._psql_session_query(session, fingerprint_sql)[0][0]
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while reading the catalog fingerprint for --dump_cache: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+        finally:
+            if session is not self.catalog_session:
+                self._psql_session_close(session)
+        return fingerprint
+    # end _catalog_fingerprint()
+
+
+    def _catalog_query(self, kind, oid_list, version):
+        """
+        Build the --backend catalog query that renders the given objects of one kind the way pg_restore lays them out.
+
+        * kind: function, view or type
+        * oid_list: OIDs of the objects as strings
+        * version: server_version_num of the database
+
+        Returns the SQL. Each result row is the OID and the hex encoded UTF-8 text of the object, which is empty if
+        the object can't be rendered from the catalog.
+        """
+        nl = "pg_catalog.chr(10)"
+
+        def acl_sql(acl, object_sql, owner):
+            # The privileges are given explicitly, so the defaults (ex: EXECUTE for PUBLIC on a function) are revoked first
+            if self.args.no_acl:
+                return "''"
+            return ("CASE WHEN " + acl + " IS NULL THEN '' ELSE 'REVOKE ALL ON ' || " + object_sql + " || ' FROM PUBLIC;' || " + nl
+                + " || 'REVOKE ALL ON ' || " + object_sql + " || ' FROM ' || pg_catalog.quote_ident(pg_catalog.pg_get_userbyid(" + owner + ")) || ';' || " + nl
+                + " || coalesce((SELECT pg_catalog.string_agg('GRANT ' || a.privilege_type || ' ON ' || " + object_sql + " || ' TO '"
+                + " || CASE a.grantee WHEN 0 THEN 'PUBLIC' ELSE pg_catalog.quote_ident(pg_catalog.pg_get_userbyid(a.grantee)) END"
+                + " || CASE WHEN a.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END || ';', " + nl + " ORDER BY a.n)"
+                + " FROM pg_catalog.aclexplode(" + acl + ") WITH ORDINALITY a (grantor, grantee, privilege_type, is_grantable, n)), '') || " + nl + " || " + nl + " END")
+
+        def section_sql(name_sql, type_sql, schema_sql, owner, drop_sql, create_sql, alter_sql, comment_sql, acl, acl_object_sql):
+            parts = ["'--' || " + nl + " || '-- Name: ' || " + name_sql + " || '; Type: ' || " + type_sql + " || '; Schema: ' || " + schema_sql
+                + " || '; Owner: ' || pg_catalog.pg_get_userbyid(" + owner + ") || " + nl + " || '--' || " + nl + " || " + nl]
+            if self.args.clean:
+                parts.append("'DROP ' || " + drop_sql + " || ';' || " + nl + " || " + nl)
+            parts.append(create_sql + " || " + nl + " || " + nl)
+            if not self.args.no_owner:
+                parts.append("'ALTER ' || " + alter_sql + " || ' OWNER TO ' || pg_catalog.quote_ident(pg_catalog.pg_get_userbyid(" + owner + ")) || ';' || " + nl + " || " + nl)
+            parts.append(comment_sql)
+            parts.append(acl_sql(acl, acl_object_sql, owner))
+            return "(" + " || ".join(["coalesce(" + p + ", '')" for p in parts]) + ")"
+
+        def comment_sql(object_sql, description):
+            return "CASE WHEN " + description + " IS NULL THEN '' ELSE 'COMMENT ON ' || " + object_sql + " || ' IS ' || pg_catalog.quote_literal(" + description + ") || ';' || " + nl + " || " + nl + " END"
+
+        def unsupported_sql(oid, catalog, acl, owner):
+            # Security labels, and privileges granted by someone other than the owner, are left to pg_dump and pg_restore
+            return ("EXISTS (SELECT 1 FROM pg_catalog.pg_seclabel l WHERE l.objoid = " + oid + " AND l.classoid = 'pg_catalog." + catalog + "'::pg_catalog.regclass)"
+                + " OR EXISTS (SELECT 1 FROM pg_catalog.aclexplode(" + acl + ") a WHERE a.grantor <> " + owner + ")")
+
+        oid_array = "'{" + ",".join(oid_list) + "}'::pg_catalog.oid[]"
+        if kind == "function":
+            signature = "pg_catalog.quote_ident(n.nspname) || '.' || pg_catalog.quote_ident(p.proname) || '(' || pg_catalog.pg_get_function_identity_arguments(p.oid) || ')'"
+            kind_sql = "'FUNCTION'"
+            if version >= 110000:
+                kind_sql = "CASE p.prokind WHEN 'p' THEN 'PROCEDURE' ELSE 'FUNCTION' END"
+            object_sql = kind_sql + " || ' ' || " + signature
+            render = section_sql(
+                "p.proname || '(' || pg_catalog.pg_get_function_identity_arguments(p.oid) || ')'", kind_sql, "n.nspname", "p.proowner"
+                , object_sql, "pg_catalog.rtrim(pg_catalog.pg_get_functiondef(p.oid), " + nl + ") || ';'", object_sql
+                , comment_sql(object_sql, "pg_catalog.obj_description(p.oid, 'pg_proc')"), "p.proacl", object_sql)
+            return ("SELECT p.oid, CASE WHEN EXISTS (SELECT 1 FROM pg_catalog.pg_aggregate g WHERE g.aggfnoid = p.oid) OR " + unsupported_sql("p.oid", "pg_proc", "p.proacl", "p.proowner") + " THEN ''"
+                + " ELSE pg_catalog.encode(pg_catalog.convert_to(" + render + ", 'UTF8'), 'hex') END"
+                + " FROM pg_catalog.pg_proc p JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace WHERE p.oid = ANY (" + oid_array + ")")
+        if kind == "view":
+            name = "pg_catalog.quote_ident(n.nspname) || '.' || pg_catalog.quote_ident(c.relname)"
+            kind_sql = "CASE c.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END"
+            option_list = "(SELECT pg_catalog.array_to_string(pg_catalog.array_agg(o), ', ') FROM pg_catalog.unnest(c.reloptions) o WHERE o NOT LIKE 'check_option=%')"
+            check_option = "(SELECT pg_catalog.upper(pg_catalog.substr(o, 14)) FROM pg_catalog.unnest(c.reloptions) o WHERE o LIKE 'check_option=%')"
+            create = ("'CREATE ' || " + kind_sql + " || ' ' || " + name + " || coalesce(' WITH (' || " + option_list + " || ')', '') || ' AS' || " + nl
+                + " || pg_catalog.rtrim(pg_catalog.pg_get_viewdef(c.oid), ';')"
+                + " || CASE WHEN c.relkind = 'm' THEN " + nl + " || '  WITH NO DATA' ELSE coalesce(" + nl + " || '  WITH ' || " + check_option + " || ' CHECK OPTION', '') END || ';'")
+            columns = ("coalesce((SELECT pg_catalog.string_agg(x, '' ORDER BY a.attnum) FROM pg_catalog.pg_attribute a"
+                + " LEFT JOIN pg_catalog.pg_attrdef ad ON ad.adrelid = a.attrelid AND ad.adnum = a.attnum"
+                + " CROSS JOIN LATERAL (SELECT coalesce('ALTER VIEW ' || " + name + " || ' ALTER COLUMN ' || pg_catalog.quote_ident(a.attname)"
+                + " || ' SET DEFAULT ' || pg_catalog.pg_get_expr(ad.adbin, ad.adrelid) || ';' || " + nl + " || " + nl + ", '')"
+                + " || coalesce('COMMENT ON COLUMN ' || " + name + " || '.' || pg_catalog.quote_ident(a.attname) || ' IS '"
+                + " || pg_catalog.quote_literal(pg_catalog.col_description(c.oid, a.attnum)) || ';' || " + nl + " || " + nl + ", '') AS x) l"
+                + " WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped), '')")
+            indexes = ("coalesce((SELECT pg_catalog.string_agg(pg_catalog.pg_get_indexdef(i.indexrelid) || ';' || " + nl + " || " + nl + ", '' ORDER BY i.indexrelid)"
+                + " FROM pg_catalog.pg_index i WHERE i.indrelid = c.oid), '')")
+            render = section_sql(
+                "c.relname", kind_sql, "n.nspname", "c.relowner", kind_sql + " || ' ' || " + name, create, kind_sql + " || ' ' || " + name
+                , columns + " || " + indexes + " || " + comment_sql(kind_sql + " || ' ' || " + name, "pg_catalog.obj_description(c.oid, 'pg_class')")
+                , "c.relacl", "'TABLE ' || " + name)
+            # Left to pg_dump when its file holds more than the view itself: triggers, rules other than the view's own,
+            # column privileges, and tablespaces, clustered or commented indexes or statistics of a materialized view
+            unsupported = ("EXISTS (SELECT 1 FROM pg_catalog.pg_trigger tg WHERE tg.tgrelid = c.oid AND NOT tg.tgisinternal)"
+                + " OR EXISTS (SELECT 1 FROM pg_catalog.pg_rewrite r WHERE r.ev_class = c.oid AND r.rulename <> '_RETURN')"
+                + " OR EXISTS (SELECT 1 FROM pg_catalog.pg_attribute a WHERE a.attrelid = c.oid AND a.attacl IS NOT NULL)"
+                + " OR " + unsupported_sql("c.oid", "pg_class", "c.relacl", "c.relowner") + " OR c.reltablespace <> 0"
+                + " OR EXISTS (SELECT 1 FROM pg_catalog.pg_index i JOIN pg_catalog.pg_class ic ON ic.oid = i.indexrelid WHERE i.indrelid = c.oid"
+                + " AND (i.indisclustered OR ic.reltablespace <> 0 OR pg_catalog.obj_description(ic.oid, 'pg_class') IS NOT NULL))")
+            if version >= 100000:
+                unsupported += " OR EXISTS (SELECT 1 FROM pg_catalog.pg_statistic_ext st WHERE st.stxrelid = c.oid)"
+            return ("SELECT c.oid, CASE WHEN " + unsupported + " THEN '' ELSE pg_catalog.encode(pg_catalog.convert_to(" + render + ", 'UTF8'), 'hex') END"
+                + " FROM pg_catalog.pg_class c JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace WHERE c.oid = ANY (" + oid_array + ")")
+        name = "pg_catalog.quote_ident(n.nspname) || '.' || pg_catalog.quote_ident(t.typname)"
+        kind_sql = "CASE t.typtype WHEN 'd' THEN 'DOMAIN' ELSE 'TYPE' END"
+        collate = ("CASE WHEN {coll} <> 0 AND {coll} IS DISTINCT FROM (SELECT b.typcollation FROM pg_catalog.pg_type b WHERE b.oid = {type_oid})"
+            + " THEN ' COLLATE ' || (SELECT pg_catalog.quote_ident(cn.nspname) || '.' || pg_catalog.quote_ident(co.collname) FROM pg_catalog.pg_collation co"
+            + " JOIN pg_catalog.pg_namespace cn ON cn.oid = co.collnamespace WHERE co.oid = {coll}) ELSE '' END")
+        create = ("CASE t.typtype"
+            + " WHEN 'e' THEN 'CREATE TYPE ' || " + name + " || ' AS ENUM (' || coalesce((SELECT pg_catalog.string_agg(" + nl + " || '    ' || pg_catalog.quote_literal(e.enumlabel), ','"
+            + " ORDER BY e.enumsortorder) FROM pg_catalog.pg_enum e WHERE e.enumtypid = t.oid), '') || " + nl + " || ');'"
+            + " WHEN 'c' THEN 'CREATE TYPE ' || " + name + " || ' AS (' || coalesce((SELECT pg_catalog.string_agg(" + nl + " || '    ' || pg_catalog.quote_ident(a.attname)"
+            + " || ' ' || pg_catalog.format_type(a.atttypid, a.atttypmod) || " + collate.format(coll="a.attcollation", type_oid="a.atttypid") + ", ','"
+            + " ORDER BY a.attnum) FROM pg_catalog.pg_attribute a WHERE a.attrelid = t.typrelid AND a.attnum > 0 AND NOT a.attisdropped), '') || " + nl + " || ');'"
+            + " WHEN 'd' THEN 'CREATE DOMAIN ' || " + name + " || ' AS ' || pg_catalog.format_type(t.typbasetype, t.typtypmod)"
+            + " || " + collate.format(coll="t.typcollation", type_oid="t.typbasetype")
+            + " || coalesce(' DEFAULT ' || t.typdefault, '') || CASE WHEN t.typnotnull THEN ' NOT NULL' ELSE '' END"
+            + " || coalesce((SELECT pg_catalog.string_agg(" + nl + " || pg_catalog.chr(9) || 'CONSTRAINT ' || pg_catalog.quote_ident(con.conname) || ' '"
+            + " || pg_catalog.pg_get_constraintdef(con.oid), '' ORDER BY con.conname) FROM pg_catalog.pg_constraint con"
+            # PostgreSQL 17+ also lists NOT NULL as a constraint, it is already written from typnotnull
+            + " WHERE con.contypid = t.oid AND con.contype <> 'n'), '') || ';' END")
+        render = section_sql(
+            "t.typname", kind_sql, "n.nspname", "t.typowner", kind_sql + " || ' ' || " + name, create, kind_sql + " || ' ' || " + name
+            , comment_sql(kind_sql + " || ' ' || " + name, "pg_catalog.obj_description(t.oid, 'pg_type')"), "t.typacl", "'TYPE ' || " + name)
+        # Comments on the columns of a composite type or on the constraints of a domain are left to pg_restore
+        unsupported = (unsupported_sql("t.oid", "pg_type", "t.typacl", "t.typowner")
+            + " OR EXISTS (SELECT 1 FROM pg_catalog.pg_description d WHERE d.objoid = t.typrelid AND d.classoid = 'pg_catalog.pg_class'::pg_catalog.regclass)"
+            + " OR EXISTS (SELECT 1 FROM pg_catalog.pg_description d JOIN pg_catalog.pg_constraint con ON con.oid = d.objoid"
+            + " WHERE con.contypid = t.oid AND d.classoid = 'pg_catalog.pg_constraint'::pg_catalog.regclass)")
+        return ("SELECT t.oid, CASE WHEN t.typtype NOT IN ('e', 'c', 'd') OR " + unsupported + " THEN ''"
+            + " ELSE pg_catalog.encode(pg_catalog.convert_to(" + render + ", 'UTF8'), 'hex') END"
+            + " FROM pg_catalog.pg_type t JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace WHERE t.oid = ANY (" + oid_array + ")")
+    # end _catalog_query()
+
+
     def _check_bin_version(self, bin_file, min_version):
         """
         Returns true if the major version of the given postgres binary is greater than or equal to the one given
@@ -974,29 +1597,221 @@ class PGExtractor:
         Processes in the script add to the the global list variable temp_filelist 
         declared in constructor.
         """
-        if self.args.debug:
+        if self.args and self.args.debug:
             self._debug_print("\nCLEANUP TEMP FILES")
         for f in self.temp_filelist:
-            if self.args.debug:
+            if self.args and self.args.debug:
                 self._debug_print(f)
-            if os.path.exists(f):
+            if os.path.isdir(f):
+                shutil.rmtree(f)
+            elif os.path.exists(f):
                 os.remove(f)
 
 
+    def _close_catalog_snapshot(self):
+        """
+        End the --backend catalog session opened by _open_catalog_snapshot(), if there is one.
+        """
+        if self.catalog_session != None:
+            self._psql_session_close(self.catalog_session)
+            self.catalog_session = None
+    # end _close_catalog_snapshot()
+
+
+    def _close_index(self, extract_file_list, target_dir):
+        """
+        Commit and close the --index database. If --delete is set, rows for files that are about to be deleted are removed.
+
+        * extract_file_list: list of the full paths to all files of this run as returned by _run_extract_jobs()
+        * target_dir: full path to the base output directory
+        """
+        if self.args.delete:
+            keep_file_set = set([os.path.relpath(f, target_dir) for f in extract_file_list])
+            cur = self.index_db.execute("SELECT DISTINCT output_file FROM objects")
+            delete_list = [(r[0],) for r in cur.fetchall() if r[0] not in keep_file_set]
+            self.index_db.executemany("DELETE FROM objects WHERE output_file = ?", delete_list)
+        self.index_db.commit()
+        self.index_db.close()
+        self.index_db = None
+        self.index_object_map = {}
+    # end _close_index()
+
+
+    def _close_output_archive(self):
+        """
+        Finish the --output_archive file and give it its real name.
+        """
+        self.output_archive.close()
+        for fh in self.output_archive_fh_list:
+            fh.close()
+        os.replace(self.output_archive_temp_file, self.args.output_archive)
+        self.output_archive = None
+    # end _close_output_archive()
+
+
+    def _close_table_slices(self, group):
+        """
+        End the snapshot session of a --table_slices table, if it is still open.
+
+        * group: a slice group created by _slice_extract_jobs()
+        """
+        if group['session'] != None and group['session'] != "closed":
+            self._psql_session_close(group['session'])
+            group['session'] = "closed"
+    # end _close_table_slices()
+
+
+    def _commit_data_chunks(self, job):
+        """
+        Commit the --data_chunk_size files and manifest written by a finished pg_dump job and remove any left over from an earlier run.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+
+        Returns the total size of the chunk files
+        """
+        chunk_dir = self._data_chunk_dir(job['output_file'])
+        manifest_file = os.path.join(chunk_dir, "manifest.json")
+        temp_manifest_file = self._temp_output_file(manifest_file)
+        if not os.path.isfile(temp_manifest_file):
+            # Objects without data (ex: views)
+            return 0
+        fh = open(temp_manifest_file, 'r', encoding='utf-8')
+        manifest = json.load(fh)
+        fh.close()
+        chunk_bytes = 0
+        keep_file_set = set(["manifest.json"])
+        for c in manifest['chunks']:
+            chunk_file = os.path.join(chunk_dir, c['file'])
+            self._commit_output_file(self._temp_output_file(chunk_file), chunk_file)
+            chunk_bytes += c['bytes']
+            keep_file_set.add(c['file'])
+        self._commit_output_file(temp_manifest_file, manifest_file)
+        if self.output_archive == None:
+            for f in os.listdir(chunk_dir):
+                if not f.startswith('.') and f not in keep_file_set:
+                    os.remove(os.path.join(chunk_dir, f))
+        return chunk_bytes
+    # end _commit_data_chunks()
+
+
+    def _commit_extract_job(self, job):
+        """
+        Give the output of a successfully finished extraction job its real name, in the main process.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+
+        Returns the total size of the job's data chunk files
+        """
+        temp_file = self._temp_output_file(job['output_file'])
+        if self.args and self.args.orreplace and (self.output_archive != None or self.args.shard != None or self.args.deadline != None):
+            # The files can't be changed by or_replace() once they are in the archive, with --shard the folders hold
+            # files that other shards may still be writing and --deadline may not leave time for a pass over the folders
+            if job['object'].get('objtype') == "FUNCTION":
+                self._or_replace_file(temp_file, "FUNCTION")
+            elif job['object'].get('objtype') in ("VIEW", "MATERIALIZED VIEW"):
+                self._or_replace_file(temp_file, "VIEW")
+        if self.index_db != None and job['command'] != "copy":
+            self._index_job(job, temp_file)
+        chunk_bytes = 0
+        if job['command'] == "pg_dump" and self.args and self.args.data_chunk_size != None:
+            chunk_bytes = self._commit_data_chunks(job)
+        self._commit_output_file(temp_file, job['output_file'])
+        self._journal_job(job)
+        return chunk_bytes
+    # end _commit_extract_job()
+
+
+    def _commit_output_file(self, temp_file, output_file):
+        """
+        Rename a finished output file from its temporary name to its real name and flush it to disk as set by --fsync.
+        With --output_archive, the file is added to the archive instead.
+        With --cas_dir, the file is first swapped for a link to its copy in the store.
+
+        * temp_file: full path of the file as written, see _temp_output_file()
+        * output_file: full path the file is given
+        """
+        if self.output_archive != None:
+            arcname = os.path.relpath(output_file, self.args.basedir)
+            if isinstance(self.output_archive, zipfile.ZipFile):
+                self.output_archive.write(temp_file, arcname=arcname)
+            else:
+                self.output_archive.add(temp_file, arcname=arcname)
+            os.remove(temp_file)
+            return
+        if self.args and self.args.cas_dir != None:
+            self._cas_store(temp_file)
+        fsync = self.args and self.args.fsync
+        if fsync == "file":
+            self._fsync_path(temp_file)
+        os.replace(temp_file, output_file)
+        if fsync == "file":
+            self._fsync_path(os.path.dirname(output_file))
+        elif fsync == "dir":
+            self.sync_file_list.append(output_file)
+    # end _commit_output_file()
+
+
+    def _create_output_dirs(self, job_list):
+        """
+        Create the output directories of all given jobs, checking each distinct directory once.
+
+        * job_list: list of jobs as created by _build_extract_jobs()
+        """
+        if self.output_archive != None or (self.args and self.args.explain):
+            return
+        dir_set = set([os.path.dirname(job['output_file']) for job in job_list])
+        for d in sorted(dir_set):
+            if not os.path.isdir(d):
+                self.create_dir(d)
+    # end _create_output_dirs()
+
+
+    def _create_restore_list_file(self, restore_ids):
+        """
+        Write the given objids to a new temporary file that can be given to pg_restore's --use-list option.
+        The file is removed by _cleanup_temp_files().
+
+        * restore_ids: list of objid values from objects in a list created by build_main_object_list
+
+        Returns the full path to the file
+        """
+        if self.args and self.args.temp != None:
+            tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', dir=self.args.temp, delete=False)
+        else:
+            tmp_restore_list = tempfile.NamedTemporaryFile(prefix='pg_extractor_restore_list', delete=False)
+        tmp_restore_list.close()
+        self.temp_filelist.append(tmp_restore_list.name)
+        fh = open(tmp_restore_list.name, 'w', encoding='utf-8', newline='\n')
+        for i in restore_ids:
+            fh.write(i + '\n')
+        fh.close()
+        return tmp_restore_list.name
+    # end _create_restore_list_file()
+
+
     def _create_temp_dump(self):
         """
         Create the temp dump file used for rest of script runtime.
+        If --resume found the temp dump of an unfinished run, that one is used instead.
         """
+        if self.resume_dump:
+            if not self.args.quiet:
+                print("Resuming unfinished run with existing temp dump file...")
+            return
+        if self.args.use_dump != None:
+            return
         if not self.args.quiet: 
             print("Creating temp dump file...")
         pg_dump_cmd = ["pg_dump"]
         pg_dump_cmd.append("--format=custom")
         # tmp_dump_file is created during _set_config() so it can be used elsewhere easily
         pg_dump_cmd.append("--file=" + self.tmp_dump_file.name)
-        if not self.args.getdata:
-            # Some object data is only placed in dump file when data is include (ex: sequence values).
-            # So include all data even in temp dump so that can be obtained.
-            pg_dump_cmd.append("--schema-only")
+        if self.args.backend == "catalog" and not self.args.explain:
+            pg_dump_cmd.append("--snapshot=" + self._open_catalog_snapshot())
+        # Some object data is only placed in dump file when data is included (ex: sequence values).
+        # _plan_temp_dump() works out when it is needed and which table filters pg_dump can apply already.
+        for option_list, reason in self._plan_temp_dump():
+            pg_dump_cmd.extend(option_list)
         if self.args.no_acl:
             pg_dump_cmd.append("--no-acl")
         if self.args.no_owner:
@@ -1023,18 +1838,41 @@ class PGExtractor:
         elif self.args.schema_exclude_file != None:
             for s in self._build_filter_list("file", self.args.schema_exclude_file, "--exclude-schema="):
                 pg_dump_cmd.append(s)
-        # Table include/exclude done in _filter_object_list(). Doing it here excludes all other objects in the dump file.
+        # Any other filtering is done in _filter_object_list()
         if self.args.debug:
             self._debug_print(pg_dump_cmd)
-        try:
+        cache_base, fingerprint, cache_hit = (None, None, False)
+        if self.args.dump_cache != None:
+            # The fingerprint is read before pg_dump runs, so any DDL during the dump makes the next run miss the cache
+            cache_base, fingerprint, cache_hit = self._dump_cache_lookup(pg_dump_cmd)
+        if cache_hit:
+            if not self.args.quiet:
+                print("Catalog unchanged. Reusing temp dump from --dump_cache...")
             self.tmp_dump_file.close()
-            subprocess.check_output(pg_dump_cmd, stderr=subprocess.STDOUT)
-        except subprocess.CalledProcessError as e:
-            print("Error in pg_dump command while creating template dump file: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
-            sys.exit(2)
-            raise
-
-        if self.args.keep_dump:
+            try:
+                shutil.copyfile(cache_base + ".pgr", self.tmp_dump_file.name)
+            except IOError as e:
+                print("Error while copying --dump_cache entry: " + e.strerror + ": " + e.filename)
+                sys.exit(2)
+        else:
+            self._trace_event("B", "pg_dump temp dump", "subprocess")
+            try:
+                self.tmp_dump_file.close()
+                subprocess.check_output(pg_dump_cmd, stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError as e:
+                self._trace_event("E", "pg_dump temp dump", "subprocess", args={'exit_code': e.returncode})
+                print("Error in pg_dump command while creating template dump file: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+                sys.exit(2)
+                raise
+            self._trace_event("E", "pg_dump temp dump", "subprocess", args={'exit_code': 0, 'bytes': os.path.getsize(self.tmp_dump_file.name)})
+            if cache_base != None and not self.args.explain:
+                self._dump_cache_save(cache_base, fingerprint, pg_dump_cmd)
+        if self.journal_fh != None:
+            # Only a complete dump may be reused, so the journal takes it over from the cleanup list here
+            self.temp_filelist.remove(self.tmp_dump_file.name)
+            self._write_journal("dump " + self.tmp_dump_file.name)
+
+        if self.args.keep_dump and not self.args.explain and (self.args.shard == None or self.args.shard[0] == 1):
             dest_file = os.path.join(self.create_dir(os.path.join(self.args.basedir, "dump")), "pg_extractor_dump.pgr")
             try:
                 shutil.copy(self.tmp_dump_file.name, dest_file)
@@ -1044,6 +1882,24 @@ class PGExtractor:
     # end _create_temp_dump()
 
 
+    def _data_chunk_dir(self, output_file):
+        """
+        Return the folder the --data_chunk_size files of a table's output file go in (ex: tables/public.orders.chunks).
+
+        * output_file: full path of the table's output file
+        """
+        return os.path.splitext(output_file)[0] + ".chunks"
+    # end _data_chunk_dir()
+
+
+    def _deadline_passed(self):
+        """
+        Check if the --deadline time budget of the run has been used up. Always False without --deadline.
+        """
+        return bool(self.args) and self.args.deadline != None and time.time() >= self.start_time + self.args.deadline
+    # end _deadline_passed()
+
+
     def _debug_print(self, *values, sep=None, end=None, file=None, flush=None):
         """
         Safe version of function __builtins__.print(...),
@@ -1095,18 +1951,701 @@ class PGExtractor:
     # end _debug_print()
 
 
-    def _filter_object_list(self, main_object_list):
+    def _dedupe_schema_jobs(self, job_list):
         """
-        Apply any filter arguments that were given to the main object list generated from a pg_restore file
+        Find pg_restore jobs in different schemas whose output is the same apart from the schema name, for --dedupe_schemas.
+        All candidate objects are rendered by a single pg_restore --verbose call.
 
-        * main_object_list: dictionary list generated by build_main_object_list
+        * job_list: list of jobs as created by _build_extract_jobs()
 
-        Returns a dictionary list in the same format as was input, but with all active filters applied.
+        Returns the job list without the copies. Every copy is in the 'schema_copies' list of the job it is
+        made from and has the key 'copy_schemas' set to a tuple of that job's schema and its own.
         """
-        filtered_list = []
-        regex_exclude_list = []
-        regex_include_list = []
-        table_exclude_list = []
+        candidate_list = []
+        for job in job_list:
+            schema = job['object'].get('objschema')
+            if ( job['command'] == "pg_restore" and job['category'] in ("functions", "sequences", "other") and
+                    job['object'].get('objtype') != "SCHEMA" and schema != None and re.match(r'^[a-z_][a-z0-9_]*$', schema) ):
+                candidate_list.append(job)
+        if len(set([job['object'].get('objschema') for job in candidate_list])) < 2:
+            return job_list
+
+        if self.args and not self.args.quiet:
+            print("Finding objects that are the same in several schemas...")
+        restore_ids = []
+        for job in candidate_list:
+            restore_ids.extend(job['restore_ids'])
+        list_file = self._create_restore_list_file(restore_ids)
+        render_file = self._temp_output_file(list_file)
+        self.temp_filelist.append(render_file)
+        try:
+            self._run_pg_restore(list_file, render_file, verbose=True)
+        except subprocess.CalledProcessError as e:
+            print("Error in pg_restore command while looking for objects that are the same in several schemas: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+        fh = open(render_file, 'rb')
+        # Every entry starts with "--\n-- TOC entry <dump id> (class ...)" when pg_restore is verbose
+        part_list = re.split(rb'^--\n-- TOC entry (\d+) .*\n', fh.read(), flags=re.M)
+        fh.close()
+        entry_map = {}
+        for i in range(1, len(part_list) - 1, 2):
+            entry = re.sub(rb'^-- Dependencies: .*\n', b'', part_list[i+1], flags=re.M)
+            for footer in (b'\n-- Completed on ', b'\n--\n-- PostgreSQL database dump complete'):
+                if footer in entry:
+                    entry = entry[:entry.index(footer)]
+            entry = entry.rstrip(b'-\n ')
+            entry_map[int(part_list[i])] = (i, entry)
+
+        group_map = {}
+        copy_count = 0
+        copy_set = set()
+        for job in candidate_list:
+            schema = job['object'].get('objschema')
+            entry_list = [entry_map[d] for d in set([int(i.split(';')[0]) for i in job['restore_ids']]) if d in entry_map]
+            if len(entry_list) == 0:
+                continue
+            text = b'\n'.join([e for i, e in sorted(entry_list)])
+            file_name = os.path.basename(job['output_file'])[len(schema) + 1:]
+            group_key = (job['category'], job['object'].get('objtype'), file_name, self._schema_substitute(text, schema, "\x00"))
+            for first_job, first_text in group_map.get(group_key, []):
+                first_schema = first_job['object'].get('objschema')
+                if self._schema_substitute(first_text, first_schema, schema) == text:
+                    job['copy_schemas'] = (first_schema, schema)
+                    first_job.setdefault('schema_copies', []).append(job)
+                    copy_set.add(id(job))
+                    copy_count += 1
+                    break
+            else:
+                group_map.setdefault(group_key, []).append((job, text))
+        if copy_count == 0:
+            return job_list
+
+        if self.args and self.args.dedupe_verify > 0:
+            copy_list = [job for job in candidate_list if id(job) in copy_set]
+            for job in random.sample(copy_list, min(self.args.dedupe_verify, len(copy_list))):
+                job['copy_verify'] = True
+        if self.args and self.args.debug:
+            self._debug_print("\nSCHEMA COPIES")
+            for job in job_list:
+                for copy_job in job.get('schema_copies', []):
+                    self._debug_print(copy_job['output_file'] + " <- " + job['output_file'] + (" (verify)" if copy_job.get('copy_verify') else ""))
+        if self.args and not self.args.quiet:
+            print("Found " + str(copy_count) + " objects that are the same in another schema. They are written from the first schema's output.")
+        return [job for job in job_list if id(job) not in copy_set]
+    # end _dedupe_schema_jobs()
+
+
+    def _dump_cache_lookup(self, pg_dump_cmd):
+        """
+        Find the --dump_cache entry for the given temp dump command, keyed by its connection settings, pg_dump version and options.
+
+        * pg_dump_cmd: the full pg_dump command of the temp dump
+
+        Returns a tuple of the path of the entry without its file extension, the current catalog fingerprint and
+        whether the entry holds a dump with that same fingerprint. The path is None if the temp dump can't be cached.
+        """
+        if "--schema-only" not in pg_dump_cmd:
+            if not self.args.quiet:
+                print("Temp dump includes table data. Not using --dump_cache.")
+            return (None, None, False)
+        fingerprint = self._catalog_fingerprint()
+        if fingerprint == None:
+            if not self.args.quiet:
+                print("Catalog fingerprint requires PostgreSQL 9.5 or greater. Not using --dump_cache.")
+            return (None, None, False)
+        key = hashlib.sha256()
+        for e in ("PGHOST", "PGHOSTADDR", "PGPORT", "PGDATABASE", "PGSERVICE", "PGUSER"):
+            key.update((e + "=" + os.environ.get(e, "") + "\n").encode('utf-8'))
+        key.update(subprocess.check_output(["pg_dump", "--version"]))
+        for c in pg_dump_cmd:
+            if not c.startswith("--file=") and not c.startswith("--snapshot="):
+                key.update((c + "\n").encode('utf-8'))
+        if self.args.explain:
+            # --explain only reads the cache, so the folder is not created
+            cache_base = os.path.join(self.args.dump_cache, key.hexdigest())
+        else:
+            cache_base = os.path.join(self.create_dir(self.args.dump_cache), key.hexdigest())
+        cache_hit = False
+        if os.path.isfile(cache_base + ".json") and os.path.isfile(cache_base + ".pgr"):
+            try:
+                with open(cache_base + ".json", 'r', encoding='utf-8') as fh:
+                    cache_hit = json.load(fh).get('fingerprint') == fingerprint
+            except ValueError:
+                # A damaged entry is treated the same as a stale one and written again
+                pass
+        if self.args.debug:
+            self._debug_print("DUMP CACHE: " + cache_base + ", fingerprint: " + fingerprint + ", hit: " + str(cache_hit))
+        return (cache_base, fingerprint, cache_hit)
+    # end _dump_cache_lookup()
+
+
+    def _dump_cache_save(self, cache_base, fingerprint, pg_dump_cmd):
+        """
+        Store the temp dump that was just made in its --dump_cache entry, writing the fingerprint last.
+
+        * cache_base: path of the entry without its file extension, as returned by _dump_cache_lookup()
+        * fingerprint: catalog fingerprint read before the temp dump was made
+        * pg_dump_cmd: the full pg_dump command of the temp dump
+        """
+        try:
+            if os.path.isfile(cache_base + ".json"):
+                os.remove(cache_base + ".json")
+            shutil.copyfile(self.tmp_dump_file.name, cache_base + ".pgr.tmp")
+            os.replace(cache_base + ".pgr.tmp", cache_base + ".pgr")
+            with open(cache_base + ".json.tmp", 'w', encoding='utf-8') as fh:
+                json.dump({'fingerprint': fingerprint
+                    , 'created': time.strftime('%Y-%m-%d %H:%M:%S %Z')
+                    , 'command': [c for c in pg_dump_cmd if not c.startswith("--file=") and not c.startswith("--snapshot=")]}, fh, indent=1)
+            os.replace(cache_base + ".json.tmp", cache_base + ".json")
+        except (IOError, OSError) as e:
+            print("Error while writing --dump_cache entry: " + str(e))
+            sys.exit(2)
+    # end _dump_cache_save()
+
+
+    def _explain_output_bytes(self, command):
+        """
+        Run a pg_dump or pg_restore command for --explain with its output thrown away.
+
+        * command: the command as a list
+
+        Returns a tuple of the number of bytes it output and the seconds it took
+        """
+        if self.args.debug:
+            self._debug_print("EXPLAIN COMMAND: " + str(command))
+        output_bytes = 0
+        error_fh = tempfile.TemporaryFile()
+        start_time = time.time()
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=error_fh)
+        for chunk in iter(lambda: proc.stdout.read(65536), b''):
+            output_bytes += len(chunk)
+        proc.stdout.close()
+        if proc.wait() != 0:
+            error_fh.seek(0)
+            print("Error in " + command[0] + " command during --explain: " + str(error_fh.read(), encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(command))
+            sys.exit(2)
+        error_fh.close()
+        return (output_bytes, time.time() - start_time)
+    # end _explain_output_bytes()
+
+
+    def _filter_object_list(self, main_object_list):
+        """
+        Apply any filter arguments that were given to the main object list generated from a pg_restore file
+
+        * main_object_list: dictionary list generated by build_main_object_list
+
+        Returns a dictionary list in the same format as was input, but with all active filters applied.
+        """
+        filtered_list = list(self._iter_filter_objects(main_object_list))
+
+        if self.args.debug:
+            self._debug_print("\nFILTERED OBJECT LIST")
+            for o in filtered_list:
+                self._debug_print(o)
+        return filtered_list
+    # end _filter_object_list()
+
+
+    def _find_dependency_cycles(self, depends_on):
+        """
+        Find the groups of files that depend on each other, directly or through other files (iterative Tarjan's algorithm).
+
+        * depends_on: dictionary of each file to the set of files it depends on
+
+        Returns a list of sets of files. Files that are not part of a cycle are not included.
+        """
+        index_map = {}
+        low_map = {}
+        stack = []
+        on_stack = set()
+        cycle_list = []
+        for root in depends_on:
+            if root in index_map:
+                continue
+            index_map[root] = low_map[root] = len(index_map)
+            stack.append(root)
+            on_stack.add(root)
+            work_list = [(root, iter(depends_on[root]))]
+            while len(work_list) > 0:
+                f, dependency_iter = work_list[-1]
+                for d in dependency_iter:
+                    if d not in index_map:
+                        index_map[d] = low_map[d] = len(index_map)
+                        stack.append(d)
+                        on_stack.add(d)
+                        work_list.append((d, iter(depends_on[d])))
+                        break
+                    elif d in on_stack:
+                        low_map[f] = min(low_map[f], index_map[d])
+                else:
+                    work_list.pop()
+                    if len(work_list) > 0:
+                        parent = work_list[-1][0]
+                        low_map[parent] = min(low_map[parent], low_map[f])
+                    if low_map[f] == index_map[f]:
+                        cycle_set = set()
+                        while True:
+                            d = stack.pop()
+                            on_stack.discard(d)
+                            cycle_set.add(d)
+                            if d == f:
+                                break
+                        if len(cycle_set) > 1:
+                            cycle_list.append(cycle_set)
+        return cycle_list
+    # end _find_dependency_cycles()
+
+
+    def _finish_extract_job(self, job, duration, error, start_time=None, exit_code=None):
+        """
+        Commit the output of an extraction job if it succeeded. The size in the result includes any data chunk files.
+        A job of a --profiles profile is finished with that profile's options.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+        * duration: seconds the job took to run
+        * error: None if the job succeeded, otherwise the error message
+        * start_time: time.time() value of when the job started, for --trace_file
+        * exit_code: exit code of the job's pg_dump, pg_restore or psql call, for --trace_file
+
+        Returns an ExtractResult for the job. Its --dedupe_schemas copies are committed along with it, see _iter_extract_jobs().
+        """
+        run_args = self.args
+        if job.get('profile') != None:
+            self.args = job['profile']
+        try:
+            file_size = None
+            if error != None:
+                if job.get('slice_group') != None:
+                    self._finish_table_slice(job, False)
+            else:
+                file_size = os.path.getsize(self._temp_output_file(job['output_file']))
+                file_size += self._commit_extract_job(job)
+                for copy_job in job.get('schema_copies', []):
+                    copy_job['bytes'] = os.path.getsize(self._temp_output_file(copy_job['output_file']))
+                    self._commit_extract_job(copy_job)
+                if job.get('slice_group') != None:
+                    self._finish_table_slice(job, True)
+            if self.trace_events != None and start_time != None:
+                o = job['object']
+                trace_name = job['command'] + " " + os.path.relpath(job['output_file'], self.args.basedir)
+                self._trace_event("B", trace_name, "job", job['worker'], start_time)
+                self._trace_event("E", trace_name, "job", job['worker'], start_time + (duration or 0)
+                    , {'object': o.get('objtype') + " " + str(o.get('objschema')) + "." + str(o.get('objname'))
+                    , 'worker': job['worker'], 'exit_code': exit_code, 'bytes': file_size, 'error': error})
+            return ExtractResult(job['output_file'], file_size, duration, error)
+        finally:
+            self.args = run_args
+    # end _finish_extract_job()
+
+
+    def _finish_extract_job_process(self, recv_conn, p, job):
+        """
+        Collect the result of an extraction job run by _start_extract_job_process() once it has finished,
+        and commit its output if it succeeded.
+
+        * recv_conn: receiving end of the job's result Pipe
+        * p: the job's Process
+        * job: a job dictionary as created by _build_extract_jobs()
+
+        Returns an ExtractResult for the job
+        """
+        try:
+            start_time, duration, error, exit_code = recv_conn.recv()
+        except EOFError:
+            start_time, duration, error, exit_code = None, None, None, None
+        recv_conn.close()
+        p.join()
+        if p.exitcode != 0 and error == None:
+            error = "Error in job: name={!r} exitcode={!r}".format(p.name, p.exitcode)
+        return self._finish_extract_job(job, duration, error, start_time, exit_code)
+    # end _finish_extract_job_process()
+
+
+    def _finish_journal(self):
+        """
+        Remove the --resume run journal and the temp dump it kept once a run has finished successfully.
+        """
+        if self.journal_fh == None:
+            return
+        journal_file = self.journal_fh.name
+        self.journal_fh.close()
+        os.remove(journal_file)
+        if not self.tmp_dump_file.closed:
+            self.tmp_dump_file.close()
+        if os.path.exists(self.tmp_dump_file.name):
+            os.remove(self.tmp_dump_file.name)
+        self.journal_done = set()
+    # end _finish_journal()
+
+
+    def _finish_table_slice(self, job, succeeded):
+        """
+        Count a finished job of a --table_slices table. Once all have finished, end its snapshot session and write its manifest.json.
+
+        * job: a job dictionary of the table's slice group
+        * succeeded: True if the job's output was committed
+        """
+        group = job['slice_group']
+        group['finished_count'] += 1
+        if not succeeded:
+            group['failed'] = True
+        if group['finished_count'] < len(group['job_list']):
+            return
+        self._close_table_slices(group)
+        if group['failed']:
+            return
+        o = group['object']
+        chunk_list = []
+        for slice_job in group['job_list'][1:]:
+            file_size = None
+            if self.output_archive == None:
+                file_size = os.path.getsize(slice_job['output_file'])
+            chunk_list.append(OrderedDict([('file', os.path.basename(slice_job['output_file'])), ('table', o.get('objschema') + "." + o.get('objname'))
+                , ('range', slice_job['slice_range']), ('bytes', file_size)]))
+        chunk_dir = self._data_chunk_dir(group['job_list'][0]['output_file'])
+        manifest_file = os.path.join(chunk_dir, "manifest.json")
+        temp_file = self._temp_output_file(manifest_file)
+        fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+        json.dump(OrderedDict([('version', 1), ('file', os.path.basename(group['job_list'][0]['output_file']))
+            , ('slices', len(chunk_list)), ('chunks', chunk_list)]), fh, indent=1)
+        fh.close()
+        self._commit_output_file(temp_file, manifest_file)
+        if self.output_archive == None:
+            keep_file_set = set(["manifest.json"] + [c['file'] for c in chunk_list])
+            for f in os.listdir(chunk_dir):
+                if not f.startswith('.') and f not in keep_file_set:
+                    os.remove(os.path.join(chunk_dir, f))
+    # end _finish_table_slice()
+
+
+    def _fsync_path(self, path):
+        """
+        Flush a file or directory to disk.
+
+        * path: full path to the file or directory
+        """
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    # end _fsync_path()
+
+
+    def _index_job(self, job, temp_file):
+        """
+        Replace the --index rows of a job's output file with one row for every object the file now contains.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+        * temp_file: full path to the job's finished output file before it is committed
+        """
+        file_hash = hashlib.sha256()
+        fh = open(temp_file, 'rb')
+        for chunk in iter(lambda: fh.read(1048576), b''):
+            file_hash.update(chunk)
+        fh.close()
+        file_size = os.path.getsize(temp_file)
+        extracted_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        output_file = os.path.relpath(job['output_file'], self.index_target_dir)
+
+        if job.get('restore_ids') == None:
+            index_object_list = [job['object']]
+            if job.get('partition_list') != None:
+                index_object_list.extend(job['partition_list'])
+        else:
+            index_object_list = [self.index_object_map[i] for i in job['restore_ids']]
+        self.index_db.execute("DELETE FROM objects WHERE output_file = ?", (output_file,))
+        self.index_db.executemany("INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(o.get('objid'), o.get('objtype'), o.get('objschema'), o.get('objname'), o.get('objbasename'), o.get('objowner')
+                , output_file, file_size, file_hash.hexdigest(), extracted_at) for o in index_object_list])
+        self.index_pending_count += 1
+        if self.index_pending_count >= 1000:
+            self.index_db.commit()
+            self.index_pending_count = 0
+    # end _index_job()
+
+
+    def _iter_extract_files(self, object_list, target_dir, extract_file_list):
+        """
+        Generator doing the work of create_extract_files(). Yields an ExtractResult for each file as soon as it has been extracted.
+
+        * object_list - a list in the format created by build_main_object_list
+        * target_dir - full path to the base output directory
+        * extract_file_list - list that the full paths of all files of the run are added to,
+            in the same way as create_extract_files() returns them
+        """
+        job_list = self._build_extract_jobs(object_list, target_dir)
+        job_list = self._order_extract_jobs(job_list, target_dir)
+        self.extract_job_list = job_list
+        if self.args and self.args.shard != None:
+            job_list = self._shard_extract_jobs(job_list, target_dir)
+        if self.args and self.args.table_slices != None:
+            job_list = self._slice_extract_jobs(job_list)
+        if self.args and self.args.backend == "catalog":
+            job_list = self._catalog_extract_jobs(job_list)
+            self._close_catalog_snapshot()
+        if self.args and self.args.dedupe_schemas:
+            job_list = self._dedupe_schema_jobs(job_list)
+        if self.args and self.args.index:
+            self._open_index(object_list, target_dir)
+        try:
+            yield from self._iter_extract_jobs(job_list, target_dir, extract_file_list)
+        finally:
+            for group in self.slice_group_list:
+                # Tables whose slices did not all run (ex: --deadline) still hold their snapshot
+                self._close_table_slices(group)
+            if self.index_db != None:
+                self._close_index(extract_file_list, target_dir)
+
+        # Handle if --orreplace is set with --schemadir. This must be done after view & function files have been exported.
+        # Files going to an --output_archive (or made with --shard or --deadline) were already changed when they were committed.
+        if self.args and self.args.orreplace and self.output_archive == None and self.args.shard == None and self.args.deadline == None:
+            self._or_replace_schemadirs(object_list, target_dir)
+
+        if self.args and self.args.debug:
+            self._debug_print("\nEXTRACT FILE LIST")
+            for f in extract_file_list:
+               self._debug_print(f)
+    # end _iter_extract_files()
+
+
+    def _iter_extract_jobs(self, job_list, target_dir, extract_file_list):
+        """
+        Generator that runs the given extraction jobs in order, in parallel if --jobs is set, and yields an
+        ExtractResult for each job once its output has been committed (or it failed).
+        Jobs not started before the --deadline are written to the carry-over file in target_dir.
+
+        * job_list: list of jobs as created by _build_extract_jobs(), or a generator of them (see _iter_stream_jobs()).
+            The next job is only taken from it once there is room to start it.
+        * target_dir: full path to the base output directory
+        * extract_file_list: list that the output files of all jobs are added to, including any that were carried over
+            or already extracted by a resumed run
+        """
+        carryover_list = []
+        batch_job_list = []
+        category_messages = {'tables': "Extracting tables..."
+            , 'functions': "Extracting functions & aggregates..."
+            , 'sequences': "Extracting sequences..."
+            , 'defaultprivs': "Extracting default privileges..."
+            , 'other': "Extracting remaining objects..."}
+        started_categories = set()
+
+        skipped_count = 0
+        max_jobs = 1
+        if self.args and self.args.jobs > 0:
+            max_jobs = self.args.jobs
+        self._throttle_start(max_jobs)
+        if self.jobs_auto:
+            self._tune_start(max_jobs)
+        # Parallel jobs currently running. Key is the receiving end of the job's result Pipe, value is (process, job)
+        running_jobs = {}
+        job_iter = iter(job_list)
+        next_job = next(job_iter, None)
+        try:
+            while next_job != None or len(running_jobs) > 0:
+                allowed_jobs = self._throttle_allowed_jobs()
+                while next_job != None and len(running_jobs) < allowed_jobs:
+                    job = next_job
+                    if ( len(self.journal_done) > 0 and
+                            all([os.path.relpath(f, self.args.basedir) in self.journal_done for f in self._job_output_files(job)]) ):
+                        # Already extracted by the unfinished run that --resume continues
+                        extract_file_list.extend(self._job_output_files(job))
+                        skipped_count += 1
+                        next_job = next(job_iter, None)
+                        continue
+                    if self._deadline_passed():
+                        carryover_list = [job] + list(job_iter)
+                        next_job = None
+                        break
+                    if self.args and not self.args.quiet and job['category'] not in started_categories:
+                        print(category_messages[job['category']])
+                    started_categories.add(job['category'])
+                    extract_file_list.extend(self._job_output_files(job))
+                    if job['command'] == "pg_restore":
+                        job['list_file'] = self._create_restore_list_file(job['restore_ids'])
+                        for copy_job in job.get('schema_copies', []):
+                            if copy_job.get('copy_verify'):
+                                copy_job['list_file'] = self._create_restore_list_file(copy_job['restore_ids'])
+                    if job.get('slice_group') != None and job['slice_group']['session'] == None:
+                        self._start_table_slices(job['slice_group'])
+                    if self.args and self.args.jobs > 0 and job['command'] != "catalog":
+                        # Lowest worker number not in use, so each one shows as its own line in --trace_file
+                        worker_set = set([j['worker'] for p, j in running_jobs.values()])
+                        job['worker'] = min(set(range(1, len(running_jobs) + 2)) - worker_set)
+                        recv_conn, p = self._start_extract_job_process(job)
+                        running_jobs[recv_conn] = (p, job)
+                        next_job = next(job_iter, None)
+                    else:
+                        # --backend catalog jobs only write out a definition that was already read, so they run in the main process
+                        job['worker'] = 0 if job['command'] == "catalog" else 1
+                        start_time = time.time()
+                        error = self._run_extract_job(job)
+                        result = self._finish_extract_job(job, time.time() - start_time, error, start_time, self.job_exit_code)
+                        self._throttle_written(result.bytes)
+                        yield result
+                        for copy_job in job.get('schema_copies', []):
+                            yield ExtractResult(copy_job['output_file'], copy_job.get('bytes'), 0.0, result.error)
+                        next_job = next(job_iter, None)
+                        # Let the governor decide again before the next job
+                        break
+                if len(running_jobs) > 0:
+                    # Start the next job as soon as any running one is done or the governor may allow more
+                    for recv_conn in wait_connections(list(running_jobs.keys()), self._throttle_delay()):
+                        p, job = running_jobs.pop(recv_conn)
+                        result = self._finish_extract_job_process(recv_conn, p, job)
+                        self._throttle_written(result.bytes)
+                        if self.jobs_auto:
+                            self._tune_jobs(result)
+                        yield result
+                        for copy_job in job.get('schema_copies', []):
+                            yield ExtractResult(copy_job['output_file'], copy_job.get('bytes'), 0.0, result.error)
+                elif next_job != None and allowed_jobs == 0:
+                    if self._deadline_passed():
+                        carryover_list = [next_job] + list(job_iter)
+                        next_job = None
+                    else:
+                        time.sleep(self._throttle_delay())
+        finally:
+            # Only left over when the run ends early
+            self._stop_extract_jobs(running_jobs)
+        if len(self.sync_file_list) > 0:
+            self._sync_output_dirs()
+
+        if skipped_count > 0 and not self.args.quiet:
+            print("Skipped " + str(skipped_count) + " objects already extracted by the resumed run.")
+        if self.jobs_auto:
+            self._tune_save()
+        if self.args and not self.args.quiet:
+            self._throttle_summary()
+            if self.jobs_auto:
+                self._tune_summary()
+
+        if self.args:
+            # Also clears the carry-over of a previous run once everything has been extracted
+            self._write_carryover(target_dir, [f for j in carryover_list for f in self._job_output_files(j)])
+            if len(carryover_list) > 0 and not self.args.quiet:
+                print("Deadline reached. " + str(len(carryover_list)) + " objects were not extracted and will be extracted first on the next run.")
+        # Objects that were not extracted keep their existing files
+        extract_file_list.extend([f for j in carryover_list for f in self._job_output_files(j)])
+    # end _iter_extract_jobs()
+
+
+    def _iter_extract_profiles(self):
+        """
+        Generator doing the work of iter_extract() for --profiles, with one temp dump and --jobs pool shared by all profiles.
+        """
+        run_args = self.args
+        # Every profile has to find its objects in the shared temp dump, so it holds what any of them asks for.
+        # A table or view filter is only pushed into the dump when all profiles use the same one.
+        dump_args = copy.copy(run_args)
+        for a in vars(dump_args):
+            if a.startswith("get") and a != "getall":
+                setattr(dump_args, a, any([getattr(p, a) for n, p in self.profile_list]))
+        for a in ("table_include", "table_include_file", "table_exclude", "table_exclude_file", "view_include", "view_include_file"):
+            value_set = set([getattr(p, a) for n, p in self.profile_list])
+            setattr(dump_args, a, value_set.pop() if len(value_set) == 1 else None)
+        self.args = dump_args
+        self._trace_event("B", "temp dump", "phase")
+        self._create_temp_dump()
+        self._trace_event("E", "temp dump", "phase")
+        self._trace_event("B", "object list", "phase")
+        main_object_list = self.build_main_object_list(dependencies=any([p.group_partitions or p.plan for n, p in self.profile_list]))
+        self._trace_event("E", "object list", "phase", args={'objects': len(main_object_list)})
+
+        job_list = []
+        profile_job_list = []
+        for profile_name, profile_args in self.profile_list:
+            self.args = profile_args
+            filtered_list = self._filter_object_list(main_object_list)
+            jobs = self._order_extract_jobs(self._build_extract_jobs(filtered_list, profile_args.basedir), profile_args.basedir)
+            for job in jobs:
+                # _run_extract_job() and _finish_extract_job() use the options of the job's own profile
+                job['profile'] = profile_args
+            profile_job_list.append((filtered_list, jobs))
+            if run_args.backend == "catalog":
+                self._catalog_extract_jobs(jobs)
+            if run_args.dedupe_schemas:
+                job_list.extend(self._dedupe_schema_jobs(jobs))
+            else:
+                job_list.extend(jobs)
+        self.args = run_args
+        self._close_catalog_snapshot()
+        extract_file_list = []
+        self._trace_event("B", "extract", "phase")
+        yield from self._iter_extract_jobs(job_list, run_args.basedir, extract_file_list)
+        self._trace_event("E", "extract", "phase")
+
+        if any([p.getroles for n, p in self.profile_list]):
+            # Roles are the same for every profile, so pg_dumpall only runs once
+            self.role_statements = self._read_roles()
+        for (profile_name, profile_args), (filtered_list, jobs) in zip(self.profile_list, profile_job_list):
+            self.args = profile_args
+            self._trace_event("B", "profile " + profile_name, "phase")
+            profile_file_list = [job['output_file'] for job in jobs]
+            if profile_args.orreplace:
+                self._or_replace_schemadirs(filtered_list, profile_args.basedir)
+                self.or_replace()
+            if profile_args.plan:
+                self.extract_job_list = jobs
+                self._write_apply_plan(main_object_list, profile_args.basedir)
+            if profile_args.getroles:
+                yield from self._iter_extract_roles(profile_file_list)
+            if profile_args.delete:
+                self.delete_files(profile_file_list)
+            self._trace_event("E", "profile " + profile_name, "phase")
+        self.args = run_args
+        self.role_statements = None
+    # end _iter_extract_profiles()
+
+
+    def _iter_extract_roles(self, extract_file_list):
+        """
+        Generator that extracts the roles with extract_roles() and yields an ExtractResult for each role file.
+        All role files get the duration of the whole pg_dumpall run.
+
+        * extract_file_list: list that the full paths of the role files are added to
+        """
+        self._trace_event("B", "roles", "phase")
+        start_time = time.time()
+        role_file_list = self.extract_roles()
+        duration = time.time() - start_time
+        for f in role_file_list:
+            file_size = None
+            if self.output_archive == None:
+                file_size = os.path.getsize(f)
+            yield ExtractResult(f, file_size, duration, None)
+        extract_file_list.extend(role_file_list)
+        self._trace_event("E", "roles", "phase")
+    # end _iter_extract_roles()
+
+
+    def _iter_extract_stream(self, target_dir, extract_file_list):
+        """
+        Generator doing the work of _iter_extract_files() while pg_restore -l is still listing the temp dump, see _iter_stream_jobs().
+
+        * target_dir: full path to the base output directory
+        * extract_file_list: list that the full paths of all files of the run are added to
+        """
+        kept_list = []
+        yield from self._iter_extract_jobs(self._iter_stream_jobs(target_dir, kept_list), target_dir, extract_file_list)
+        # The schema objects --schemadir needs are among the kept ones
+        if self.args.orreplace and self.output_archive == None and self.args.deadline == None:
+            self._or_replace_schemadirs(kept_list, target_dir)
+    # end _iter_extract_stream()
+
+
+    def _iter_filter_objects(self, object_iter):
+        """
+        Generator that applies any filter arguments that were given to objects parsed from a pg_restore file, one object at a time.
+
+        * object_iter: iterable of objects in the format created by build_main_object_list
+
+        Yields the objects that all active filters keep, in the same order
+        """
+        regex_exclude_list = []
+        regex_include_list = []
+        table_exclude_list = []
         table_include_list = []
         view_exclude_list = []
         view_include_list = []
@@ -1148,7 +2687,7 @@ class PGExtractor:
         if self.args.owner_include_file != None:
             owner_include_list = self._build_filter_list("file", self.args.owner_include_file)
 
-        for o in main_object_list:
+        for o in object_iter:
             # Allow multiple regex lines to be matched against. Exclude then Include
             if o.get('objname') != None:
                 regex_continue = False
@@ -1195,7 +2734,7 @@ class PGExtractor:
             if (o.get('objtype') == 'SCHEMA'):
                 if(self.args.getschemata == False):
                     continue
-            if (o.get('objtype') == 'TYPE|DOMAIN'):
+            if (o.get('objtype') in ('TYPE', 'DOMAIN')):
                 if (self.args.gettypes == False):
                     continue
             if (o.get('objtype') == 'RULE'):
@@ -1214,20 +2753,535 @@ class PGExtractor:
                 if (self.args.getusermappings == False):
                     continue
 
-            filtered_list.append(o)
+            yield o
+    # end _iter_filter_objects()
 
-        if self.args.debug:
-            self._debug_print("\nFILTERED OBJECT LIST")
-            for o in filtered_list:
-                self._debug_print(o)
-        return filtered_list
-    # end _filter_object_list()
+
+    def _iter_restore_list(self, restore_file="#default#", dependencies=False):
+        """
+        Generator that yields a PGObject for each object line of pg_restore -l output, read from a pipe as it is produced.
+
+        * restore_file: full path to a custom format (-Fc) pg_dump file 
+        * dependencies: also read the "depends on" lines of pg_restore -l --verbose into the objdeps field
+        """
+        if restore_file == "#default#":
+            restore_file = self.tmp_dump_file.name
+        debug = self.args and self.args.debug
+
+        p_objid = r'\d+;\s\d+\s\d+'
+        # Actual types extracted is controlled in create_extract_files(). This is list format mapping choices.
+        # Order of this list matters if the string starts with the same word (ex TABLE DATA before TABLE).
+        # If an object type is missing, please let me know and I'll add it.
+        p_types = r"ACL|AGGREGATE|COMMENT|CONSTRAINT|DATABASE|DEFAULT\sACL|DEFAULT|"
+        p_types += r"DOMAIN|EXTENSION|FK\sCONSTRAINT|FOREIGN\sTABLE|FUNCTION|"
+        p_types += r"INDEX\sATTACH|INDEX|RULE|SCHEMA|SEQUENCE\sOWNED\sBY|SEQUENCE\sSET|SEQUENCE|"
+        p_types += r"TABLE\sATTACH|TABLE\sDATA|TABLE|TRIGGER|TYPE|VIEW|MATERIALIZED\sVIEW\sDATA|MATERIALIZED\sVIEW|"
+        p_types += r"SERVER|USER\sMAPPING|PROCEDURE"
+        # Dispatcher. Classifies the line and, for the common object format, also extracts all of its fields.
+        p_line = re.compile(r'(?P<objid>' + p_objid + r')\s(?P<objtype>' + p_types + r')\s'
+                r'(?:(?P<objschema>\S+)\s(?P<objname>\S+)\s(?P<objowner>\S+))?')
+        # Type specific formats. These are matched against the remainder of the line after the object type.
+        p_function_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objname>.*\))\s'
+                r'(?P<objowner>\S+)')
+        p_extension_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objname>\S+)\s')
+        # Which comment format a COMMENT line uses. Alternatives are tried in order.
+        p_comment_kind = re.compile(r'(?P<function>\S+\s(?:FUNCTION|AGGREGATE|PROCEDURE))'
+                r'|(?P<extension>\-\sEXTENSION)'
+                r'|(?P<dash>\-\s)'
+                r'|(?P<rule>\S+\sRULE)')
+        p_comment_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objname>\S+)\s'
+                r'(?P<objowner>\S+)')
+        p_comment_extension_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objname>\S+)\s')
+        p_comment_function_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objname>.*\))\s'
+                r'(?P<objowner>\S+)')
+        p_comment_dash_mapping = re.compile(r'\-\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objname>\S+)\s'
+                r'(?P<objowner>\S+)')
+        p_comment_for_db_dash_mapping = re.compile(r'\-\s'
+                r'(?P<objname>\S+)\s'
+                r'(?P<objowner>\S+)')
+        p_comment_on_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objname>\S+)\s'
+                r'(?P<objsource>ON\s\S+)\s'
+                r'(?P<objowner>\S+)')
+        p_default_acl_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objstatement>DEFAULT PRIVILEGES FOR)\s'
+                r'(?P<objsubtype>\S+)\s'
+                r'(?P<objrole>\S+)')
+        p_96_rule_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objtable>\S+)\s'
+                r'(?P<objname>\S+)\s'
+                r'(?P<objowner>\S+)')
+        p_user_mapping_mapping = re.compile(r'(?P<objschema>\S+)\s'
+                r'(?P<objstatement>USER MAPPING)\s'
+                r'(?P<objusermapping>\S+)\s'
+                r'(?P<objserverstatement>\S+)\s'
+                r'(?P<objservername>\S+)\s'
+                r'(?P<objowner>\S+)')
+        special_types = set(["FUNCTION", "AGGREGATE", "PROCEDURE", "ACL", "EXTENSION", "COMMENT", "DEFAULT ACL", "USER MAPPING", "RULE"])
+        rule_96 = None
+
+        def parse_line(o):
+            """ Returns the PGObject for a single pg_restore -l line, or None if it is not an object line """
+            nonlocal rule_96
+            line_mapping = p_line.match(o)
+            if line_mapping is None:
+                return None
+            objtype = line_mapping.group('objtype')
+            if objtype not in special_types or (objtype == "ACL" and "(" not in o):
+                # all the other common object formats
+                if line_mapping.group('objschema') is None:
+                    raise ValueError('unexpected line in pg_restore list: {!r}'.format(o))
+                return PGObject(line_mapping.group('objid')
+                    , objtype=objtype
+                    , objschema=line_mapping.group('objschema')
+                    , objname=line_mapping.group('objname')
+                    , objowner=line_mapping.group('objowner'))
+
+            rest = o[line_mapping.end('objtype') + 1:]
+            obj_mapping = None
+            if objtype in ("FUNCTION", "AGGREGATE", "PROCEDURE") or objtype == "ACL":
+                # Matches function/agg or the ACL for them
+                paren = rest.find("(")
+                if objtype != "ACL" or (paren != -1 and rest.find(")", paren) != -1):
+                    obj_mapping = p_function_mapping.match(rest)
+                    if obj_mapping is not None:
+                        objname = obj_mapping.group('objname')
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objname=objname
+                            , objbasename=objname[:objname.find("(")]
+                            , objowner=obj_mapping.group('objowner'))
+                elif line_mapping.group('objschema') is not None:
+                    return PGObject(line_mapping.group('objid')
+                        , objtype=objtype
+                        , objschema=line_mapping.group('objschema')
+                        , objname=line_mapping.group('objname')
+                        , objowner=line_mapping.group('objowner'))
+            elif objtype == "EXTENSION":
+                obj_mapping = p_extension_mapping.match(rest)
+                if obj_mapping is not None:
+                    return PGObject(line_mapping.group('objid')
+                        , objtype=objtype
+                        , objschema=obj_mapping.group('objschema')
+                        , objname=obj_mapping.group('objname'))
+            elif objtype == "COMMENT":
+                comment_kind = p_comment_kind.match(rest)
+                comment_kind = comment_kind.lastgroup if comment_kind is not None else None
+                if comment_kind == "function":
+                    obj_mapping = p_comment_function_mapping.match(rest)
+                    if obj_mapping is not None:
+                        objname = obj_mapping.group('objname')
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objsubtype=obj_mapping.group('objsubtype')
+                            , objname=objname
+                            , objbasename=objname[:objname.find("(")]
+                            , objowner=obj_mapping.group('objowner'))
+                elif comment_kind == "extension":
+                    obj_mapping = p_comment_extension_mapping.match(rest)
+                    if obj_mapping is not None:
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objsubtype=obj_mapping.group('objsubtype')
+                            , objname=obj_mapping.group('objname'))
+                elif comment_kind == "dash":
+                    obj_mapping = p_comment_dash_mapping.match(rest)
+                    if obj_mapping is None:
+                        if p_comment_for_db_dash_mapping.match(rest) is not None:
+                            # we don't want saving a database's comment, so we're just skipping this line
+                            return None
+                    else:
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objsubtype=obj_mapping.group('objsubtype')
+                            , objname=obj_mapping.group('objname')
+                            , objowner=obj_mapping.group('objowner'))
+                elif comment_kind == "rule":
+                    obj_mapping = p_comment_on_mapping.match(rest)
+                    if obj_mapping is not None:
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objsubtype=obj_mapping.group('objsubtype')
+                            , objname=obj_mapping.group('objname')
+                            , objsource=obj_mapping.group('objsource')
+                            , objowner=obj_mapping.group('objowner'))
+                else:
+                    obj_mapping = p_comment_mapping.match(rest)
+                    if obj_mapping is not None:
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objsubtype=obj_mapping.group('objsubtype')
+                            , objname=obj_mapping.group('objname')
+                            , objowner=obj_mapping.group('objowner'))
+            elif objtype == "DEFAULT ACL":
+                obj_mapping = p_default_acl_mapping.match(rest)
+                if obj_mapping is not None:
+                    return PGObject(line_mapping.group('objid')
+                        , objtype=objtype
+                        , objschema=obj_mapping.group('objschema')
+                        , objstatement=obj_mapping.group('objstatement')
+                        , objsubtype=obj_mapping.group('objsubtype')
+                        , objrole=obj_mapping.group('objrole'))
+            elif objtype == "USER MAPPING":
+                obj_mapping = p_user_mapping_mapping.match(rest)
+                if obj_mapping is not None:
+                    return PGObject(line_mapping.group('objid')
+                        , objtype=objtype
+                        , objschema=obj_mapping.group('objschema')
+                        , objstatement=obj_mapping.group('objstatement')
+                        , objusermapping=obj_mapping.group('objusermapping')
+                        , objserverstatement=obj_mapping.group('objserverstatement')
+                        , objservername=obj_mapping.group('objservername')
+                        , objowner=obj_mapping.group('objowner'))
+            elif objtype == "RULE":
+                if rule_96 is None:
+                    # Only look up the binary version once, and only if the list actually contains rules
+                    rule_96 = self._check_bin_version("pg_restore", "9.6")
+                    if rule_96 and debug:
+                        print("VERSION EXCEPTION: 9.6 rule build_main_object_list")
+                if rule_96:
+                    # The pg_restore -l line changed in 9.6 for RULES
+                    obj_mapping = p_96_rule_mapping.match(rest)
+                    if obj_mapping is not None:
+                        return PGObject(line_mapping.group('objid')
+                            , objtype=objtype
+                            , objschema=obj_mapping.group('objschema')
+                            , objtable=obj_mapping.group('objtable')
+                            , objname=obj_mapping.group('objname')
+                            , objowner=obj_mapping.group('objowner'))
+                elif line_mapping.group('objschema') is not None:
+                    return PGObject(line_mapping.group('objid')
+                        , objtype=objtype
+                        , objschema=line_mapping.group('objschema')
+                        , objname=line_mapping.group('objname')
+                        , objowner=line_mapping.group('objowner'))
+            raise ValueError('unexpected line in pg_restore list: {!r}'.format(o))
+        # end parse_line()
+
+        pg_restore_cmd = ["pg_restore", "--list", restore_file]
+        if dependencies:
+            pg_restore_cmd.append("--verbose")
+        if debug:
+            self._debug_print("\nPG_RESTORE LIST:")
+        self._trace_event("B", "pg_restore --list", "subprocess")
+        proc = subprocess.Popen(pg_restore_cmd, stdout=subprocess.PIPE, universal_newlines=True)
+        pending_object = None
+        try:
+            for o in proc.stdout:
+                o = o.rstrip('\n')
+                if debug:
+                    self._debug_print(o)
+                if o.startswith(';'):
+                    if pending_object is not None and o.startswith(';\tdepends on:'):
+                        pending_object.objdeps = tuple(int(d) for d in o[len(';\tdepends on:'):].split())
+                    continue
+                pg_object = parse_line(o)
+                if pg_object is None:
+                    continue
+                if dependencies:
+                    # Hold on to each object until its "depends on" line (if any) has been read
+                    if pending_object is not None:
+                        yield pending_object
+                    pending_object = pg_object
+                else:
+                    yield pg_object
+            if pending_object is not None:
+                yield pending_object
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+            self._trace_event("E", "pg_restore --list", "subprocess", args={'exit_code': returncode})
+
+        if returncode != 0:
+            print("Error in pg_restore when generating main object list: " + str(pg_restore_cmd))
+            sys.exit(2)
+    # end _iter_restore_list()
+
+
+    def _iter_stream_jobs(self, target_dir, kept_list):
+        """
+        Generator that yields the extraction jobs of the temp dump's filtered object list while pg_restore -l is still listing it.
+        Table and view jobs come as soon as their entry is read, the pg_restore jobs once the whole list has been read.
+
+        * target_dir: full path to the base output directory
+        * kept_list: list that the kept objects are added to
+        """
+        keep_types = set(["ACL", "AGGREGATE", "COMMENT", "DEFAULT ACL", "DOMAIN", "EXTENSION", "FUNCTION", "PROCEDURE", "RULE", "SCHEMA"
+            , "SEQUENCE", "SEQUENCE OWNED BY", "SEQUENCE SET", "SERVER", "TRIGGER", "TYPE", "USER MAPPING"])
+        # Comments on columns, tables, indexes, etc are part of the pg_dump output of their table
+        p_comment_keep = re.compile(r'FUNCTION|AGGREGATE|PROCEDURE|SEQUENCE|RULE|SCHEMA|TRIGGER|TYPE|EXTENSION|DOMAIN')
+        pgdump_types = set(PGDUMP_TYPES)
+        dir_set = set()
+        table_count = 0
+        self._trace_event("B", "object list", "phase")
+        for o in self._iter_filter_objects(self._iter_restore_list()):
+            objtype = o.get('objtype')
+            if objtype in pgdump_types:
+                job = self._table_job(o, target_dir)
+                if os.path.dirname(job['output_file']) not in dir_set:
+                    dir_set.add(os.path.dirname(job['output_file']))
+                    self._create_output_dirs([job])
+                table_count += 1
+                yield job
+            elif objtype in keep_types and (objtype != "COMMENT" or p_comment_keep.search(o.get('objsubtype', '')) != None):
+                kept_list.append(o)
+        self._trace_event("E", "object list", "phase", args={'tables': table_count, 'kept': len(kept_list)})
+        yield from self._build_extract_jobs(kept_list, target_dir)
+    # end _iter_stream_jobs()
+
+
+    def _job_output_files(self, job):
+        """
+        Return the output files of a job, which are its own and those of its --dedupe_schemas copies.
+
+        * job: a job dictionary
+        """
+        return [job['output_file']] + [copy_job['output_file'] for copy_job in job.get('schema_copies', [])]
+    # end _job_output_files()
+
+
+    def _jobs_argument(self, value):
+        """
+        argparse type for --jobs. Accepts a number or "auto".
+        """
+        if value == "auto":
+            return value
+        try:
+            return int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError("must be a number or 'auto'")
+    # end _jobs_argument()
+
+
+    def _journal_job(self, job):
+        """
+        Record a successfully finished extraction job in the --resume run journal, if there is one.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+        """
+        if self.journal_fh != None:
+            self._write_journal("done " + os.path.relpath(job['output_file'], self.args.basedir))
+    # end _journal_job()
+
+
+    def _open_catalog_snapshot(self):
+        """
+        Start the --backend catalog session and export its snapshot for the temp dump to use as well.
+
+        Returns the snapshot name to give to pg_dump --snapshot
+        """
+        self.catalog_session = self._psql_session_open()
+        try:
+            self._psql_session_query(self.catalog_session, "BEGIN ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            snapshot = self._psql_session_query(self.catalog_session, "SELECT pg_catalog.pg_export_snapshot()")[0][0]
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while exporting the snapshot for --backend catalog: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+        return snapshot
+    # end _open_catalog_snapshot()
+
+
+    def _open_index(self, object_list, target_dir):
+        """
+        Open the --index database (a hidden SQLite file in the base output directory) and create its objects table if needed.
+        With --shard, every shard keeps its own database until merge_shards() combines them.
+
+        * object_list - a list in the format created by build_main_object_list
+        * target_dir - full path to the base output directory
+        """
+        self.index_db = sqlite3.connect(self._state_file(self.create_dir(target_dir), ".pg_extractor_index.db"))
+        self.index_db.execute("""CREATE TABLE IF NOT EXISTS objects (objid TEXT NOT NULL, objtype TEXT NOT NULL, objschema TEXT
+            , objname TEXT, objbasename TEXT, objowner TEXT, output_file TEXT NOT NULL, bytes INTEGER NOT NULL
+            , sha256 TEXT NOT NULL, extracted_at TEXT NOT NULL)""")
+        self.index_db.execute("CREATE INDEX IF NOT EXISTS objects_output_file_idx ON objects (output_file)")
+        self.index_db.execute("CREATE INDEX IF NOT EXISTS objects_name_idx ON objects (objschema, objname)")
+        self.index_db.execute("CREATE INDEX IF NOT EXISTS objects_owner_idx ON objects (objowner)")
+        self.index_db.commit()
+        self.index_target_dir = target_dir
+        self.index_object_map = dict([(o.get('objid'), o) for o in object_list])
+    # end _open_index()
+
+
+    def _open_journal(self):
+        """
+        Open the --resume run journal, loading the finished files of an unfinished run with the same options into journal_done.
+
+        Returns the full path of the temp dump file to reuse or None if a new one has to be created
+        """
+        journal_file = self._state_file(self.args.basedir, ".pg_extractor_journal")
+        # Options that do not change what is extracted can differ between the failed run and the resumed one
+        run_options = repr(sorted([(k, v) for k, v in vars(self.args).items() if k not in ("resume", "deadline", "jobs", "wait", "delete", "fsync", "max_write_rate", "throttle_probe", "throttle_limit", "throttle_interval", "debug", "quiet")]))
+        resume_dump_file = None
+        if os.path.isfile(journal_file):
+            journal_options = None
+            journal_dump_file = None
+            journal_done = set()
+            fh = open(journal_file, 'r', encoding='utf-8')
+            for line in fh:
+                if not line.endswith('\n'):
+                    # Last line was not completely written before the run stopped
+                    break
+                entry = line.rstrip('\n').split(" ", 1)
+                if entry[0] == "options":
+                    journal_options = entry[1]
+                elif entry[0] == "dump":
+                    journal_dump_file = entry[1]
+                elif entry[0] == "done":
+                    journal_done.add(entry[1])
+            fh.close()
+            if journal_options == run_options and journal_dump_file != None and os.path.isfile(journal_dump_file):
+                resume_dump_file = journal_dump_file
+                self.journal_done = journal_done
+            else:
+                if not self.args.quiet:
+                    print("Run journal in " + self.args.basedir + " was created with different options or has no usable temp dump. Starting a new run.")
+                if journal_dump_file != None and os.path.isfile(journal_dump_file):
+                    os.remove(journal_dump_file)
+        if resume_dump_file != None:
+            self.journal_fh = open(journal_file, 'a', encoding='utf-8', newline='\n')
+        else:
+            self.journal_fh = open(journal_file, 'w', encoding='utf-8', newline='\n')
+            self._write_journal("options " + run_options)
+        return resume_dump_file
+    # end _open_journal()
+
+
+    def _open_output_archive(self):
+        """
+        Open the --output_archive file in the format given by its extension, under a temporary name until _close_output_archive().
+        """
+        archive_file = self.args.output_archive
+        self.output_archive_temp_file = os.path.join(os.path.dirname(os.path.abspath(archive_file)), "." + os.path.basename(archive_file) + ".tmp")
+        self.temp_filelist.append(self.output_archive_temp_file)
+        if archive_file.endswith(".zip"):
+            self.output_archive = zipfile.ZipFile(self.output_archive_temp_file, 'w', zipfile.ZIP_DEFLATED)
+        elif archive_file.endswith(".tar.zst"):
+            try:
+                import zstandard
+            except ImportError:
+                print("--output_archive with a .tar.zst file requires the zstandard python module")
+                sys.exit(2)
+            fh = open(self.output_archive_temp_file, 'wb')
+            zst_writer = zstandard.ZstdCompressor().stream_writer(fh)
+            self.output_archive_fh_list = [zst_writer, fh]
+            self.output_archive = tarfile.open(fileobj=zst_writer, mode='w|')
+        else:
+            tar_modes = [(".tar", 'w'), (".tar.gz", 'w:gz'), (".tgz", 'w:gz'), (".tar.bz2", 'w:bz2'), (".tar.xz", 'w:xz')]
+            tar_mode = None
+            for extension, mode in tar_modes:
+                if archive_file.endswith(extension):
+                    tar_mode = mode
+            if tar_mode == None:
+                print("Unknown --output_archive file extension: " + archive_file + ". Must be one of .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz, .tar.zst, .zip")
+                sys.exit(2)
+            self.output_archive = tarfile.open(self.output_archive_temp_file, mode=tar_mode)
+        self.archive_temp_dir = tempfile.mkdtemp(prefix='pg_extractor', dir=self.args.temp)
+        self.temp_filelist.append(self.archive_temp_dir)
+    # end _open_output_archive()
+
+
+    def _or_replace_file(self, full_file_name, create_type):
+        """
+        Replace CREATE with CREATE OR REPLACE in a single function or view file.
+
+        * full_file_name: full path to the file
+        * create_type: FUNCTION or VIEW. As of V9.4beta2 MATERIALIZED VIEWS cannot use the "CREATE OR REPLACE" syntax,
+            so only plain views are changed.
+        """
+        for line in fileinput.input(full_file_name, inplace=True, mode='rb'):
+            # Newer versions of python already redirect stdout to a binary file when mode is 'rb'
+            out = getattr(sys.stdout, 'buffer', sys.stdout)
+            out.write(
+                re.sub(r'^CREATE ' + create_type + r'\b', "CREATE OR REPLACE " + create_type, line.decode()).encode()
+            )
+    # end _or_replace_file()
 
 
-    def _parse_arguments(self):
+    def _or_replace_schemadirs(self, object_list, target_dir):
+        """
+        Run or_replace() on the functions and views folders of every schema folder made by --schemadir.
+
+        * object_list: a list in the format created by build_main_object_list
+        * target_dir: full path to the base output directory
+        """
+        schema_list = self.build_type_object_list(object_list, ["SCHEMA"])
+        for o in schema_list:
+            target_dir_funcs = os.path.join(target_dir, o.get('objname'), "functions")
+            target_dir_views = os.path.join(target_dir, o.get('objname'), "views")
+            self.or_replace(target_dir_funcs, target_dir_views)
+    # end _or_replace_schemadirs()
+
+
+    def _order_extract_jobs(self, job_list, target_dir):
+        """
+        Sort the extraction jobs: --deadline carry-overs first, then each --priority rule in order, then everything else.
+
+        * job_list: list of jobs as created by _build_extract_jobs()
+        * target_dir: full path to the base output directory
+
+        Returns the sorted job list
+        """
+        carryover_set = set(self._read_carryover(target_dir))
+        priority_list = []
+        if self.args and self.args.priority != None:
+            priority_list = self._build_filter_list("csv", self.args.priority)
+        elif self.args and self.args.priority_file != None:
+            priority_list = self._build_filter_list("file", self.args.priority_file)
+        rule_list = []
+        for p in priority_list:
+            rule = p.split(":", 1)
+            if len(rule) != 2 or rule[0] not in ("schema", "type", "name"):
+                print("Invalid --priority rule: " + p + ". Must be in the format schema:<schema>, type:<object type> or name:<schema>.<object>")
+                sys.exit(2)
+            rule_list.append((rule[0], rule[1]))
+        if len(carryover_set) == 0 and len(rule_list) == 0:
+            return job_list
+
+        def job_rank(job):
+            o = job['object']
+            if os.path.relpath(job['output_file'], target_dir) in carryover_set:
+                return 0
+            for i, (rule_type, rule_value) in enumerate(rule_list):
+                if rule_type == "schema" and o.get('objschema') == rule_value:
+                    return i + 1
+                if rule_type == "type" and o.get('objtype') == rule_value.upper():
+                    return i + 1
+                if ( rule_type == "name" and o.get('objschema') != None and
+                        rule_value in (o.get('objschema') + "." + str(o.get('objname')), o.get('objschema') + "." + str(o.get('objbasename'))) ):
+                    return i + 1
+            return len(rule_list) + 1
+
+        job_list = sorted(job_list, key=job_rank)
+        if self.args and self.args.debug:
+            self._debug_print("\nEXTRACT JOB ORDER")
+            for job in job_list:
+                self._debug_print(job['output_file'])
+        return job_list
+    # end _order_extract_jobs()
+
+
+    def _parse_arguments(self, arg_list=None):
         """
         Parse command line arguments. 
         Sets self.args parameter for use throughout class/script.
+
+        * arg_list: list of arguments to parse instead of the script's command line
         """
         self.parser = argparse.ArgumentParser(description="A script for doing advanced dump filtering and managing schema for PostgreSQL databases. See NOTES section at the top of the script source for more details and examples.", epilog="NOTE: You can pass arguments via a file by passing the filename prefixed with an @ (instead of dashes). Each argument must be on its own line and its recommended to use the double-dash (--) options to make the formatting easiest. Ex: @argsfile.txt", fromfile_prefix_chars="@")
         args_conn = self.parser.add_argument_group(title="Database Connection")
@@ -1246,6 +3300,7 @@ class PGExtractor:
         args_dir.add_argument('--dbnamedir', help="By default, a directory is created with the name of the database being dumped to contain everything else. Set this if you want to change the name.")
         args_dir.add_argument('--nodbnamedir', action="store_true", help="Set this option if you do not want a directory with the database name to be created and used. All files/folders will then be created at either the --basedir or --hostnamedir level.")
         args_dir.add_argument('--pgbin', help="Full folder path of the required postgresql binaries if not located in $PATH: pg_dump, pg_restore, pg_dumpall.")
+        args_dir.add_argument('--output_archive', help="Full path to a single archive file to write all extracted files to instead of the --basedir folder. The format is set by the file extension: .tar, .tar.gz, .tar.bz2, .tar.xz, .tar.zst or .zip. Cannot be used with --delete or --resume.")
         args_dir.add_argument('--temp', help="Full folder path to use as temporary space. Defaults to system designated temporary space. Note that if you use --getdata, there must be enough temp space for a full, binary dump of the database in the temp location.")
 
         args_filter = self.parser.add_argument_group(title="Filters", description="All object names given in any filter MUST be fully schema qualified.")
@@ -1256,7 +3311,7 @@ class PGExtractor:
         args_filter.add_argument('--getfuncs', action="store_true", help="Export function, procedures and aggregate ddl. Overloaded functions will all be in the same base filename. Procedures and custom aggregates are put in a separate folder than regular functions. Included in --getall.")
         args_filter.add_argument('--gettypes', action="store_true", help="Export custom types and domains. Included in --getall.")
         args_filter.add_argument('--getextensions', action="store_true", help="Export extensions. Included in --getall. Note this only places a 'CREATE EXTENSION...' line in the file along with any associated COMMENTs. Extension source code is never dumped out with pg_dump. See PostgreSQL docs on extensions for more info.")
-        args_filter.add_argument('--getroles', action="store_true", help="Export all roles in the cluster to a single file. A different folder for this file can be specified by --rolesdir if it needs to be kept out of version control. Included in --getall.")
+        args_filter.add_argument('--getroles', action="store_true", help="Export all roles in the cluster to the 'roles' folder, one <role>.role.sql file per role. Included in --getall.")
         args_filter.add_argument('--getdefaultprivs', action="store_true", help="Export all the default privilges for roles if they have been set. See the ALTER DEFAULT PRIVILEGES statement for how these are set. Theese are extracted to the same 'roles' folder that --getroles uses. Included in --getall.")
         args_filter.add_argument('--getservers', action="store_true", help="Export servers. These include things like foreign data wrapper servers. Included in --getall.")
         args_filter.add_argument('--getusermappings', action="store_true", help="Exporter user mappings, often used in foreign data wrappers. Note that passwords will be exported in the clear. Included in --getall.")
@@ -1289,31 +3344,488 @@ class PGExtractor:
         args_filter.add_argument('-x', '--no_acl', '--no_privileges', action="store_true", help="Prevent dumping of access privileges (grant/revoke commands")
 
         args_misc = self.parser.add_argument_group(title="Misc")
-        args_misc.add_argument('-j','--jobs', type=int, default=0, help="Allows parallel running extraction jobs. Set this equal to the number of processors you want to use to allow that many jobs to start simultaneously. This uses multiprocessing library, not threading.")
+        args_misc.add_argument('-j','--jobs', type=self._jobs_argument, default=0, help="Allows parallel running extraction jobs. Set this equal to the number of processors you want to use to allow that many jobs to start simultaneously. This uses multiprocessing library, not threading. Set to 'auto' to have it tuned while running, starting from the best value of earlier runs (saved in ~/.pg_extractor_jobs.json).")
         args_misc.add_argument('--delete', action="store_true", help="Use when running again on the same destination directory as previous runs so that objects deleted from the database or items that don't match your filters also have their old files deleted. WARNING: This WILL delete ALL .sql files in the destination folder(s) which don't match your desired output and remove empty directories. Not required when using the --svndel or --gitdel option.")
         args_misc.add_argument('--clean', action="store_true", help="Adds DROP commands to the SQL output of all objects. WARNING: For overloaded function/aggregates, this adds drop commands for all versions to the single output file.")
         args_misc.add_argument('--orreplace', action="store_true", help="Modifies the function and view ddl files to replace CREATE with CREATE OR REPLACE.")
-        args_misc.add_argument('--remove_passwords', action="store_true", help="If roles are extracted (--getall or --getroles), this option will remove any password hashes from the resulting file.")
+        args_misc.add_argument('--group_partitions', action="store_true", help="Extract each partitioned table along with all of its partitions into the parent table's file with a single pg_dump call. Requires PostgreSQL 11+.")
+        args_misc.add_argument('--remove_passwords', action="store_true", help="If roles are extracted (--getall or --getroles), this option will remove any password hashes from the resulting files.")
+        args_misc.add_argument('--data_chunk_size', type=float, help="With --getdata, split each table's data into COPY chunk files of at most this many megabytes in a folder next to the table's file. A single row larger than this gets a larger chunk of its own. Cannot be used with -Fc, --inserts or --column_inserts.")
+        args_misc.add_argument('--table_slices', type=int, help="With --getdata, split the data of each table of at least --slice_min_size into this many slices that are extracted in parallel from the same snapshot, using up to --jobs at once. See README.")
+        args_misc.add_argument('--slice_min_size', type=float, default=1024, help="Size in megabytes a table must have to be split by --table_slices. (Default: 1024)")
         args_misc.add_argument('--inserts', action="store_true", help="Dump data as INSERT commands (rather than COPY). Only useful with --getdata option.")
         args_misc.add_argument('--column_inserts', '--attribute_inserts', action="store_true", help="Dump data as INSERT commands with explicit column names (INSERT INTO table (column, ...) VALUES ...). Only useful with --getdata option.")
+        args_misc.add_argument('--backend', choices=["dump", "catalog"], default="dump", help="How objects are extracted. 'dump' (default) runs pg_dump or pg_restore for every output file. 'catalog' reads functions, views and types with a few batched catalog queries instead. See README.")
+        args_misc.add_argument('--dedupe_schemas', action="store_true", help="For databases with many schemas holding the same objects (ex: a schema per tenant). Objects whose pg_restore output is the same apart from the schema name are extracted once and copied to the other schemas' files. See README.")
+        args_misc.add_argument('--dedupe_verify', type=int, default=0, help="Number of files written by --dedupe_schemas, picked at random, to also extract with pg_restore and compare. (Default: 0)")
+        args_misc.add_argument('--cas_dir', help="Folder of a content-addressed store shared by all runs that use it. Output files become links to a single stored copy of their content. Must be on the same filesystem as --basedir. See README.")
+        args_misc.add_argument('--cas_link', choices=["hard", "reflink"], default="hard", help="How output files are linked to --cas_dir. Files linked with 'hard' (default) must not be edited in place. 'reflink' makes copy-on-write clones and requires a filesystem that supports them (ex: Btrfs, XFS).")
+        args_misc.add_argument('--dump_cache', help="Folder to keep schema-only temp dumps in, to be reused by later runs as long as no DDL has changed the system catalogs. Requires PostgreSQL 9.5+. See README.")
         args_misc.add_argument('--keep_dump', action="store_true", help="""Keep a permanent copy of the pg_dump file used to generate the export files. Will only contain schemas designated by original options and will NOT contain data even if --getdata is set. Note that other items filtered out by pg_extractor (including tables) will still be included in the dump file. File will be put in a folder called "dump" under --basedir. """)
-        args_misc.add_argument('-w','--wait', default=0, type=float, help="Cause the script to pause for a given number of seconds between each object extraction. If --jobs is set, this is the wait time between parallel job batches. If dumping data, this can help to reduce write load.")
+        args_misc.add_argument('-w','--wait', default=0, type=float, help="Cause the script to pause for a given number of seconds after each object extraction. If --jobs is set, each job pauses before its process finishes. If dumping data, this can help to reduce write load.")
+        args_misc.add_argument('--max_write_rate', type=float, help="Limit the rate extracted files are written at to this many megabytes per second, averaged over time.")
+        args_misc.add_argument('--throttle_probe', help="Shell command that prints a measure of load on the database or host (ex: replication lag in seconds) as the last line of its output. While it is above --throttle_limit, fewer --jobs are run, down to pausing the extraction.")
+        args_misc.add_argument('--throttle_limit', type=float, help="Value of the --throttle_probe output above which extraction is slowed down.")
+        args_misc.add_argument('--throttle_interval', type=float, default=10, help="Seconds between --throttle_probe runs. (Default: 10)")
+        args_misc.add_argument('--deadline', type=float, help="Time budget for the run in seconds. Once it has passed, no new extraction is started and the objects left over are extracted first on the next run.")
+        args_misc.add_argument('--priority', help="CSV list of rules giving the order objects are extracted in. Each rule is schema:<schema>, type:<object type> or name:<schema>.<object>. Most useful along with --deadline.")
+        args_misc.add_argument('--priority_file', help="Path to a file listing --priority rules. Each rule goes on its own line. Comments can be preceded with #.")
+        args_misc.add_argument('--fsync', choices=["file", "dir", "off"], default="off", help="When extracted files are flushed to disk. 'file' flushes each file as soon as it is written (safest, slowest), 'dir' flushes each directory once extraction has finished and 'off' leaves it to the operating system. (Default: off)")
+        args_misc.add_argument('--shard', type=self._shard_argument, help="Split the extraction over several hosts writing to the same output directory. Given as I/N, this run only extracts shard I of N. Run --merge_shards once all have finished. See README.")
+        args_misc.add_argument('--merge_shards', action="store_true", help="Instead of extracting, combine the results of all --shard runs in the output directory once every shard has finished.")
+        args_misc.add_argument('--plan', action="store_true", help="Write an apply_plan.json file to the output directory that lists the extracted files in dependency ordered waves, to be applied with --apply_plan. See README.")
+        args_misc.add_argument('--apply_plan', help="Instead of extracting, apply the files listed in the given --plan file to the database set by the connection options, using up to --jobs sessions per wave.")
+        args_misc.add_argument('--index', action="store_true", help="Keep an SQLite index of all extracted objects and the files they are in, in a hidden .pg_extractor_index.db file in the output directory. See README.")
+        args_misc.add_argument('--resume', action="store_true", help="Keep a journal of finished objects in the output directory so a failed or interrupted run can be continued by running it again with the same options. The resumed run reuses the original run's temp dump.")
+        args_misc.add_argument('--profiles', help="Path to an INI file of output profiles, to make several extractions of the database from one temp dump. Each [section] is a profile with its own output directory and options. See README.")
+        args_misc.add_argument('--trace_file', help="Path to a file to write a timeline of the run's phases and extraction jobs to, in Chrome trace event JSON format. See README.")
+        args_misc.add_argument('--explain', action="store_true", help="Dry run that writes no output files, but prints the number of objects and files that would be extracted along with estimates of the output size and run time. See README.")
+        args_misc.add_argument('--use_dump', help="Path to an existing custom format dump file (ex: one kept with --keep_dump) for --explain to read instead of creating a new temp dump.")
         args_misc.add_argument('-q', '--quiet', action="store_true", help="Suppress all program output.")
         args_misc.add_argument('--version', action="store_true", help="Print the version number of pg_extractor.")
         args_misc.add_argument('--examples', action="store_true", help="Print out examples of command line usage.")
         args_misc.add_argument('--debug', action="store_true", help="Provide additional output to aid in debugging. Please run with this enabled and provide all results when reporting any issues.")
-        self.args = self.parser.parse_args()
+        self.args = self.parser.parse_args(arg_list)
     # end _parse_arguments()
 
-    def _run_pg_dump(self, o, output_file):
+
+    def _plan_temp_dump(self):
         """
-        Run pg_dump for a single object obtained from parsing a pg_restore -l list
+        Work out which object filters can be pushed into the pg_dump call that creates the temp dump.
+        A filter is only pushed when it cannot remove anything that _filter_object_list() would keep.
+
+        Returns a list of (option list, reason) tuples, one per decision. The option list is empty for filters
+        that had to be left to _filter_object_list().
+        """
+        plan = []
+        table_include_list = []
+        table_exclude_list = []
+        view_include_list = []
+        if self.args.table_include != None:
+            table_include_list = self._build_filter_list("csv", self.args.table_include)
+        if self.args.table_include_file != None:
+            table_include_list = self._build_filter_list("file", self.args.table_include_file)
+        if self.args.table_exclude != None:
+            table_exclude_list = self._build_filter_list("csv", self.args.table_exclude)
+        if self.args.table_exclude_file != None:
+            table_exclude_list = self._build_filter_list("file", self.args.table_exclude_file)
+        if self.args.view_include != None:
+            view_include_list = self._build_filter_list("csv", self.args.view_include)
+        if self.args.view_include_file != None:
+            view_include_list = self._build_filter_list("file", self.args.view_include_file)
+
+        def table_pattern(option, name):
+            # Filter list entries are schema.name
+            objschema, sep, objname = name.partition(".")
+            if sep == "":
+                return None
+            return option + self._quote_table(objschema, objname)
+
+        # Table data
+        if not self.args.getdata:
+            plan.append((["--schema-only"], "--getdata is not set"))
+        elif not self.args.getsequences:
+            plan.append((["--schema-only"], "table data is extracted by each table's own pg_dump and no sequence values are requested (--getsequences)"))
+        else:
+            # --exclude-table-data would also drop sequence values if it matched a sequence, so only named tables can be left out
+            data_exclude = [table_pattern("--exclude-table-data=", t) for t in table_include_list + table_exclude_list]
+            data_exclude = [t for t in data_exclude if t != None]
+            if len(data_exclude) > 0:
+                plan.append((data_exclude, "data of tables named in the table filters is not read from the temp dump"))
+            plan.append(([], "data of other tables is kept, sequence values are needed for --getsequences and pg_dump cannot exclude table data by type"))
+
+        # Objects
+        other_types = [a for a in ("getschemata", "getfuncs", "gettypes", "getdefaultprivs", "getextensions", "getservers"
+            , "getusermappings", "getsequences", "gettriggers", "getrules") if getattr(self.args, a)]
+        if len(other_types) > 0:
+            plan.append(([], "--table cannot be used, objects other than tables and views are requested: --" + ", --".join(other_types)))
+        elif not self.args.gettables and not self.args.getviews:
+            plan.append(([], "--table cannot be used, no tables or views are requested"))
+        elif (self.args.gettables and len(table_include_list) == 0) or (self.args.getviews and len(view_include_list) == 0):
+            plan.append(([], "--table cannot be used, all tables or views are requested"))
+        elif ( self.args.schema_include != None or self.args.schema_include_file != None or
+                self.args.schema_exclude != None or self.args.schema_exclude_file != None ):
+            plan.append(([], "--table cannot be used along with schema filters, pg_dump ignores those when --table is set"))
+        elif self.args.keep_dump:
+            plan.append(([], "--table is not used so the --keep_dump file still has all objects"))
+        else:
+            table_list = []
+            if self.args.gettables:
+                table_list.extend(table_include_list)
+            if self.args.getviews:
+                table_list.extend(view_include_list)
+            table_list = [table_pattern("--table=", t) for t in table_list]
+            table_list = [t for t in table_list if t != None]
+            if len(table_list) > 0:
+                plan.append((table_list, "only tables and views are requested and all of them are named in the include filters"))
+            else:
+                plan.append(([], "--table cannot be used, the include filters have no schema qualified names"))
+
+        post_filters = [a for a in ("owner_include", "owner_include_file", "owner_exclude", "owner_exclude_file", "function_include_file"
+            , "function_exclude_file", "regex_include_file", "regex_exclude_file") if getattr(self.args, a) != None]
+        if len(post_filters) > 0:
+            plan.append(([], "pg_dump has no equivalent of --" + ", --".join(post_filters)))
+        if self.args.debug:
+            self._debug_print("\nTEMP DUMP PLAN")
+            for option_list, reason in plan:
+                if len(option_list) > 0:
+                    self._debug_print("PUSHED " + " ".join(option_list) + ": " + reason)
+                else:
+                    self._debug_print("NOT PUSHED: " + reason)
+        return plan
+    # end _plan_temp_dump()
+
+
+    def _psql_session_close(self, session):
+        """
+        End a session started by _psql_session_open(). An open transaction is rolled back.
+
+        * session: the session dictionary
+        """
+        proc = session['proc']
+        if proc.poll() == None:
+            try:
+                proc.stdin.write(b"\\q\n")
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            proc.wait()
+        session['error_fh'].close()
+        if os.path.isfile(session['output_file']):
+            os.remove(session['output_file'])
+        if session['output_file'] in self.temp_filelist:
+            self.temp_filelist.remove(session['output_file'])
+    # end _psql_session_close()
+
+
+    def _psql_session_open(self):
+        """
+        Start a psql session that stays connected, along with any open transaction, for several _psql_session_query() calls.
+
+        Returns the session, a dictionary to pass to _psql_session_query() and _psql_session_close()
+        """
+        temp_dir = None
+        if self.args:
+            temp_dir = self.args.temp
+        output_fh = tempfile.NamedTemporaryFile(prefix='pg_extractor', dir=temp_dir, delete=False)
+        output_fh.close()
+        self.temp_filelist.append(output_fh.name)
+        psql_cmd = ["psql", "--no-psqlrc", "--quiet", "--no-align", "--tuples-only", "--field-separator-zero", "--set=ON_ERROR_STOP=1"]
+        if self.args and self.args.debug:
+            self._debug_print("PSQL SESSION: " + str(psql_cmd))
+        error_fh = tempfile.TemporaryFile(dir=temp_dir)
+        proc = subprocess.Popen(psql_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=error_fh)
+        return {'proc': proc, 'cmd': psql_cmd, 'output_file': output_fh.name, 'error_fh': error_fh, 'query_count': 0}
+    # end _psql_session_open()
+
+
+    def _psql_session_query(self, session, sql):
+        """
+        Run a single SQL statement in a session started by _psql_session_open() and wait for its result.
+
+        * session: the session dictionary
+        * sql: the statement to run
+
+        Returns a list of the result rows, each a list of its column values as strings. Values must not contain newlines.
+        Raises subprocess.CalledProcessError if the statement fails. psql then ends, so the session can't be used any more.
+        """
+        session['query_count'] += 1
+        # psql's output to a pipe is not flushed after every query, so the result goes to a file followed by a marker line
+        marker = "pg_extractor query " + str(session['query_count']) + " done"
+        # Emptied first, so the marker of the previous query is not found
+        open(session['output_file'], 'w').close()
+        if self.args and self.args.debug:
+            self._debug_print("PSQL SESSION QUERY: " + sql)
+        proc = session['proc']
+        script = ("\\o '" + session['output_file'].replace("'", "''") + "'\n" + sql.rstrip().rstrip(';') + ";\n"
+            + "\\qecho " + marker + "\n\\o\n")
+        try:
+            proc.stdin.write(script.encode('utf-8'))
+            proc.stdin.flush()
+        except BrokenPipeError:
+            pass
+        marker = (marker + "\n").encode('utf-8')
+        while True:
+            fh = open(session['output_file'], 'rb')
+            output = fh.read()
+            fh.close()
+            if output.endswith(marker):
+                break
+            if proc.poll() != None:
+                session['error_fh'].seek(0)
+                raise subprocess.CalledProcessError(proc.returncode, session['cmd'] + [sql], output=session['error_fh'].read())
+            time.sleep(0.01)
+        output = output[:-len(marker)].decode('utf-8')
+        return [line.split('\0') for line in output.split('\n') if line != ""]
+    # end _psql_session_query()
+
+
+    def _quote_table(self, objschema, objname):
+        """
+        Returns the schema qualified name of a table quoted the same as quote_ident() does (ex: "my""schema"."my.table").
+        """
+        return '"' + objschema.replace('"', '""') + '"."' + objname.replace('"', '""') + '"'
+    # end _quote_table()
+
+
+    def _read_carryover(self, target_dir):
+        """
+        Read the list of output files that a previous run could not extract before its --deadline.
+
+        * target_dir: full path to the base output directory the carry-over file is kept in
+
+        Returns a list of output file paths relative to target_dir
+        """
+        carryover_file = self._state_file(target_dir, ".pg_extractor_carryover")
+        carryover_list = []
+        if os.path.isfile(carryover_file):
+            fh = open(carryover_file, 'r', encoding='utf-8')
+            for line in fh:
+                if line.strip() != "" and not line.startswith('#'):
+                    carryover_list.append(line.rstrip('\n'))
+            fh.close()
+        return carryover_list
+    # end _read_carryover()
+
+
+    def _read_profiles(self, profile_file):
+        """
+        Read the output profiles of --profiles from an INI file, one per section with keys from PROFILE_OPTIONS.
+
+        * profile_file: path to the INI file
+
+        Returns a list of (profile name, options) tuples in file order. The options are a copy of self.args with
+        the profile's values set.
+        """
+        config = configparser.ConfigParser(interpolation=None)
+        # Keep option names case sensitive (ex: Fc)
+        config.optionxform = str
+        try:
+            if len(config.read(profile_file, encoding='utf-8')) == 0:
+                print("Cannot read --profiles file: " + profile_file)
+                sys.exit(2)
+        except configparser.Error as e:
+            print("Error in --profiles file: " + str(e))
+            sys.exit(2)
+        if len(config.sections()) == 0:
+            print("No profiles found in --profiles file: " + profile_file)
+            sys.exit(2)
+        default_dict = vars(PGExtractorOptions())
+        profile_list = []
+        for profile_name in config.sections():
+            arg_list = []
+            flag_dict = {}
+            for key, value in config.items(profile_name):
+                if key not in PROFILE_OPTIONS:
+                    print("Option " + key + " of profile " + profile_name + " cannot be set per profile. Profiles can set: " + ", ".join(PROFILE_OPTIONS))
+                    sys.exit(2)
+                if isinstance(default_dict[key], bool):
+                    try:
+                        flag_dict[key] = config.getboolean(profile_name, key)
+                    except ValueError:
+                        print("Option " + key + " of profile " + profile_name + " must be true or false")
+                        sys.exit(2)
+                else:
+                    arg_list.append("--" + key + "=" + value)
+            # Parse the values the same way as on the command line
+            p = PGExtractor()
+            p._parse_arguments(arg_list)
+            profile_args = copy.copy(self.args)
+            for key in config.options(profile_name):
+                if key in flag_dict:
+                    setattr(profile_args, key, flag_dict[key])
+                else:
+                    setattr(profile_args, key, getattr(p.args, key))
+            profile_list.append((profile_name, profile_args))
+        return profile_list
+    # end _read_profiles()
+
+
+    def _read_roles(self):
+        """
+        Read the roles of the database cluster with pg_dumpall --roles-only and split its output into the statements of each role.
+
+        Returns an OrderedDict of role name to its list of statements. Statements that do not belong to any single
+        role (other than SET) are under None.
+        """
+        pg_dumpall_cmd = ["pg_dumpall", "--roles-only"]
+        if (self._check_bin_version("pg_dumpall", "9.0") == True) and (self.args.dbname != None):
+            if self.args.debug:
+                print("VERSION EXCEPTION: 9.0 pg_dumpall rule")
+            pg_dumpall_cmd.append("--database=" + self.args.dbname)
+        if self.args.debug:
+            self._debug_print("\nEXTRACT ROLE STATEMENT: " + str(pg_dumpall_cmd))
+
+        p_ident = r'("(?:[^"]|"")+"|[^\s;,]+)'
+        p_role_statement = re.compile(r'(?:CREATE ROLE|ALTER ROLE|COMMENT ON ROLE|SECURITY LABEL FOR \S+ ON ROLE) ' + p_ident)
+        p_membership = re.compile(r'GRANT ' + p_ident + r' TO ' + p_ident)
+        p_quote = re.compile(r'[\'"]')
+        role_statements = OrderedDict()
+        statement = ""
+        # Quote character the statement read so far ends inside of, so semicolons and newlines in quoted strings are
+        # skipped over. Only each new line is scanned. A doubled quote inside a string closes and opens it again.
+        quote = None
+        self._trace_event("B", "pg_dumpall --roles-only", "subprocess")
+        proc = subprocess.Popen(pg_dumpall_cmd, stdout=subprocess.PIPE, universal_newlines=True)
+        try:
+            for line in proc.stdout:
+                if statement == "" and (line.startswith("--") or line.strip() == ""):
+                    continue
+                statement += line
+                for c in p_quote.findall(line):
+                    if quote == None:
+                        quote = c
+                    elif c == quote:
+                        quote = None
+                if quote != None or not line.rstrip().endswith(";"):
+                    continue
+                role = None
+                m = p_role_statement.match(statement) or p_membership.match(statement)
+                if m != None:
+                    role = m.group(m.lastindex)
+                    if role.startswith('"'):
+                        role = role[1:-1].replace('""', '"')
+                elif statement.startswith("SET "):
+                    statement = ""
+                    continue
+                role_statements.setdefault(role, []).append(statement)
+                statement = ""
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+            self._trace_event("E", "pg_dumpall --roles-only", "subprocess", args={'exit_code': returncode
+                , 'bytes': sum([len(st) for st_list in role_statements.values() for st in st_list])})
+        if returncode != 0:
+            print("Error in pg_dumpall command while extracting roles. Subprocess command called: " + str(pg_dumpall_cmd))
+            sys.exit(2)
+        return role_statements
+    # end _read_roles()
+
+
+    def _role_files(self):
+        """
+        Returns a list of the full paths to the role files an earlier run wrote to the roles folder of --basedir
+        """
+        roles_dir = os.path.join(self.args.basedir, "roles")
+        if self.output_archive != None or not os.path.isdir(roles_dir):
+            return []
+        return [os.path.join(roles_dir, f) for f in sorted(os.listdir(roles_dir)) if f == "roles.sql" or f.endswith(".role.sql")]
+    # end _role_files()
+
+
+    def _run_copy_slice(self, job, output_file):
+        """
+        Extract one --table_slices slice of a table's data with COPY ... TO STDOUT in the table's exported snapshot.
+
+        * job: a copy job created by _slice_extract_jobs(), after _start_table_slices() has run for its table
+        * output_file: target output file
+
+        Raises subprocess.CalledProcessError if psql fails
+        """
+        psql_cmd = ["psql", "--no-psqlrc", "--quiet", "--set=ON_ERROR_STOP=1"
+            , "--command=BEGIN ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+            , "--command=SET TRANSACTION SNAPSHOT '" + job['snapshot'] + "'"
+            , "--command=" + job['copy_sql']
+            , "--command=COMMIT"]
+        if self.args and self.args.debug:
+            self._debug_print("EXTRACT SLICE: " + str(psql_cmd))
+        fh = open(output_file, 'wb')
+        fh.write(job['copy_header'].encode('utf-8'))
+        fh.flush()
+        proc = subprocess.run(psql_cmd, stdout=fh, stderr=subprocess.PIPE)
+        fh.write(b"\\.\n")
+        fh.close()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, psql_cmd, output=proc.stderr)
+        if self.args and self.args.wait > 0:
+            time.sleep(self.args.wait)
+    # end _run_copy_slice()
+
+
+    def _run_extract_job(self, job):
+        """
+        Run the pg_dump, pg_restore or psql (--table_slices) call for a single job created by _build_extract_jobs()
+        or _slice_extract_jobs(), or write out the definition of a --backend catalog job.
+        pg_restore jobs must already have their list_file set by _run_extract_jobs().
+        The output is written to the job's temporary file, see _commit_extract_job().
+        A job of a --profiles profile is run with that profile's options.
+
+        * job: a job dictionary
+
+        Returns None if the job succeeded, otherwise the error message. The exit code of the call is kept in job_exit_code.
+        """
+        self.job_exit_code = 0
+        run_args = self.args
+        if job.get('profile') != None:
+            self.args = job['profile']
+        try:
+            if job['command'] == "pg_dump":
+                chunk_dir = None
+                if self.args and self.args.data_chunk_size != None:
+                    chunk_dir = self._data_chunk_dir(job['output_file'])
+                self._run_pg_dump(job['object'], self._temp_output_file(job['output_file']), job.get('partition_list'), chunk_dir, job.get('snapshot'))
+            elif job['command'] == "copy":
+                self._run_copy_slice(job, self._temp_output_file(job['output_file']))
+            elif job['command'] == "catalog":
+                # Already read by _catalog_extract_jobs()
+                fh = open(self._temp_output_file(job['output_file']), 'w', encoding='utf-8', newline='\n')
+                fh.write(job['definition'])
+                fh.close()
+            else:
+                self._run_pg_restore(job['list_file'], self._temp_output_file(job['output_file']))
+                if len(job.get('schema_copies', [])) > 0:
+                    error = self._write_schema_copies(job)
+                    if error != None:
+                        os.remove(self._temp_output_file(job['output_file']))
+                        return error
+        except subprocess.CalledProcessError as e:
+            self.job_exit_code = e.returncode
+            return ("Error in " + job['command'] + " command while creating extract file: " + str(e.output, encoding='utf-8').rstrip() +
+                "\nSubprocess command called: " + str(e.cmd))
+        finally:
+            self.args = run_args
+        return None
+    # end _run_extract_job()
+
+
+    def _run_extract_job_process(self, job, result_conn):
+        """
+        Run a single extraction job in a process started by _start_extract_job_process() and send its start time, duration,
+        error (None if it succeeded) and exit code back to the main process.
+
+        * job: a job dictionary
+        * result_conn: sending end of the Pipe the result is sent to
+        """
+        if hasattr(os, "setpgrp"):
+            # Lets _stop_extract_jobs() stop the job's pg_dump, pg_restore or psql call along with it
+            os.setpgrp()
+        start_time = time.time()
+        error = self._run_extract_job(job)
+        result_conn.send((start_time, time.time() - start_time, error, self.job_exit_code))
+        result_conn.close()
+    # end _run_extract_job_process()
+
+
+    def _run_pg_dump(self, o, output_file, partition_list=None, chunk_dir=None, snapshot=None):
+        """
+        Run pg_dump for a single object obtained from parsing a pg_restore -l list
 
         * o: a single object in the dictionary format generated by build_main_object_list
         * output_file: target output file that pg_dump writes to
+        * partition_list: optional list of partition table objects of o to include in the same pg_dump call and output file
+        * chunk_dir: if set, table data is split into --data_chunk_size files in this folder, see _write_data_chunks()
+        * snapshot: exported snapshot of a table whose data is extracted by --table_slices. pg_dump uses the snapshot
+            and leaves out the table's data.
+
+        Raises subprocess.CalledProcessError if pg_dump fails
         """
-        pg_dump_cmd = ["pg_dump", "--file=" + output_file]
-        pg_dump_cmd.append(r'--table="' + o.get('objschema') + r'"."' + o.get('objname') + r'"')
+        pg_dump_cmd = ["pg_dump"]
+        if chunk_dir == None:
+            pg_dump_cmd.append("--file=" + output_file)
+        pg_dump_cmd.append("--table=" + self._quote_table(o.get('objschema'), o.get('objname')))
+        if partition_list != None:
+            for p in partition_list:
+                pg_dump_cmd.append("--table=" + self._quote_table(p.get('objschema'), p.get('objname')))
 
         if self.args and self.args.Fc:
             pg_dump_cmd.append("--format=custom")
@@ -1321,6 +3833,9 @@ class PGExtractor:
             pg_dump_cmd.append("--format=plain")
         if self.args and not self.args.getdata:
             pg_dump_cmd.append("--schema-only")
+        if snapshot != None:
+            pg_dump_cmd.append("--snapshot=" + snapshot)
+            pg_dump_cmd.append("--exclude-table-data=" + self._quote_table(o.get('objschema'), o.get('objname')))
         if self.args and self.args.clean:
             pg_dump_cmd.append("--clean") 
         if self.args and self.args.no_acl:
@@ -1331,27 +3846,29 @@ class PGExtractor:
             pg_dump_cmd.append("--inserts")
         if self.args and self.args.column_inserts:
             pg_dump_cmd.append("--column-inserts")
-        if self.args.debug:
+        if self.args and self.args.debug:
             self._debug_print("EXTRACT DUMP: " + str(pg_dump_cmd))
-        try:
+        if chunk_dir != None:
+            self._write_data_chunks(pg_dump_cmd, output_file, chunk_dir)
+        else:
             subprocess.check_output(pg_dump_cmd, stderr=subprocess.STDOUT)
-        except subprocess.CalledProcessError as e:
-            print("Error in pg_dump command while creating extract file: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
-            sys.exit(2)
-        if self.args.wait > 0:
+        if self.args and self.args.wait > 0:
             time.sleep(self.args.wait)
     # end _run_pg_dump()
 
 
-    def _run_pg_restore(self, list_file, output_file):
+    def _run_pg_restore(self, list_file, output_file, verbose=False):
         """
         Run pg_restore using a file that can be fed to it using the -L option. 
         Assumes a temporary dumpfile was create via _create_temp_dump() and uses that
 
         * list_file: file containing objects obtained from pg_restore -l that will be restored
         * output_file: target output file that pg_restore writes to
+        * verbose: if true, pg_restore puts a "TOC entry" comment with the dump id before every object
+
+        Raises subprocess.CalledProcessError if pg_restore fails
         """
-        if self.args.debug:
+        if self.args and self.args.debug:
             fh = open(list_file, 'r', encoding='utf-8')
             self._debug_print("\nRESTORE LIST FILE CONTENTS")
             for l in fh:
@@ -1363,29 +3880,167 @@ class PGExtractor:
             restore_cmd.append("--clean")
         if self.args and self.args.no_owner:
             restore_cmd.append("--no-owner")
+        if verbose:
+            restore_cmd.append("--verbose")
         restore_cmd.append(self.tmp_dump_file.name)
-        if self.args.debug:
+        if self.args and self.args.debug:
             self._debug_print("EXTRACT RESTORE: " + str(restore_cmd))
-        try:
-            subprocess.check_output(restore_cmd, stderr=subprocess.STDOUT)
-        except subprocess.CalledProcessError as e:
-            print("Error in pg_restore command while creating extract file: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
-            sys.exit(2)
-        if self.args.wait > 0:
+        subprocess.check_output(restore_cmd, stderr=subprocess.STDOUT)
+        if self.args and self.args.wait > 0:
             time.sleep(self.args.wait)
     # end _run_pg_restore()
 
 
+    def _schema_substitute(self, text, from_schema, to_schema):
+        """
+        Replace every use of a schema name as a whole identifier in pg_restore output with another one, for --dedupe_schemas.
+
+        * text: pg_restore output (bytes)
+        * from_schema: schema name to replace. Must be one that never needs quoting.
+        * to_schema: schema name put in its place
+
+        Returns the changed text
+        """
+        return re.sub(rb'(?<![\w$"])' + re.escape(from_schema.encode('utf-8')) + rb'(?![\w$"])'
+            , to_schema.encode('utf-8').replace(b'\\', b'\\\\'), text)
+    # end _schema_substitute()
+
+
+    def _set_basedir(self):
+        """
+        Add the --hostnamedir and database name folders to --basedir. Must be called after _set_environment().
+        """
+        # Change basedir if these are set
+        if self.args.hostnamedir != None: 
+            self.args.basedir = os.path.join(self.args.basedir, self.args.hostnamedir)
+        if self.args.nodbnamedir == True:
+            pass # Don't add a dbname to new basedir
+        elif self.args.dbnamedir != None:
+            self.args.basedir = os.path.join(self.args.basedir, self.args.dbnamedir)
+        elif "PGDATABASE" in os.environ:
+            self.args.basedir = os.path.join(self.args.basedir, os.environ["PGDATABASE"])
+    # end _set_basedir()
+
+
     def _set_config(self):
         """
         Set any configuration options needed for the rest of the script to run
         """
-        if self.args.temp == None:
+        self.start_time = time.time()
+        self.jobs_auto = False
+        if self.args.trace_file != None:
+            self.trace_events = []
+        self._set_environment()
+
+        if self.args.profiles != None:
+            if ( self.args.resume or self.args.shard != None or self.args.output_archive != None or self.args.index or
+                    self.args.deadline != None or self.args.table_slices != None or self.args.explain ):
+                print("Cannot set --resume, --shard, --output_archive, --index, --deadline, --table_slices or --explain along with --profiles")
+                sys.exit(2)
+            # Read before the database folder is added to --basedir, since every profile adds it to its own basedir
+            self.profile_list = self._read_profiles(self.args.profiles)
+        self._set_basedir()
+        if self.args.use_dump != None and not self.args.explain:
+            print("--use_dump can only be used along with --explain")
+            sys.exit(2)
+        if self.args.explain and (self.args.resume or self.args.shard != None):
+            print("Cannot set --resume or --shard along with --explain")
+            sys.exit(2)
+        if not self.args.explain and self.args.profiles == None and self.args.output_archive == None:
+            # With --output_archive, the folder is only made if a hidden state file (--deadline, --index) is written to it
+            self.create_dir(self.args.basedir)
+
+        resume_dump_file = None
+        if self.args.resume:
+            resume_dump_file = self._open_journal()
+        if self.args.use_dump != None:
+            if not os.path.isfile(self.args.use_dump):
+                print("--use_dump file does not exist: " + self.args.use_dump)
+                sys.exit(2)
+            # Opened only so the rest of the script can use it like the temp file object
+            self.tmp_dump_file = open(self.args.use_dump, 'rb')
+        elif resume_dump_file != None:
+            # Opened only so the rest of the script can use it like the temp file object
+            self.tmp_dump_file = open(resume_dump_file, 'rb')
+            self.resume_dump = True
+        elif self.args.temp == None and not self.args.resume:
             self.tmp_dump_file = tempfile.NamedTemporaryFile(prefix='pg_extractor')
         else:
+            # --resume must be able to reuse the temp dump after a failed run, so it can't be removed on close
             self.tmp_dump_file = tempfile.NamedTemporaryFile(prefix='pg_extractor', dir=self.args.temp, delete=False)
-        self.temp_filelist.append(self.tmp_dump_file.name)
+        if not self.resume_dump and self.args.use_dump == None:
+            self.temp_filelist.append(self.tmp_dump_file.name)
+
+        if self.args.profiles == None:
+            self._set_extract_options()
+        else:
+            run_args = self.args
+            basedir_set = set()
+            for profile_name, profile_args in self.profile_list:
+                self.args = profile_args
+                self._set_basedir()
+                self._set_extract_options()
+                if profile_args.basedir in basedir_set:
+                    print("Each profile in --profiles must have its own output directory. Profile " + profile_name + " uses the same as an earlier one: " + profile_args.basedir)
+                    sys.exit(2)
+                basedir_set.add(profile_args.basedir)
+                self.create_dir(profile_args.basedir)
+            self.args = run_args
+
+        if self.args.jobs == "auto":
+            # Needs PGHOST set above, since the learned value is kept per database host
+            self.jobs_auto = True
+            self.args.jobs = self._tune_load()
+
+        if self.args.dedupe_verify > 0 and not self.args.dedupe_schemas:
+            print("Must set --dedupe_schemas along with --dedupe_verify")
+            sys.exit(2)
+
+        if self.args.throttle_probe != None and self.args.throttle_limit == None:
+            print("Must set --throttle_limit along with --throttle_probe")
+            sys.exit(2)
+
+        if self.args.shard != None and (self.args.delete or self.args.output_archive != None):
+            print("Cannot set --delete or --output_archive along with --shard. Use --delete with --merge_shards once all shards have finished.")
+            sys.exit(2)
+
+        if self.args.cas_dir != None and not self.args.explain:
+            if self.args.output_archive != None:
+                print("Cannot set --output_archive along with --cas_dir")
+                sys.exit(2)
+            self.create_dir(self.args.cas_dir)
+            basedir_list = [self.args.basedir]
+            if self.args.profiles != None:
+                basedir_list = [profile_args.basedir for profile_name, profile_args in self.profile_list]
+            for basedir in basedir_list:
+                # Neither hard links nor reflinks can cross filesystems
+                if os.stat(basedir).st_dev != os.stat(self.args.cas_dir).st_dev:
+                    print("--cas_dir must be on the same filesystem as the output directory: " + basedir)
+                    sys.exit(2)
+            if self.args.cas_link == "reflink":
+                # Fail before extracting anything if the filesystem has no reflinks
+                probe_file = os.path.join(self.args.cas_dir, ".reflink_probe." + str(os.getpid()))
+                open(probe_file, 'w').close()
+                try:
+                    self._cas_clone(probe_file, probe_file + ".clone")
+                finally:
+                    for f in (probe_file, probe_file + ".clone"):
+                        if os.path.isfile(f):
+                            os.remove(f)
+
+        if self.args.output_archive != None:
+            if self.args.delete or self.args.resume:
+                print("Cannot set --delete or --resume along with --output_archive")
+                sys.exit(2)
+            if not self.args.explain:
+                self._open_output_archive()
+    # end _set_config()
+
 
+    def _set_environment(self):
+        """
+        Set the PG* environment variables and PATH used by all PostgreSQL binaries called by the script from the connection options.
+        """
         if self.args.pgbin != None:
             sys.path.append(self.args.pgbin)
         if self.args.dbname != None:
@@ -1406,18 +4061,13 @@ class PGExtractor:
             self._debug_print(os.environ)
         if self.args.pgbin != None:
             os.environ["PATH"] = self.args.pgbin + os.pathsep + os.environ["PATH"]
+    # end _set_environment()
 
-        # Change basedir if these are set
-        if self.args.hostnamedir != None: 
-            self.args.basedir = os.path.join(self.args.basedir, self.args.hostnamedir)
-        if self.args.nodbnamedir == True:
-            pass # Don't add a dbname to new basedir
-        elif self.args.dbnamedir != None:
-            self.args.basedir = os.path.join(self.args.basedir, self.args.dbnamedir)
-        elif "PGDATABASE" in os.environ:
-            self.args.basedir = os.path.join(self.args.basedir, os.environ["PGDATABASE"])
-        self.create_dir(self.args.basedir)
 
+    def _set_extract_options(self):
+        """
+        Expand --getall and check the options that choose what is extracted and how, once per --profiles profile.
+        """
         if self.args.getall:
             self.args.getschemata = True
             self.args.gettables = True
@@ -1449,25 +4099,955 @@ class PGExtractor:
             if not self.args.getroles:
                 print("Cannot set --remove_passwords without setting either --getroles or --getall")
                 sys.exit(2)
-    # end _set_config()
 
+        if self.args.data_chunk_size != None:
+            if not self.args.getdata or self.args.Fc or self.args.inserts or self.args.column_inserts:
+                print("--data_chunk_size requires --getdata and cannot be used along with -Fc, --inserts or --column_inserts")
+                sys.exit(2)
+            if self.args.data_chunk_size <= 0:
+                print("--data_chunk_size must be greater than zero")
+                sys.exit(2)
 
-    def _start_jobs(self, process_list):
-        for j in process_list:
-            j.start()
-    # end _start_jobs()
+        if self.args.table_slices != None:
+            if not self.args.getdata or self.args.Fc or self.args.inserts or self.args.column_inserts:
+                print("--table_slices requires --getdata and cannot be used along with -Fc, --inserts or --column_inserts")
+                sys.exit(2)
+            if self.args.table_slices < 2:
+                print("--table_slices must be at least 2")
+                sys.exit(2)
+    # end _set_extract_options()
+
+
+    def _set_max_jobs(self, max_jobs):
+        """
+        Change the highest number of jobs that may run at the same time while extraction is running.
+
+        * max_jobs: new number of jobs
+        """
+        if self.throttle_jobs == self.throttle_max_jobs or self.throttle_jobs > max_jobs:
+            self.throttle_jobs = max_jobs
+        self.throttle_max_jobs = max_jobs
+    # end _set_max_jobs()
+
+
+    def _shard_argument(self, value):
+        """
+        argparse type for --shard. Returns the value as a (shard, total shards) tuple.
+        """
+        m = re.match(r'^(\d+)/(\d+)$', value)
+        if m == None or not 1 <= int(m.group(1)) <= int(m.group(2)):
+            raise argparse.ArgumentTypeError("must be given as I/N, where I is a number from 1 to N (ex: 2/4)")
+        return (int(m.group(1)), int(m.group(2)))
+    # end _shard_argument()
+
+
+    def _shard_extract_jobs(self, job_list, target_dir):
+        """
+        Return only the extraction jobs of this host's --shard, using the split of all jobs saved by the first shard to start.
+
+        * job_list: list of jobs as created by _build_extract_jobs()
+        * target_dir: full path to the base output directory shared by all shards
 
+        Returns the jobs of this shard in the same order as job_list
+        """
+        shard, shard_count = self.args.shard
+        shard_file = os.path.join(target_dir, ".pg_extractor_shards.json")
+        shard_map = None
+        if not os.path.isfile(shard_file):
+            weight_map = self._shard_weights(job_list)
+            shard_load = [(0, i) for i in range(1, shard_count + 1)]
+            new_shard_map = {}
+            # Heaviest job first, each to the shard with the least weight so far
+            for job in sorted(job_list, key=lambda j: (-weight_map[j['output_file']], j['output_file'])):
+                load, i = heapq.heappop(shard_load)
+                new_shard_map[os.path.relpath(job['output_file'], target_dir)] = i
+                heapq.heappush(shard_load, (load + weight_map[job['output_file']], i))
+            temp_file = self._temp_output_file(shard_file) + "." + str(os.getpid())
+            fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+            json.dump({'shards': shard_count, 'files': new_shard_map}, fh, indent=1, sort_keys=True)
+            fh.close()
+            try:
+                # Unlike a rename, a link fails if another shard already saved its split
+                os.link(temp_file, shard_file)
+                shard_map = new_shard_map
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temp_file)
+        if shard_map == None:
+            fh = open(shard_file, 'r', encoding='utf-8')
+            shard_data = json.load(fh)
+            fh.close()
+            if shard_data['shards'] != shard_count:
+                print("The shard split in " + shard_file + " is for " + str(shard_data['shards']) + " shards, not " + str(shard_count)
+                    + ". Run --merge_shards to finish the previous sharded run or remove the file.")
+                sys.exit(2)
+            shard_map = shard_data['files']
+
+        shard_job_list = []
+        for job in job_list:
+            output_file = os.path.relpath(job['output_file'], target_dir)
+            job_shard = shard_map.get(output_file)
+            if job_shard == None:
+                # Object created since the split was saved
+                job_shard = int(hashlib.sha1(output_file.encode('utf-8')).hexdigest(), 16) % shard_count + 1
+            if job_shard == shard:
+                shard_job_list.append(job)
+        if self.args and not self.args.quiet:
+            print("Shard " + str(shard) + " of " + str(shard_count) + ": extracting " + str(len(shard_job_list)) + " of " + str(len(job_list)) + " objects.")
+        return shard_job_list
+    # end _shard_extract_jobs()
+
+
+    def _shard_weights(self, job_list):
+        """
+        Weigh each extraction job for _shard_extract_jobs() and explain(). With --getdata, table jobs weigh the size of their table.
 
-    def _wait_jobs(self, process_list):
-        for j in process_list:
-            j.join()
-        for j in process_list:
-            if j.exitcode:
-                raise ProcessError("Error in job: name={!r} exitcode={!r}".format(
-                    j.name,
-                    j.exitcode,
-                ))
-    # end _wait_jobs()
+        * job_list: list of jobs as created by _build_extract_jobs()
+
+        Returns a dictionary of each job's output file to its weight
+        """
+        if not self.args.getdata:
+            return dict((job['output_file'], 1) for job in job_list)
+        size_sql = ("SELECT n.nspname, c.relname, pg_catalog.pg_table_size(c.oid) FROM pg_catalog.pg_class c"
+            + " JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace WHERE c.relkind IN ('r', 'p', 'm', 'f')")
+        psql_cmd = ["psql", "--no-psqlrc", "--no-align", "--tuples-only", "--field-separator-zero", "--record-separator-zero", "--command=" + size_sql]
+        if self.args.debug:
+            self._debug_print("SHARD TABLE SIZE COMMAND: " + str(psql_cmd))
+        try:
+            size_output = subprocess.check_output(psql_cmd, stderr=subprocess.STDOUT)
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while reading table sizes: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+        # Fields and rows are both separated by a zero byte, so every three values are one row
+        size_values = str(size_output, encoding='utf-8').rstrip('\n').rstrip('\0').split('\0')
+        size_map = {}
+        for i in range(0, len(size_values) - 2, 3):
+            size_map[(size_values[i], size_values[i+1])] = int(size_values[i+2])
+        weight_map = {}
+        for job in job_list:
+            weight = 8192
+            if job['command'] == "pg_dump":
+                job_object_list = [job['object']]
+                if job.get('partition_list') != None:
+                    job_object_list.extend(job['partition_list'])
+                for o in job_object_list:
+                    weight += size_map.get((o.get('objschema'), o.get('objname')), 0)
+            weight_map[job['output_file']] = weight
+        return weight_map
+    # end _shard_weights()
+
+
+    def _slice_extract_jobs(self, job_list):
+        """
+        Split the data extraction of tables of at least --slice_min_size into a pg_dump job for the DDL and --table_slices copy jobs.
+
+        * job_list: list of jobs as created by _build_extract_jobs()
+
+        Returns the new job list, with each sliced table's copy jobs right after its pg_dump job
+        """
+        min_size = int(self.args.slice_min_size * 1048576)
+        session = self._psql_session_open()
+        try:
+            version = int(self._psql_session_query(session, "SELECT pg_catalog.current_setting('server_version_num')")[0][0])
+            table_list = self._psql_session_query(session, "SELECT n.nspname, c.relname"
+                + ", (SELECT a.attname FROM pg_catalog.pg_index i JOIN pg_catalog.pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]"
+                + " WHERE i.indrelid = c.oid AND i.indisprimary AND i.indnatts = 1 AND a.atttypid IN (20, 21, 23))"
+                + " FROM pg_catalog.pg_class c JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace"
+                + " WHERE c.relkind = 'r' AND pg_catalog.pg_table_size(c.oid) >= " + str(min_size))
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while finding tables for --table_slices: " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+        finally:
+            self._psql_session_close(session)
+        key_map = dict(((t[0], t[1]), t[2]) for t in table_list)
+
+        slice_job_list = []
+        for job in job_list:
+            slice_job_list.append(job)
+            o = job['object']
+            key = (o.get('objschema'), o.get('objname'))
+            if job['command'] != "pg_dump" or job.get('partition_list') != None or key not in key_map:
+                continue
+            if version < 140000 and key_map[key] == "":
+                continue
+            group = {'object': o, 'version': version, 'key_column': key_map[key], 'session': None
+                , 'finished_count': 0, 'failed': False, 'job_list': [job]}
+            job['slice_group'] = group
+            chunk_dir = self._data_chunk_dir(job['output_file'])
+            for i in range(self.args.table_slices):
+                slice_job = {'category': job['category'], 'object': o, 'output_file': os.path.join(chunk_dir, "%04d.copy" % (i + 1))
+                    , 'command': 'copy', 'slice_group': group, 'slice': i}
+                group['job_list'].append(slice_job)
+                slice_job_list.append(slice_job)
+            self.slice_group_list.append(group)
+            if len(self.journal_done) > 0:
+                # A resumed run must extract all of a table's slices from the same snapshot again, unless all were done
+                done_list = [j for j in group['job_list'] if os.path.relpath(j['output_file'], self.args.basedir) in self.journal_done]
+                if len(done_list) < len(group['job_list']):
+                    for j in done_list:
+                        self.journal_done.discard(os.path.relpath(j['output_file'], self.args.basedir))
+        self._create_output_dirs(slice_job_list)
+        if self.args.debug:
+            self._debug_print("\nTABLE SLICES")
+            for group in self.slice_group_list:
+                self._debug_print(group['object'].get('objschema') + "." + group['object'].get('objname') + ": " + str(self.args.table_slices))
+        return slice_job_list
+    # end _slice_extract_jobs()
+
+
+    def _start_extract_job_process(self, job):
+        """
+        Start a single extraction job in its own process.
+
+        * job: a job dictionary as created by _build_extract_jobs()
+
+        Returns a tuple of the receiving end of the Pipe the job sends its result to and the Process object
+        """
+        recv_conn, send_conn = Pipe(duplex=False)
+        p = Process(target=self._run_extract_job_process, args=(job, send_conn))
+        if self.args and self.args.debug:
+            self._debug_print(job['command'].upper() + " PROCESS CREATED: " + str(p.name))
+        p.start()
+        # Only the job's process may keep the sending end open, so recv() fails if it dies without a result
+        send_conn.close()
+        return recv_conn, p
+    # end _start_extract_job_process()
+
+
+    def _start_table_slices(self, group):
+        """
+        Start the snapshot session of a --table_slices table, held until _finish_table_slice(), and work out the range of each of its slices.
+
+        * group: a slice group created by _slice_extract_jobs()
+        """
+        o = group['object']
+        table = self._quote_table(o.get('objschema'), o.get('objname'))
+        table_literal = "'" + table.replace("'", "''") + "'::pg_catalog.regclass"
+        slice_count = len(group['job_list']) - 1
+        session = self._psql_session_open()
+        group['session'] = session
+        try:
+            self._psql_session_query(session, "BEGIN ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            snapshot = self._psql_session_query(session, "SELECT pg_catalog.pg_export_snapshot()")[0][0]
+            encoding = self._psql_session_query(session, "SELECT pg_catalog.current_setting('client_encoding')")[0][0]
+            column_sql = ("SELECT pg_catalog.string_agg(pg_catalog.quote_ident(a.attname), ', ' ORDER BY a.attnum) FROM pg_catalog.pg_attribute a"
+                + " WHERE a.attrelid = " + table_literal + " AND a.attnum > 0 AND NOT a.attisdropped")
+            if group['version'] >= 120000:
+                # Generated columns can't be loaded with COPY
+                column_sql += " AND a.attgenerated = ''"
+            columns = self._psql_session_query(session, column_sql)[0][0]
+            if group['version'] >= 140000:
+                # Slices of the table's blocks. Rows visible to the snapshot can only be in blocks that already existed.
+                block_count = int(self._psql_session_query(session, "SELECT pg_catalog.pg_relation_size(" + table_literal
+                    + ") / pg_catalog.current_setting('block_size')::int")[0][0])
+                bound_list = ["'(" + str(block_count * i // slice_count) + ",0)'::pg_catalog.tid" for i in range(1, slice_count)]
+                range_column = "ctid"
+            else:
+                range_column = '"' + group['key_column'].replace('"', '""') + '"'
+                key_range = self._psql_session_query(session, "SELECT pg_catalog.min(" + range_column + "), pg_catalog.max(" + range_column + ") FROM " + table)[0]
+                low = int(key_range[0] or 0)
+                high = int(key_range[1] or 0)
+                bound_list = [str(low + (high - low + 1) * i // slice_count) for i in range(1, slice_count)]
+        except subprocess.CalledProcessError as e:
+            print("Error in psql command while starting --table_slices for " + table + ": " + str(e.output, encoding='utf-8').rstrip() + "\nSubprocess command called: " + str(e.cmd))
+            sys.exit(2)
+
+        column_list = ""
+        if columns != "":
+            column_list = " (" + columns + ")"
+        group['job_list'][0]['snapshot'] = snapshot
+        for slice_job in group['job_list'][1:]:
+            i = slice_job['slice']
+            condition_list = []
+            if i > 0:
+                condition_list.append(range_column + " >= " + bound_list[i-1])
+            if i < slice_count - 1:
+                condition_list.append(range_column + " < " + bound_list[i])
+            slice_range = " AND ".join(condition_list) or "true"
+            slice_job['snapshot'] = snapshot
+            slice_job['slice_range'] = slice_range
+            slice_job['copy_header'] = "SET client_encoding = '" + encoding + "';\nCOPY " + table + column_list + " FROM stdin;\n"
+            slice_job['copy_sql'] = "COPY (SELECT " + columns + " FROM " + table + " WHERE " + slice_range + ") TO STDOUT"
+    # end _start_table_slices()
+
+
+    def _state_file(self, target_dir, file_name):
+        """
+        Return the full path of one of the hidden state files kept in the output directory, one per --shard if set.
+
+        * target_dir: full path to the base output directory
+        * file_name: name of the state file
+        """
+        if self.args and self.args.shard != None:
+            base_name, extension = os.path.splitext(file_name)
+            file_name = base_name + ".shard" + str(self.args.shard[0]) + "of" + str(self.args.shard[1]) + extension
+        return os.path.join(target_dir, file_name)
+    # end _state_file()
+
+
+    def _stop_extract_jobs(self, running_jobs):
+        """
+        Stop the extraction jobs still running when the run ends early and remove their temporary output files.
+
+        * running_jobs: dictionary of the running jobs, see _iter_extract_jobs()
+        """
+        for recv_conn, (p, job) in running_jobs.items():
+            if p.is_alive():
+                try:
+                    os.killpg(p.pid, signal.SIGTERM)
+                except (AttributeError, OSError):
+                    p.terminate()
+            p.join()
+            recv_conn.close()
+            if job.get('slice_group') != None:
+                self._close_table_slices(job['slice_group'])
+            for output_file in self._job_output_files(job):
+                temp_file = self._temp_output_file(output_file)
+                if os.path.isfile(temp_file):
+                    os.remove(temp_file)
+                chunk_dir = self._data_chunk_dir(output_file)
+                if self.archive_temp_dir == None and os.path.isdir(chunk_dir):
+                    for f in os.listdir(chunk_dir):
+                        if f.startswith('.') and f.endswith('.tmp'):
+                            os.remove(os.path.join(chunk_dir, f))
+        running_jobs.clear()
+    # end _stop_extract_jobs()
+
+
+    def _stream_extract(self, target_dir):
+        """
+        Returns true if iter_extract() can extract while the object list is still being read, which options that need
+        the whole object list before the first job starts don't allow.
+
+        * target_dir: full path to the base output directory
+        """
+        if ( self.args.group_partitions or self.args.plan or self.args.shard != None or self.args.table_slices != None or
+                self.args.dedupe_schemas or self.args.index or self.args.priority != None or self.args.priority_file != None or
+                self.args.backend == "catalog" or self.args.debug ):
+            return False
+        return len(self._read_carryover(target_dir)) == 0
+    # end _stream_extract()
+
+
+    def _strip_password(self, statement):
+        """
+        Remove the PASSWORD parameter from an ALTER ROLE statement of pg_dumpall output.
+
+        * statement: the ALTER ROLE statement, including its trailing newline if there is one
+
+        Returns the statement without the password hash
+        """
+        return re.sub(r'(.*)\sPASSWORD\s.*(;)$', r'\1\2', statement, flags=re.MULTILINE)
+    # end _strip_password()
+
+
+    def _sync_output_dirs(self):
+        """
+        Flush the output files committed with --fsync dir to disk, one directory at a time, followed by the directory itself.
+        """
+        dir_map = OrderedDict()
+        for f in self.sync_file_list:
+            dir_map.setdefault(os.path.dirname(f), []).append(f)
+        for d, file_list in dir_map.items():
+            for f in file_list:
+                self._fsync_path(f)
+            self._fsync_path(d)
+        self.sync_file_list = []
+    # end _sync_output_dirs()
+
+
+    def _table_job(self, o, target_dir, partition_list=None):
+        """
+        Work out the pg_dump job for a single table, view or foreign table, see _build_extract_jobs().
+
+        * o: the object, in the format created by build_main_object_list
+        * target_dir: full path to the base output directory
+        * partition_list: partition objects to dump along with a table (--group_partitions)
+
+        Returns the job dictionary
+        """
+        output_file = target_dir
+        if self.args and self.args.schemadir:
+            if o.get('objschema') != "-":
+                output_file = os.path.join(output_file, o.get('objschema'))
+
+        if o.get('objtype') == "TABLE" or o.get('objtype') == "FOREIGN TABLE":
+            output_file = os.path.join(output_file, "tables")
+        elif o.get('objtype') == "VIEW" or o.get('objtype') == "MATERIALIZED VIEW":
+            output_file = os.path.join(output_file, "views")
+        else:
+            print("Invalid dump type in create_extract_files() module")
+            sys.exit(2)
+
+        # replace any non-alphanumeric characters with ",hexcode,"
+        objschema_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objschema'))
+        objname_filename = re.sub(r'\W', self.replace_char_with_hex, o.get('objname'))
+        output_file = os.path.join(output_file, objschema_filename + "." + objname_filename + ".sql")
+        return {'category': 'tables', 'object': o, 'output_file': output_file, 'command': 'pg_dump'
+            , 'partition_list': partition_list}
+    # end _table_job()
+
+
+    def _temp_output_file(self, output_file):
+        """
+        Return the hidden name in the same directory that an output file is written to before _commit_output_file() renames it.
+        With --output_archive, it is a file in a private temporary directory instead.
+
+        * output_file: full path of the output file
+        """
+        if self.archive_temp_dir != None:
+            return os.path.join(self.archive_temp_dir, hashlib.sha1(os.fsencode(output_file)).hexdigest() + ".sql")
+        return os.path.join(os.path.dirname(output_file), "." + os.path.basename(output_file) + ".tmp")
+    # end _temp_output_file()
+
+
+    def _throttle_allowed_jobs(self):
+        """
+        Work out how many extraction jobs may run at the same time right now, as limited by --max_write_rate and --throttle_probe.
+
+        Returns the number of jobs that may be running. 0 means no new job can be started yet, see _throttle_delay().
+        """
+        if not self.throttle_enabled:
+            return self.throttle_max_jobs
+        now = time.time()
+        if self.args.max_write_rate != None:
+            rate = self.args.max_write_rate * 1048576
+            self.throttle_tokens = min(rate, self.throttle_tokens + (now - self.throttle_refill_time) * rate)
+            self.throttle_refill_time = now
+        if self.args.throttle_probe != None and now >= self.throttle_next_probe:
+            self.throttle_next_probe = now + self.args.throttle_interval
+            self._throttle_probe()
+        if self.throttle_tokens < 0:
+            if self.throttle_write_pause_start == None:
+                self.throttle_write_pause_count += 1
+                self.throttle_write_pause_start = now
+            return 0
+        if self.throttle_write_pause_start != None:
+            self.throttle_write_pause_time += now - self.throttle_write_pause_start
+            self.throttle_write_pause_start = None
+        return self.throttle_jobs
+    # end _throttle_allowed_jobs()
+
+
+    def _throttle_delay(self):
+        """
+        Returns the number of seconds until _throttle_allowed_jobs() may allow more jobs, or None if only a finished job can change that.
+        """
+        if not self.throttle_enabled:
+            return None
+        delay_list = []
+        if self.args.throttle_probe != None:
+            delay_list.append(self.throttle_next_probe - time.time())
+        if self.args.max_write_rate != None and self.throttle_tokens < 0:
+            delay_list.append(-self.throttle_tokens / (self.args.max_write_rate * 1048576))
+        if len(delay_list) == 0:
+            return None
+        return max(0.01, min(delay_list))
+    # end _throttle_delay()
+
+
+    def _throttle_log(self, message):
+        """
+        Record a throttling decision for the summary printed by _throttle_summary().
+
+        * message: description of the decision
+        """
+        entry = "[{:.1f}s] {}".format(time.time() - self.start_time, message)
+        self.throttle_log_list.append(entry)
+        if self.args.debug:
+            self._debug_print("THROTTLE: " + entry)
+    # end _throttle_log()
+
+
+    def _throttle_probe(self):
+        """
+        Run the --throttle_probe command and change the number of jobs allowed to run based on its output.
+        A probe that fails or does not print a number leaves the number of jobs as it is.
+        """
+        self.throttle_probe_count += 1
+        try:
+            output = subprocess.check_output(self.args.throttle_probe, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
+            value = float(output.strip().splitlines()[-1])
+        except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+            self.throttle_probe_fail_count += 1
+            self._throttle_log("probe failed, keeping " + str(self.throttle_jobs) + " jobs: " + str(e))
+            return
+        old_jobs = self.throttle_jobs
+        if value > self.args.throttle_limit and self.throttle_jobs > 0:
+            self.throttle_jobs = self.throttle_jobs // 2
+        elif value < self.args.throttle_limit * 0.8 and self.throttle_jobs < self.throttle_max_jobs:
+            self.throttle_jobs += 1
+        if self.throttle_jobs != old_jobs:
+            self._throttle_log("probe value " + str(value) + " (limit " + str(self.args.throttle_limit) + "): jobs "
+                + str(old_jobs) + " -> " + str(self.throttle_jobs) + (" (paused)" if self.throttle_jobs == 0 else ""))
+    # end _throttle_probe()
+
+
+    def _throttle_start(self, max_jobs):
+        """
+        Reset the throttling governor at the start of an extraction run.
+
+        * max_jobs: the highest number of jobs that may run at the same time
+        """
+        self.throttle_max_jobs = max_jobs
+        self.throttle_jobs = max_jobs
+        self.throttle_enabled = bool(self.args and (self.args.max_write_rate != None or self.args.throttle_probe != None))
+        self.throttle_tokens = 0
+        if self.throttle_enabled and self.args.max_write_rate != None:
+            self.throttle_tokens = self.args.max_write_rate * 1048576
+        self.throttle_refill_time = time.time()
+        self.throttle_next_probe = 0
+        self.throttle_written_bytes = 0
+        self.throttle_write_pause_start = None
+        self.throttle_write_pause_count = 0
+        self.throttle_write_pause_time = 0
+        self.throttle_probe_count = 0
+        self.throttle_probe_fail_count = 0
+        self.throttle_log_list = []
+        self.throttle_start_time = time.time()
+    # end _throttle_start()
+
+
+    def _throttle_summary(self):
+        """
+        Print what the throttling governor did during the run, if it was enabled.
+        """
+        if not self.throttle_enabled:
+            return
+        elapsed = max(time.time() - self.throttle_start_time, 0.001)
+        print("Throttling summary:")
+        if self.args.max_write_rate != None:
+            print("  Write rate limit {:.3g} MB/s, average {:.3g} MB/s. Waited for write budget {} times, {:.1f}s in total.".format(
+                self.args.max_write_rate, self.throttle_written_bytes / 1048576 / elapsed, self.throttle_write_pause_count, self.throttle_write_pause_time))
+        if self.args.throttle_probe != None:
+            print("  Probe run " + str(self.throttle_probe_count) + " times (" + str(self.throttle_probe_fail_count) + " failed). Jobs allowed at the end: "
+                + str(self.throttle_jobs) + " of " + str(self.throttle_max_jobs))
+        for entry in self.throttle_log_list:
+            print("  " + entry)
+    # end _throttle_summary()
+
+
+    def _throttle_written(self, byte_count):
+        """
+        Take the size of a newly extracted file out of the --max_write_rate token bucket.
+
+        * byte_count: size of the file, may be None if the job failed
+        """
+        if not self.throttle_enabled or byte_count == None:
+            return
+        self.throttle_written_bytes += byte_count
+        if self.args.max_write_rate != None:
+            self.throttle_tokens -= byte_count
+    # end _throttle_written()
+
+
+    def _trace_event(self, phase, name, category, tid=0, event_time=None, args=None):
+        """
+        Add an event to the --trace_file timeline. Does nothing if --trace_file is not set.
+
+        * phase: trace event phase, "B" (begin) or "E" (end)
+        * name: name of the phase or child process the event is for
+        * category: phase, subprocess or job
+        * tid: 0 for the main process, otherwise the number of the --jobs worker the event happened on
+        * event_time: time.time() value of the event. Defaults to now.
+        * args: optional dictionary of values shown along with the event
+        """
+        if self.trace_events == None:
+            return
+        if event_time == None:
+            event_time = time.time()
+        event = {'name': name, 'cat': category, 'ph': phase, 'pid': 1, 'tid': tid, 'ts': int((event_time - self.start_time) * 1000000)}
+        if args != None:
+            event['args'] = args
+        self.trace_events.append(event)
+    # end _trace_event()
+
+
+    def _tune_child_cpu_time(self):
+        """
+        Returns the CPU seconds used by all finished child processes so far, or None if that is not available on this platform.
+        """
+        try:
+            import resource
+        except ImportError:
+            return None
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    # end _tune_child_cpu_time()
+
+
+    def _tune_jobs(self, result):
+        """
+        Feed the result of a finished parallel job to the --jobs auto tuner, which moves the number of jobs up or down by one
+        at the end of each window of results based on its throughput, job latency and CPU use.
+
+        * result: the job's ExtractResult
+        """
+        self.tune_window_jobs += 1
+        if result.bytes != None:
+            self.tune_window_bytes += result.bytes
+        if result.duration != None:
+            self.tune_window_latency += result.duration
+        now = time.time()
+        elapsed = now - self.tune_window_start
+        if self.tune_window_jobs < max(2 * self.throttle_max_jobs, 4) or elapsed < 1:
+            return
+
+        if self.args.getdata:
+            throughput = self.tune_window_bytes / elapsed
+        else:
+            throughput = self.tune_window_jobs / elapsed
+        latency = self.tune_window_latency / self.tune_window_jobs
+        cpu_use = None
+        cpu_time = self._tune_child_cpu_time()
+        if cpu_time != None:
+            cpu_use = (cpu_time - self.tune_window_cpu) / (elapsed * self.tune_cpu_count)
+            self.tune_window_cpu = cpu_time
+        jobs = self.throttle_max_jobs
+        if jobs not in self.tune_throughput or throughput > self.tune_throughput[jobs]:
+            self.tune_throughput[jobs] = throughput
+
+        if cpu_use != None and cpu_use > 0.9:
+            self.tune_direction = -1
+            reason = "CPU use {:.0%}".format(cpu_use)
+        elif self.tune_last_throughput == None or throughput > self.tune_last_throughput * 1.05:
+            reason = "throughput {:.3g}/s".format(throughput)
+        elif throughput < self.tune_last_throughput * 0.95:
+            self.tune_direction = -self.tune_direction
+            reason = "throughput dropped to {:.3g}/s".format(throughput)
+        elif self.tune_last_latency != None and latency > self.tune_last_latency * 1.5:
+            self.tune_direction = -self.tune_direction
+            reason = "latency rose to {:.3g}s".format(latency)
+        else:
+            reason = None
+        self.tune_last_throughput = throughput
+        self.tune_last_latency = latency
+
+        if reason != None:
+            new_jobs = min(max(jobs + self.tune_direction, 1), 4 * self.tune_cpu_count)
+            if new_jobs != jobs:
+                self._set_max_jobs(new_jobs)
+                if self.args.debug:
+                    self._debug_print("JOBS AUTO: " + reason + ": jobs " + str(jobs) + " -> " + str(new_jobs))
+        self.tune_window_count += 1
+        self.tune_window_jobs = 0
+        self.tune_window_bytes = 0
+        self.tune_window_latency = 0
+        self.tune_window_start = now
+    # end _tune_jobs()
+
+
+    def _tune_load(self):
+        """
+        Returns the number of jobs --jobs auto starts with: the value saved by an earlier run against the same
+        database host from this machine, or the number of CPUs.
+        """
+        tune_file = os.path.join(os.path.expanduser("~"), ".pg_extractor_jobs.json")
+        self.tune_cpu_count = os.cpu_count() or 1
+        self.tune_key = socket.gethostname() + " " + os.environ.get("PGHOST", "local")
+        if os.path.isfile(tune_file):
+            try:
+                fh = open(tune_file, 'r', encoding='utf-8')
+                saved = json.load(fh)
+                fh.close()
+                if self.tune_key in saved:
+                    return max(int(saved[self.tune_key]), 1)
+            except (ValueError, OSError):
+                # A broken file only means starting from the CPU count again
+                pass
+        return self.tune_cpu_count
+    # end _tune_load()
+
+
+    def _tune_save(self):
+        """
+        Save the number of jobs that gave the best throughput during this run for the next --jobs auto run.
+        """
+        if self.tune_window_count < 2:
+            return
+        tune_file = os.path.join(os.path.expanduser("~"), ".pg_extractor_jobs.json")
+        best_jobs = max(self.tune_throughput, key=self.tune_throughput.get)
+        saved = {}
+        if os.path.isfile(tune_file):
+            try:
+                fh = open(tune_file, 'r', encoding='utf-8')
+                saved = json.load(fh)
+                fh.close()
+            except (ValueError, OSError):
+                saved = {}
+        saved[self.tune_key] = best_jobs
+        temp_file = tune_file + ".tmp"
+        fh = open(temp_file, 'w', encoding='utf-8')
+        json.dump(saved, fh, indent=1, sort_keys=True)
+        fh.close()
+        os.replace(temp_file, tune_file)
+        self.tune_saved_jobs = best_jobs
+    # end _tune_save()
+
+
+    def _tune_start(self, max_jobs):
+        """
+        Reset the --jobs auto tuner at the start of an extraction run.
+
+        * max_jobs: number of jobs to start with
+        """
+        self.tune_start_jobs = max_jobs
+        self.tune_direction = 1
+        self.tune_throughput = {}
+        self.tune_last_throughput = None
+        self.tune_last_latency = None
+        self.tune_window_count = 0
+        self.tune_window_jobs = 0
+        self.tune_window_bytes = 0
+        self.tune_window_latency = 0
+        self.tune_window_start = time.time()
+        self.tune_window_cpu = self._tune_child_cpu_time()
+        self.tune_saved_jobs = None
+    # end _tune_start()
+
+
+    def _tune_summary(self):
+        """
+        Print what the --jobs auto tuner did during the run.
+        """
+        message = "Automatic --jobs: started with " + str(self.tune_start_jobs) + ", ended with " + str(self.throttle_max_jobs) + "."
+        if self.tune_saved_jobs != None:
+            message += " Best throughput with " + str(self.tune_saved_jobs) + ", which the next run will start with."
+        print(message)
+    # end _tune_summary()
+
+
+    def _write_apply_plan(self, object_list, target_dir):
+        """
+        Write the --plan file, apply_plan.json in the base output directory, for the files of the last extraction.
+
+        * object_list: the full list from build_main_object_list(dependencies=True)
+        * target_dir: full path to the base output directory
+        """
+        plan = self._build_apply_plan(object_list, self.extract_job_list, target_dir)
+        plan_file = os.path.join(target_dir, "apply_plan.json")
+        temp_file = self._temp_output_file(plan_file)
+        fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+        json.dump(OrderedDict([('version', 1), ('waves', plan['waves']), ('cycles', plan['cycles'])]), fh, indent=2)
+        fh.write("\n")
+        fh.close()
+        self._commit_output_file(temp_file, plan_file)
+        if self.args and not self.args.quiet:
+            print("Apply plan with " + str(len(plan['waves'])) + " waves written to " + plan_file)
+            if len(plan['cycles']) > 0:
+                print("Warning: " + str(len(plan['cycles'])) + " files of the apply plan have circular dependencies and may fail to apply. They are listed under \"cycles\" in the plan.")
+    # end _write_apply_plan()
+
+
+    def _write_carryover(self, target_dir, carryover_list):
+        """
+        Save the output files of the objects that could not be extracted before the --deadline, or remove the file if there are none.
+
+        * target_dir: full path to the base output directory the carry-over file is kept in
+        * carryover_list: list of full paths to output files that were not extracted
+        """
+        carryover_file = self._state_file(target_dir, ".pg_extractor_carryover")
+        if len(carryover_list) == 0:
+            if os.path.exists(carryover_file):
+                os.remove(carryover_file)
+            return
+        # Not made yet when the files go to an --output_archive
+        self.create_dir(target_dir)
+        fh = open(carryover_file, 'w', encoding='utf-8', newline='\n')
+        fh.write("# Files pg_extractor did not extract before its --deadline. They are extracted first on the next run.\n")
+        for f in carryover_list:
+            fh.write(os.path.relpath(f, target_dir) + '\n')
+        fh.close()
+    # end _write_carryover()
+
+
+    def _write_data_chunks(self, pg_dump_cmd, output_file, chunk_dir):
+        """
+        Run pg_dump for --data_chunk_size and split the rows of every COPY block into numbered chunk files and a manifest.json
+        in chunk_dir as they are read from the pipe. Rows are never split, so a larger row gets a larger chunk of its own.
+
+        * pg_dump_cmd: the pg_dump command, writing to stdout in plain format
+        * output_file: file the rest of pg_dump's output is written to
+        * chunk_dir: full path of the folder the chunk files and manifest go in
+
+        Raises subprocess.CalledProcessError if pg_dump fails
+        """
+        chunk_size = int(self.args.data_chunk_size * 1048576)
+        p_copy = re.compile(rb'^COPY ((?:"(?:[^"]|"")*"|[^\s."]+)(?:\.(?:"(?:[^"]|"")*"|[^\s."]+))?) .*FROM stdin;\n$')
+        manifest_file = os.path.join(chunk_dir, "manifest.json")
+        chunk_list = []
+        temp_file_list = []
+        encoding_line = b""
+        copy_found = False
+        copy_line = None
+        chunk = None
+        chunk_fh = None
+        error_fh = tempfile.TemporaryFile(dir=self.args.temp)
+        proc = subprocess.Popen(pg_dump_cmd, stdout=subprocess.PIPE, stderr=error_fh)
+        fh = open(output_file, 'wb')
+        try:
+            for line in proc.stdout:
+                if copy_line == None:
+                    m = p_copy.match(line)
+                    if m == None:
+                        if line.startswith(b"SET client_encoding"):
+                            encoding_line = line
+                        fh.write(line)
+                        continue
+                    copy_found = True
+                    copy_line = encoding_line + line
+                    table = m.group(1).decode('utf-8')
+                    if self.output_archive == None:
+                        self.create_dir(chunk_dir)
+                    fh.write(("-- Data for " + table + " is in data chunk files listed in "
+                        + os.path.join(os.path.basename(chunk_dir), "manifest.json") + "\n").encode('utf-8'))
+                    continue
+                if line == b"\\.\n" or (chunk_fh != None and chunk['bytes'] + len(line) + 3 > chunk_size):
+                    if chunk_fh != None:
+                        chunk_fh.write(b"\\.\n")
+                        chunk_fh.close()
+                        chunk_fh = None
+                        chunk['bytes'] += 3
+                        chunk_list.append(chunk)
+                    if line == b"\\.\n":
+                        copy_line = None
+                        continue
+                if chunk_fh == None:
+                    chunk = OrderedDict([('file', "%04d.copy" % (len(chunk_list) + 1)), ('table', table), ('rows', 0), ('bytes', len(copy_line))])
+                    temp_file = self._temp_output_file(os.path.join(chunk_dir, chunk['file']))
+                    temp_file_list.append(temp_file)
+                    chunk_fh = open(temp_file, 'wb')
+                    chunk_fh.write(copy_line)
+                chunk_fh.write(line)
+                chunk['rows'] += 1
+                chunk['bytes'] += len(line)
+            fh.close()
+            proc.stdout.close()
+            if proc.wait() != 0:
+                error_fh.seek(0)
+                raise subprocess.CalledProcessError(proc.returncode, pg_dump_cmd, output=error_fh.read())
+            if copy_found:
+                temp_file = self._temp_output_file(manifest_file)
+                temp_file_list.append(temp_file)
+                manifest_fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+                json.dump(OrderedDict([('version', 1), ('file', os.path.basename(os.path.splitext(chunk_dir)[0]) + ".sql")
+                    , ('chunk_size', chunk_size), ('chunks', chunk_list)]), manifest_fh, indent=1)
+                manifest_fh.close()
+        except BaseException:
+            if chunk_fh != None:
+                chunk_fh.close()
+            if proc.poll() == None:
+                proc.kill()
+                proc.wait()
+            for f in temp_file_list:
+                if os.path.isfile(f):
+                    os.remove(f)
+            raise
+        finally:
+            fh.close()
+            proc.stdout.close()
+            error_fh.close()
+    # end _write_data_chunks()
+
+
+    def _write_journal(self, line):
+        """
+        Append a line to the --resume run journal and make sure it is on disk before continuing.
+
+        * line: journal entry without the trailing newline
+        """
+        self.journal_fh.write(line + '\n')
+        self.journal_fh.flush()
+        os.fsync(self.journal_fh.fileno())
+    # end _write_journal()
+
+
+    def _write_schema_copies(self, job):
+        """
+        Write the files of the --dedupe_schemas copies of a finished pg_restore job to their temporary names, checking any
+        picked for --dedupe_verify against pg_restore.
+
+        * job: a job dictionary with a 'schema_copies' list, see _dedupe_schema_jobs()
+
+        Returns None if all copies were written, otherwise the error message. No copy file is left behind then.
+        Raises subprocess.CalledProcessError if pg_restore for a --dedupe_verify check fails
+        """
+        fh = open(self._temp_output_file(job['output_file']), 'rb')
+        output = fh.read()
+        fh.close()
+        start = re.search(rb'^--\n-- (Data for )?Name: ', output, flags=re.M)
+        if start == None:
+            return "No object entries found in pg_restore output of " + job['output_file'] + " to make --dedupe_schemas copies from"
+        end = output.rfind(b'\n--\n-- PostgreSQL database dump complete')
+        if end < start.start():
+            end = len(output)
+        temp_file_list = []
+        try:
+            for copy_job in job['schema_copies']:
+                from_schema, to_schema = copy_job['copy_schemas']
+                copy_output = output[:start.start()] + self._schema_substitute(output[start.start():end], from_schema, to_schema) + output[end:]
+                temp_file = self._temp_output_file(copy_job['output_file'])
+                temp_file_list.append(temp_file)
+                fh = open(temp_file, 'wb')
+                fh.write(copy_output)
+                fh.close()
+                if copy_job.get('copy_verify'):
+                    verify_file = temp_file + ".verify"
+                    temp_file_list.append(verify_file)
+                    self._run_pg_restore(copy_job['list_file'], verify_file)
+                    fh = open(verify_file, 'rb')
+                    verify_output = fh.read()
+                    fh.close()
+                    os.remove(verify_file)
+                    temp_file_list.remove(verify_file)
+                    if verify_output != copy_output:
+                        return ("--dedupe_verify: copy made from " + job['output_file'] + " does not match pg_restore output of "
+                            + copy_job['output_file'] + ". Run without --dedupe_schemas to extract these objects.")
+            temp_file_list = []
+        finally:
+            for f in temp_file_list:
+                if os.path.isfile(f):
+                    os.remove(f)
+        return None
+    # end _write_schema_copies()
+
+
+    def _write_shard_manifest(self, extract_file_list, error_count):
+        """
+        Write the manifest of a finished --shard run listing every file the shard is responsible for, for merge_shards().
+
+        * extract_file_list: list of the full paths to all files of this shard's run
+        * error_count: number of objects that failed to extract
+        """
+        manifest_file = self._state_file(self.args.basedir, ".pg_extractor_manifest.json")
+        temp_file = self._temp_output_file(manifest_file)
+        fh = open(temp_file, 'w', encoding='utf-8', newline='\n')
+        json.dump(OrderedDict([('shard', self.args.shard[0]), ('shards', self.args.shard[1]), ('errors', error_count)
+            , ('files', sorted(os.path.relpath(f, self.args.basedir) for f in extract_file_list))]), fh, indent=1)
+        fh.close()
+        os.replace(temp_file, manifest_file)
+    # end _write_shard_manifest()
+
+
+    def _write_trace_file(self):
+        """
+        Write the --trace_file timeline in Chrome trace event JSON format, with every --jobs worker on its own thread.
+        """
+        # Events of each child are added once it has finished, so sort them. An end goes before a begin at the same time.
+        event_list = sorted(self.trace_events, key=lambda e: (e['ts'], e['ph'] != "E"))
+        name_list = [{'name': "process_name", 'ph': "M", 'pid': 1, 'tid': 0, 'args': {'name': "pg_extractor " + os.environ.get("PGDATABASE", "")}}]
+        for tid in sorted(set([e['tid'] for e in event_list] + [0])):
+            thread_name = "main"
+            if tid > 0:
+                thread_name = "worker " + str(tid)
+            name_list.append({'name': "thread_name", 'ph': "M", 'pid': 1, 'tid': tid, 'args': {'name': thread_name}})
+        temp_file = self.args.trace_file + ".tmp"
+        fh = open(temp_file, 'w', encoding='utf-8')
+        json.dump({'traceEvents': name_list + event_list, 'displayTimeUnit': "ms"}, fh)
+        fh.close()
+        os.replace(temp_file, self.args.trace_file)
+    # end _write_trace_file()
 
 
 # end PGExtractor class
@@ -1485,32 +5065,32 @@ if __name__ == "__main__":
         p.show_examples()
         sys.exit(1)
 
-    try:
-        p._set_config()
-        p._create_temp_dump()
-        main_object_list = p.build_main_object_list()
-        filtered_list = p._filter_object_list(main_object_list)
-        extracted_files_list = p.create_extract_files(filtered_list)
-        if p.args.getroles:
-            role_file = p.extract_roles()
-            extracted_files_list.append(role_file)
-            if p.args.remove_passwords:
-                p.remove_passwords(role_file)
-        if p.args.delete:
-            p.delete_files(extracted_files_list)
-        if p.args.orreplace:
-            p.or_replace()
-
-        spline = random.randint(1,10000)
-        if spline > 9000 and not p.args.quiet:
-            print("Reticulating splines...")
-
-    finally:
-        if not p.tmp_dump_file.closed:
-            p.tmp_dump_file.close()
-
-        p._cleanup_temp_files()
-            
+    if p.args.merge_shards:
+        p.merge_shards()
+        if not p.args.quiet:
+            print("Done")
+        sys.exit(0)
+
+    if p.args.explain:
+        p.explain(p.args)
+        sys.exit(0)
+
+    if p.args.apply_plan != None:
+        p.apply_plan(p.args.apply_plan)
+        if not p.args.quiet:
+            print("Done")
+        sys.exit(0)
+
+    with contextlib.closing(p.iter_extract(p.args)) as result_iter:
+        for result in result_iter:
+            if result.error != None:
+                print(result.error)
+                sys.exit(2)
+
+    spline = random.randint(1,10000)
+    if spline > 9000 and not p.args.quiet:
+        print("Reticulating splines...")
+
     if not p.args.quiet:
         print("Done")
    
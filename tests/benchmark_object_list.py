@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory and time of build_main_object_list() for a large made up pg_restore -l list, compared with keeping a dict per
+object as it did before PGObject. Not run by pytest.
+
+    python3 tests/benchmark_object_list.py [number of objects, default 1000000]
+
+The list has 100 schemas and 10 owners, and every 10th object is a FUNCTION. Each table also has a TABLE DATA,
+INDEX, COMMENT and ACL entry.
+"""
+import os
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pg_extractor import PGExtractor
+
+
+def write_toc(fh, count):
+    dumpid = 1
+    while dumpid <= count:
+        schema = "schema_" + str(dumpid % 100)
+        owner = "owner_" + str(dumpid % 10)
+        if dumpid % 10 == 0:
+            fh.write("%d; 1255 %d FUNCTION %s func_%d(integer, text) %s\n" % (dumpid, dumpid + 16384, schema, dumpid, owner))
+            dumpid += 1
+            continue
+        name = "table_" + str(dumpid)
+        fh.write("%d; 1259 %d TABLE %s %s %s\n" % (dumpid, dumpid + 16384, schema, name, owner))
+        fh.write("%d; 0 %d TABLE DATA %s %s %s\n" % (dumpid + 1, dumpid + 16384, schema, name, owner))
+        fh.write("%d; 1259 %d INDEX %s %s_pkey %s\n" % (dumpid + 2, dumpid + 16386, schema, name, owner))
+        fh.write("%d; 0 0 COMMENT %s TABLE %s %s\n" % (dumpid + 3, schema, name, owner))
+        fh.write("%d; 0 0 ACL %s TABLE %s %s\n" % (dumpid + 4, schema, name, owner))
+        dumpid += 5
+
+
+def copy_string(s):
+    return s[:1] + s[1:] if len(s) > 1 else s
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    work_dir = tempfile.mkdtemp()
+    toc_file = os.path.join(work_dir, "toc.txt")
+    with open(toc_file, "w") as fh:
+        write_toc(fh, count)
+    # pg_restore stand-in that prints the list, so no database or dump file is needed
+    pg_restore = os.path.join(work_dir, "pg_restore")
+    with open(pg_restore, "w") as fh:
+        fh.write("#!/bin/sh\nexec cat '" + toc_file + "'\n")
+    os.chmod(pg_restore, stat.S_IRWXU)
+    os.environ["PATH"] = work_dir + os.pathsep + os.environ["PATH"]
+
+    p = PGExtractor()
+    start_time = time.time()
+    object_list = p.build_main_object_list(toc_file)
+    duration = time.time() - start_time
+    del object_list
+
+    tracemalloc.start()
+    object_list = p.build_main_object_list(toc_file)
+    pgobject_bytes = tracemalloc.get_traced_memory()[0]
+    before = tracemalloc.get_traced_memory()[0]
+    dict_list = [dict((k, copy_string(v)) for k, v in o.items()) for o in object_list]
+    dict_bytes = tracemalloc.get_traced_memory()[0] - before
+    del dict_list
+    tracemalloc.stop()
+
+    print("objects:          " + str(len(object_list)))
+    print("parse time:       %.1fs" % duration)
+    print("PGObject records: %.1f MB" % (pgobject_bytes / 1024 / 1024))
+    print("dict records:     %.1f MB" % (dict_bytes / 1024 / 1024))
+    os.remove(toc_file)
+    os.remove(pg_restore)
+    os.rmdir(work_dir)
+
+
+if __name__ == "__main__":
+    main()
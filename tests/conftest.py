@@ -0,0 +1,108 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKEBIN_DIR = os.path.join(TESTS_DIR, "fakebin")
+SCRIPT = os.path.join(os.path.dirname(TESTS_DIR), "pg_extractor.py")
+
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+
+def run_script(env, args, cwd=None):
+    """
+    Run pg_extractor.py from the command line with the given environment and options.
+    Returns the CompletedProcess, with the output as text.
+    """
+    return subprocess.run([sys.executable, SCRIPT] + list(args), stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        , universal_newlines=True, env=env, cwd=cwd)
+
+
+def fake_calls(env, program):
+    """
+    Return the logged calls of one fake program as lists of arguments.
+    """
+    if not os.path.isfile(env["FAKE_LOG"]):
+        return []
+    with open(env["FAKE_LOG"]) as fh:
+        return [l.split()[1:] for l in fh if l.split()[0] == program]
+
+
+def psql(env, dbname, sql):
+    """
+    Run SQL in a database of the postgres fixture's cluster and return the output of its last statement.
+    """
+    return subprocess.check_output(["psql", "--no-psqlrc", "--quiet", "--no-align", "--tuples-only", "--set=ON_ERROR_STOP=1"
+        , "--dbname=" + dbname, "--command=" + sql], env=env, universal_newlines=True)
+
+
+@pytest.fixture
+def fake_env(tmp_path, monkeypatch):
+    """
+    Environment that runs the fake pg_dump, pg_restore, pg_dumpall and psql in tests/fakebin instead of the real ones.
+    Every call they get is logged to the file in FAKE_LOG.
+    """
+    monkeypatch.setenv("PATH", FAKEBIN_DIR + os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("FAKE_LOG", str(tmp_path / "calls.log"))
+    for name in [n for n in os.environ if n.startswith("FAKE_") and n != "FAKE_LOG"]:
+        monkeypatch.delenv(name)
+    return os.environ
+
+
+@pytest.fixture
+def run_extractor(fake_env, tmp_path):
+    """
+    Run pg_extractor.py from the command line against the fake binaries with the given options.
+    """
+    def run(*args):
+        return run_script(fake_env, ["--dbname=mydb", "--temp=" + str(tmp_path)] + list(args), cwd=str(tmp_path))
+    return run
+
+
+@pytest.fixture(scope="session")
+def postgres(tmp_path_factory):
+    """
+    Scratch PostgreSQL cluster for the tests that need a real database, made with the initdb and pg_ctl in
+    PGEXTRACTOR_TEST_PGBIN, or else the PATH. Those tests are skipped if there are none.
+    Returns the environment to connect to it, with its binaries first in the PATH.
+    """
+    bindir = os.environ.get("PGEXTRACTOR_TEST_PGBIN")
+    if bindir == None and shutil.which("initdb") != None:
+        bindir = os.path.dirname(shutil.which("initdb"))
+    if bindir == None and shutil.which("pg_config") != None:
+        bindir = subprocess.check_output(["pg_config", "--bindir"], universal_newlines=True).strip()
+    if bindir == None or not os.path.isfile(os.path.join(bindir, "initdb")):
+        pytest.skip("initdb not found. Set PGEXTRACTOR_TEST_PGBIN to the PostgreSQL bin folder to run this test.")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("PostgreSQL can't be run as root")
+    base_dir = tmp_path_factory.mktemp("postgres")
+    data_dir = str(base_dir / "data")
+    env = dict(os.environ, PATH=bindir + os.pathsep + os.environ["PATH"], PGHOST=str(base_dir), PGPORT="5432", PGUSER="postgres")
+    for name in ("PGDATABASE", "PGSERVICE", "PGHOSTADDR", "PGPASSWORD"):
+        env.pop(name, None)
+    subprocess.check_output(["initdb", "--pgdata=" + data_dir, "--auth=trust", "--username=postgres", "--no-sync"]
+        , env=env, stderr=subprocess.STDOUT)
+    subprocess.check_output(["pg_ctl", "start", "--pgdata=" + data_dir, "--log=" + str(base_dir / "log"), "--wait"
+        , "-o", "-k '" + str(base_dir) + "' -c listen_addresses='' -c fsync=off -p 5432"], env=env, stderr=subprocess.STDOUT)
+    yield env
+    subprocess.check_output(["pg_ctl", "stop", "--pgdata=" + data_dir, "--mode=immediate"], env=env, stderr=subprocess.STDOUT)
+
+
+@pytest.fixture
+def new_database(postgres, request):
+    """
+    Function that creates a new empty database in the postgres fixture's cluster and returns its name.
+    The databases are dropped again after the test.
+    """
+    dbname_list = []
+    def create(suffix):
+        dbname = "test_" + request.node.name.lower()[:40] + "_" + suffix
+        psql(postgres, "postgres", 'CREATE DATABASE "' + dbname + '"')
+        dbname_list.append(dbname)
+        return dbname
+    yield create
+    for dbname in dbname_list:
+        psql(postgres, "postgres", 'DROP DATABASE "' + dbname + '"')
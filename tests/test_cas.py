@@ -0,0 +1,65 @@
+import errno
+import hashlib
+import os
+
+import pytest
+
+from pg_extractor import PGExtractor, PGExtractorOptions
+
+
+def output_files(basedir):
+    return sorted(os.path.relpath(os.path.join(d, f), basedir) for d, dirs, files in os.walk(basedir) for f in files)
+
+
+def store_file(cas_dir, path):
+    with open(path, 'rb') as fh:
+        file_hash = hashlib.sha256(fh.read()).hexdigest()
+    return os.path.join(cas_dir, file_hash[:2], file_hash[2:])
+
+
+def test_cas_dir_links_files_of_both_runs(run_extractor, tmp_path):
+    cas_dir = str(tmp_path / "cas")
+    for basedir in ("out1", "out2"):
+        result = run_extractor("--getall", "--cas_dir=" + cas_dir, "--basedir=" + str(tmp_path / basedir), "--quiet")
+        assert result.returncode == 0, result.stdout
+    file_list = output_files(str(tmp_path / "out1"))
+    assert len(file_list) > 0 and file_list == output_files(str(tmp_path / "out2"))
+    for f in file_list:
+        f1 = os.stat(str(tmp_path / "out1" / f))
+        f2 = os.stat(str(tmp_path / "out2" / f))
+        stored = os.stat(store_file(cas_dir, str(tmp_path / "out1" / f)))
+        assert f1.st_ino == f2.st_ino == stored.st_ino
+        assert stored.st_nlink >= 3
+    assert not [f for d, dirs, files in os.walk(cas_dir) for f in files if "." in f]
+
+
+def cas_extractor(tmp_path):
+    p = PGExtractor()
+    p.args = PGExtractorOptions(cas_dir=str(tmp_path / "cas"))
+    for name in ("first", "second"):
+        with open(str(tmp_path / name), 'w') as fh:
+            fh.write("CREATE TABLE t ();\n")
+    p._cas_store(str(tmp_path / "first"))
+    return p
+
+
+def test_cas_keeps_copy_when_link_fails(tmp_path, monkeypatch):
+    p = cas_extractor(tmp_path)
+    def link(src, dst):
+        raise OSError(errno.EMLINK, "Too many links")
+    monkeypatch.setattr(os, "link", link)
+    p._cas_store(str(tmp_path / "second"))
+    assert (tmp_path / "second").read_text() == "CREATE TABLE t ();\n"
+    assert os.stat(str(tmp_path / "second")).st_nlink == 1
+    assert not (tmp_path / "second.cas").exists()
+
+
+def test_cas_link_error_keeps_output(tmp_path, monkeypatch, capsys):
+    p = cas_extractor(tmp_path)
+    def link(src, dst):
+        raise PermissionError(errno.EACCES, "Permission denied")
+    monkeypatch.setattr(os, "link", link)
+    with pytest.raises(SystemExit):
+        p._cas_store(str(tmp_path / "second"))
+    assert "Error linking output file to --cas_dir entry" in capsys.readouterr().out
+    assert (tmp_path / "second").read_text() == "CREATE TABLE t ();\n"
@@ -0,0 +1,138 @@
+import os
+import subprocess
+
+import pytest
+
+from conftest import fake_calls, psql, run_script
+
+# Tables and schemas the extracted files depend on, but are not part of them
+BASE_SQL = """
+DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_catalog.pg_roles WHERE rolname = 'reader') THEN CREATE ROLE reader; END IF; END $$;
+CREATE SCHEMA app;
+CREATE TABLE app.orders (id integer PRIMARY KEY, amount numeric, note text);
+"""
+
+SOURCE_SQL = BASE_SQL + """
+CREATE TYPE app.mood AS ENUM ('sad', 'ok', 'it''s fine');
+COMMENT ON TYPE app.mood IS 'How it''s going';
+GRANT USAGE ON TYPE app.mood TO reader;
+CREATE TYPE app.pair AS (a integer, b text COLLATE "C");
+CREATE DOMAIN app.posint AS integer DEFAULT 1 NOT NULL CONSTRAINT posint_check CHECK (VALUE > 0);
+CREATE FUNCTION app.add(a integer, b integer DEFAULT 1) RETURNS integer LANGUAGE sql IMMUTABLE AS $$ SELECT a + b $$;
+CREATE FUNCTION app.add(a text, b text) RETURNS text LANGUAGE sql AS $$ SELECT a || b $$;
+COMMENT ON FUNCTION app.add(integer, integer) IS 'Adds';
+REVOKE ALL ON FUNCTION app.add(text, text) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION app.add(text, text) TO reader;
+CREATE FUNCTION app."Weird Name"() RETURNS app.mood LANGUAGE plpgsql SECURITY DEFINER SET search_path = app
+    AS $$ BEGIN RETURN 'ok'; END $$;
+CREATE FUNCTION app.total_sfunc(integer, integer) RETURNS integer LANGUAGE sql AS $$ SELECT $1 + $2 $$;
+CREATE AGGREGATE app.total(integer) (sfunc = app.total_sfunc, stype = integer);
+CREATE VIEW app.big_orders WITH (security_barrier) AS SELECT id, amount FROM app.orders WHERE amount > 100 WITH CASCADED CHECK OPTION;
+ALTER VIEW app.big_orders ALTER COLUMN amount SET DEFAULT 101;
+COMMENT ON VIEW app.big_orders IS 'Big';
+COMMENT ON COLUMN app.big_orders.id IS 'Order id';
+GRANT SELECT ON app.big_orders TO reader;
+CREATE MATERIALIZED VIEW app.order_totals AS SELECT pg_catalog.count(*) AS n FROM app.orders WITH NO DATA;
+CREATE INDEX order_totals_n ON app.order_totals (n);
+CREATE VIEW app.trigger_view AS SELECT id, note FROM app.orders;
+CREATE FUNCTION app.trigger_view_insert() RETURNS trigger LANGUAGE plpgsql
+    AS $$ BEGIN INSERT INTO app.orders (id, note) VALUES (NEW.id, NEW.note); RETURN NEW; END $$;
+CREATE TRIGGER trigger_view_insert INSTEAD OF INSERT ON app.trigger_view FOR EACH ROW EXECUTE PROCEDURE app.trigger_view_insert();
+CREATE VIEW app.rule_view AS SELECT id FROM app.orders;
+CREATE RULE rule_view_delete AS ON DELETE TO app.rule_view DO INSTEAD DELETE FROM app.orders WHERE id = OLD.id;
+CREATE VIEW app.column_grant_view AS SELECT id, note FROM app.orders;
+GRANT SELECT (id) ON app.column_grant_view TO reader;
+"""
+
+# Left to pg_dump and pg_restore, so the same with both backends
+FALLBACK_FILES = ["views/app.trigger_view.sql", "views/app.rule_view.sql", "views/app.column_grant_view.sql", "aggregates/app.total.sql"]
+
+
+def extract(postgres, dbname, basedir, *args):
+    result = run_script(postgres, ["--dbname=" + dbname, "--basedir=" + basedir, "--nodbnamedir", "--getfuncs", "--getviews"
+        , "--gettypes", "--quiet"] + list(args), cwd=basedir.rsplit(os.sep, 1)[0])
+    assert result.returncode == 0, result.stdout
+    return sorted(os.path.relpath(os.path.join(d, f), basedir) for d, dirs, files in os.walk(basedir) for f in files)
+
+
+def load(postgres, dbname, basedir, file_list):
+    # Files are applied in rounds until all of them have loaded, since they are not in dependency order
+    psql(postgres, dbname, BASE_SQL)
+    pending = list(file_list)
+    while len(pending) > 0:
+        failed = []
+        for f in pending:
+            if subprocess.run(["psql", "--no-psqlrc", "--quiet", "--single-transaction", "--set=ON_ERROR_STOP=1", "--dbname=" + dbname
+                    , "--file=" + os.path.join(basedir, f)], env=postgres, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                failed.append(f)
+        assert len(failed) < len(pending), "files that can't be loaded: " + str(failed)
+        pending = failed
+
+
+def schema_dump(postgres, dbname, *args):
+    return subprocess.check_output(["pg_dump", "--schema-only", "--dbname=" + dbname] + list(args), env=postgres, universal_newlines=True)
+
+
+@pytest.fixture
+def source_database(postgres, new_database):
+    dbname = new_database("source")
+    psql(postgres, dbname, SOURCE_SQL)
+    return dbname
+
+
+def test_catalog_backend_files(postgres, source_database, tmp_path):
+    dump_files = extract(postgres, source_database, str(tmp_path / "dump"))
+    catalog_files = extract(postgres, source_database, str(tmp_path / "catalog"), "--backend=catalog")
+    assert catalog_files == dump_files
+    for f in FALLBACK_FILES:
+        assert (tmp_path / "catalog" / f).read_text() == (tmp_path / "dump" / f).read_text()
+    assert "CREATE OR REPLACE FUNCTION app.add(a text, b text)" in (tmp_path / "catalog" / "functions" / "app.add.sql").read_text()
+    # PostgreSQL 17+ also lists a domain's NOT NULL in pg_constraint
+    assert (tmp_path / "catalog" / "types" / "app.posint.sql").read_text().count("NOT NULL") == 1
+
+
+@pytest.mark.parametrize("options", [[], ["--no_owner", "--no_acl"]])
+def test_catalog_backend_loads_the_same(postgres, source_database, new_database, tmp_path, options):
+    dump_files = extract(postgres, source_database, str(tmp_path / "dump"), *options)
+    catalog_files = extract(postgres, source_database, str(tmp_path / "catalog"), "--backend=catalog", *options)
+    dump_database = new_database("dump")
+    catalog_database = new_database("catalog")
+    load(postgres, dump_database, str(tmp_path / "dump"), dump_files)
+    load(postgres, catalog_database, str(tmp_path / "catalog"), catalog_files)
+    # The pg_restore backend does not write the privileges of functions and types whose ACL entries pg_restore lists
+    # with argument names, so the privileges are compared with the source database instead
+    assert schema_dump(postgres, catalog_database, "--no-acl") == schema_dump(postgres, dump_database, "--no-acl")
+    if len(options) == 0:
+        assert schema_dump(postgres, catalog_database) == schema_dump(postgres, source_database)
+
+
+def test_catalog_backend_reads_the_dump_snapshot(run_extractor, fake_env, tmp_path):
+    result = run_extractor("--getfuncs", "--backend=catalog", "--basedir=" + str(tmp_path / "out"), "--quiet")
+    assert result.returncode == 0, result.stdout
+    temp_dump_call = [c for c in fake_calls(fake_env, "pg_dump") if "--format=custom" in c][0]
+    assert "--snapshot=00000003-0000001B-1" in temp_dump_call
+    assert "CREATE function;" in (tmp_path / "out" / "mydb" / "functions" / "public.foo.sql").read_text()
+
+
+def test_catalog_backend_fallback(run_extractor, fake_env, tmp_path, monkeypatch):
+    # public.foo(integer) has no definition in the catalog, so the file is extracted with pg_restore
+    monkeypatch.setenv("FAKE_CATALOG_SKIP", "16395")
+    result = run_extractor("--getfuncs", "--backend=catalog", "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    assert "1 objects not supported by --backend catalog" in result.stdout
+    assert "Name: foo(integer); Type: FUNCTION" in (tmp_path / "out" / "mydb" / "functions" / "public.foo.sql").read_text()
+    assert "CREATE function;" in (tmp_path / "out" / "mydb" / "functions" / "jobmon.bar.sql").read_text()
+
+
+def test_catalog_backend_resume_uses_the_dump(run_extractor, fake_env, tmp_path, monkeypatch):
+    # The resumed run reuses the temp dump of the failed one, which the catalog may no longer match
+    basedir = tmp_path / "out"
+    monkeypatch.setenv("FAKE_FAIL", "job_detail_p0")
+    result = run_extractor("--getall", "--resume", "--backend=catalog", "--basedir=" + str(basedir))
+    assert result.returncode == 2
+    assert "Reading definitions from the catalog" in result.stdout
+    monkeypatch.delenv("FAKE_FAIL")
+    result = run_extractor("--getall", "--resume", "--backend=catalog", "--basedir=" + str(basedir))
+    assert result.returncode == 0, result.stdout
+    assert "Temp dump was not made by this run" in result.stdout
+    assert "Name: foo(integer); Type: FUNCTION" in (basedir / "mydb" / "functions" / "public.foo.sql").read_text()
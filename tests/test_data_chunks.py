@@ -0,0 +1,45 @@
+import json
+import types
+
+from pg_extractor import PGExtractor
+
+
+def read_manifest(basedir, table_file):
+    with open(str(basedir / "mydb" / "tables" / table_file / "manifest.json")) as fh:
+        return json.load(fh)
+
+
+def test_chunks_are_bounded(run_extractor, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ROWS", "100")
+    monkeypatch.setenv("FAKE_ROW_BYTES", "50")
+    basedir = tmp_path / "out"
+    result = run_extractor("--gettables", "--getdata", "--data_chunk_size=0.002", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    manifest = read_manifest(basedir, "jobmon.job_detail.chunks")
+    assert len(manifest['chunks']) > 1
+    assert sum(c['rows'] for c in manifest['chunks']) == 100
+    assert all(c['bytes'] <= manifest['chunk_size'] for c in manifest['chunks'])
+
+
+def test_row_larger_than_chunk_size(run_extractor, tmp_path, monkeypatch):
+    # Rows are never split, so each of these rows gets a chunk of its own that is larger than --data_chunk_size
+    monkeypatch.setenv("FAKE_ROWS", "3")
+    monkeypatch.setenv("FAKE_ROW_BYTES", "3000")
+    basedir = tmp_path / "out"
+    result = run_extractor("--gettables", "--getdata", "--data_chunk_size=0.002", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    manifest = read_manifest(basedir, "jobmon.job_detail.chunks")
+    assert [c['rows'] for c in manifest['chunks']] == [1, 1, 1]
+    assert all(c['bytes'] > manifest['chunk_size'] for c in manifest['chunks'])
+    with open(str(basedir / "mydb" / "tables" / "jobmon.job_detail.chunks" / "0002.copy")) as fh:
+        assert fh.read().splitlines()[-2].startswith("1\trow 1xxx")
+
+
+def test_create_extract_files_without_arguments(fake_env, tmp_path):
+    # Library callers don't have to run _parse_arguments()
+    p = PGExtractor()
+    p.tmp_dump_file = types.SimpleNamespace(name=str(tmp_path / "dump.pgr"))
+    object_list = p.build_main_object_list(p.tmp_dump_file.name)
+    file_list = p.create_extract_files(object_list, str(tmp_path / "out"))
+    assert str(tmp_path / "out" / "tables" / "jobmon.job_detail.sql") in file_list
+    assert (tmp_path / "out" / "functions" / "public.foo.sql").is_file()
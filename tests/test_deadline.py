@@ -0,0 +1,34 @@
+import os
+
+from conftest import fake_calls
+
+
+def test_deadline_skips_roles_and_plan(run_extractor, fake_env, tmp_path):
+    basedir = tmp_path / "out"
+    result = run_extractor("--getall", "--getroles", "--plan", "--deadline=0", "--basedir=" + str(basedir))
+    assert result.returncode == 0, result.stdout
+    assert "Roles were not extracted" in result.stdout
+    assert "apply plan was not written" in result.stdout
+    assert not (basedir / "mydb" / "roles").exists() or os.listdir(str(basedir / "mydb" / "roles")) == []
+    assert not (basedir / "mydb" / "apply_plan.json").exists()
+    assert fake_calls(fake_env, "pg_dumpall") == []
+    with open(str(basedir / "mydb" / ".pg_extractor_carryover")) as fh:
+        assert "tables/jobmon.job_detail.sql\n" in fh.readlines()
+
+
+def test_deadline_keeps_role_files(run_extractor, tmp_path):
+    basedir = tmp_path / "out"
+    result = run_extractor("--getroles", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    role_files = sorted(os.listdir(str(basedir / "mydb" / "roles")))
+    assert len(role_files) > 0
+    result = run_extractor("--getroles", "--delete", "--deadline=0", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert sorted(os.listdir(str(basedir / "mydb" / "roles"))) == role_files
+
+
+def test_deadline_orreplace_per_file(run_extractor, tmp_path):
+    basedir = tmp_path / "out"
+    result = run_extractor("--getfuncs", "--orreplace", "--deadline=3600", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert "CREATE OR REPLACE FUNCTION" in (basedir / "mydb" / "functions" / "jobmon.bar.sql").read_text()
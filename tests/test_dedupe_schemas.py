@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from conftest import fake_calls
+
+TOC = """;
+; Selected TOC Entries:
+;
+5; 2615 17000 SCHEMA - app keith
+6; 2615 17001 SCHEMA - tenant1 keith
+7; 2615 17002 SCHEMA - tenant2 keith
+8; 2615 17003 SCHEMA - tenant3 keith
+20; 1255 17010 FUNCTION app total() keith
+21; 1255 17011 FUNCTION tenant1 total() keith
+22; 1255 17012 FUNCTION tenant2 total() keith
+23; 1255 17013 FUNCTION tenant3 total() keith
+"""
+
+# app_x is another schema whose name only starts with app, so the copies must keep it
+DEFINITION = "CREATE FUNCTION {0}.total() RETURNS bigint LANGUAGE sql AS $$ SELECT count(*) FROM {0}.orders JOIN app_x.orders USING (id) $$;"
+DEFINITIONS = {"20": DEFINITION.format("app"), "21": DEFINITION.format("tenant1"), "22": DEFINITION.format("tenant2")
+    , "23": DEFINITION.format("tenant3").replace("count(*)", "sum(amount)")}
+
+
+@pytest.fixture
+def tenant_env(fake_env, tmp_path, monkeypatch):
+    (tmp_path / "toc.txt").write_text(TOC)
+    (tmp_path / "definitions.json").write_text(json.dumps(DEFINITIONS))
+    monkeypatch.setenv("FAKE_TOC", str(tmp_path / "toc.txt"))
+    monkeypatch.setenv("FAKE_DEFINITIONS", str(tmp_path / "definitions.json"))
+    return fake_env
+
+
+def restore_calls(env):
+    return [c for c in fake_calls(env, "pg_restore") if "--list" not in c and "--verbose" not in c]
+
+
+def pg_restore_output(env, tmp_path, dumpid):
+    list_file = tmp_path / ("list." + dumpid)
+    list_file.write_text(dumpid + "; 1255 0 FUNCTION\n")
+    return subprocess.check_output(["pg_restore", "--use-list=" + str(list_file), "dump.pgr"], env=env)
+
+
+def test_dedupe_schemas_copies(run_extractor, tenant_env, tmp_path):
+    result = run_extractor("--getfuncs", "--basedir=" + str(tmp_path / "plain"), "--quiet")
+    assert result.returncode == 0, result.stdout
+    plain_calls = len(restore_calls(tenant_env))
+    result = run_extractor("--getfuncs", "--dedupe_schemas", "--basedir=" + str(tmp_path / "dedupe"))
+    assert result.returncode == 0, result.stdout
+    assert "Found 2 objects that are the same in another schema" in result.stdout
+    # tenant1 and tenant2 are written from the app output, tenant3 is extracted on its own
+    assert len(restore_calls(tenant_env)) - plain_calls == plain_calls - 2
+
+    functions_dir = tmp_path / "dedupe" / "mydb" / "functions"
+    for schema, dumpid in (("app", "20"), ("tenant1", "21"), ("tenant2", "22"), ("tenant3", "23")):
+        output = (functions_dir / (schema + ".total.sql")).read_bytes()
+        assert output == pg_restore_output(tenant_env, tmp_path, dumpid)
+        assert output == (tmp_path / "plain" / "mydb" / "functions" / (schema + ".total.sql")).read_bytes()
+    copy_output = (functions_dir / "tenant1.total.sql").read_text()
+    assert "FROM tenant1.orders JOIN app_x.orders" in copy_output
+    assert "Schema: tenant1;" in copy_output
+    assert "sum(amount)" in (functions_dir / "tenant3.total.sql").read_text()
+
+
+def test_dedupe_verify(run_extractor, tenant_env, tmp_path):
+    result = run_extractor("--getfuncs", "--dedupe_schemas", "--dedupe_verify=2", "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    assert "does not match" not in result.stdout
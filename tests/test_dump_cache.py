@@ -0,0 +1,75 @@
+import os
+
+from conftest import fake_calls, psql, run_script
+
+
+def temp_dump_calls(env):
+    return [c for c in fake_calls(env, "pg_dump") if "--format=custom" in c]
+
+
+def test_dump_cache_hit_and_miss(run_extractor, fake_env, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    args = ["--getfuncs", "--dump_cache=" + cache_dir, "--basedir=" + str(tmp_path / "out")]
+    monkeypatch.setenv("FAKE_FINGERPRINT", "fp1")
+    result = run_extractor(*args)
+    assert result.returncode == 0, result.stdout
+    assert len(temp_dump_calls(fake_env)) == 1
+    assert len([f for f in os.listdir(cache_dir) if f.endswith(".pgr")]) == 1
+
+    result = run_extractor(*args)
+    assert result.returncode == 0, result.stdout
+    assert "Catalog unchanged. Reusing temp dump from --dump_cache" in result.stdout
+    assert len(temp_dump_calls(fake_env)) == 1
+
+    # DDL since the last run changes the fingerprint
+    monkeypatch.setenv("FAKE_FINGERPRINT", "fp2")
+    result = run_extractor(*args)
+    assert result.returncode == 0, result.stdout
+    assert "Reusing temp dump" not in result.stdout
+    assert len(temp_dump_calls(fake_env)) == 2
+    assert len([f for f in os.listdir(cache_dir) if f.endswith(".pgr")]) == 1
+
+    # Options of the temp dump are another entry
+    result = run_extractor("--schema_include=public", *args)
+    assert result.returncode == 0, result.stdout
+    assert len(temp_dump_calls(fake_env)) == 3
+
+
+def test_dump_cache_misses_after_ddl(postgres, new_database, tmp_path):
+    dbname = new_database("source")
+    psql(postgres, dbname, "CREATE FUNCTION public.one() RETURNS integer LANGUAGE sql AS $$ SELECT 1 $$;"
+        + " CREATE ROLE cache_reader LOGIN; GRANT CREATE ON SCHEMA public TO cache_reader;")
+    # The fingerprint must be readable without superuser (ex: pg_subscription.subconninfo is not)
+    env = dict(postgres, PGUSER="cache_reader")
+    args = ["--dbname=" + dbname, "--getfuncs", "--dump_cache=" + str(tmp_path / "cache"), "--basedir=" + str(tmp_path / "out"), "--nodbnamedir"]
+    try:
+        result = run_script(env, args, cwd=str(tmp_path))
+        assert result.returncode == 0, result.stdout
+        assert "Reusing temp dump" not in result.stdout
+        result = run_script(env, args, cwd=str(tmp_path))
+        assert result.returncode == 0, result.stdout
+        assert "Catalog unchanged. Reusing temp dump from --dump_cache" in result.stdout
+        # ANALYZE changes pg_class but no definitions
+        psql(postgres, dbname, "CREATE TABLE public.t (id integer); INSERT INTO public.t SELECT pg_catalog.generate_series(1, 1000);"
+            + " GRANT SELECT ON public.t TO cache_reader")
+        result = run_script(env, args, cwd=str(tmp_path))
+        assert result.returncode == 0, result.stdout
+        assert "Reusing temp dump" not in result.stdout
+        psql(postgres, dbname, "ANALYZE public.t")
+        result = run_script(env, args, cwd=str(tmp_path))
+        assert result.returncode == 0, result.stdout
+        assert "Catalog unchanged. Reusing temp dump from --dump_cache" in result.stdout
+        for sql in ("CREATE FUNCTION public.two() RETURNS integer LANGUAGE sql AS $$ SELECT 2 $$"
+                , "COMMENT ON FUNCTION public.one() IS 'One'"
+                , "CREATE ACCESS METHOD heap2 TYPE TABLE HANDLER heap_tableam_handler"
+                , "CREATE PUBLICATION pub FOR TABLE public.t"
+                , "ALTER PUBLICATION pub ADD TABLES IN SCHEMA public"):
+            psql(postgres, dbname, sql)
+            result = run_script(env, args, cwd=str(tmp_path))
+            assert result.returncode == 0, result.stdout
+            assert "Reusing temp dump" not in result.stdout, sql
+        assert (tmp_path / "out" / "functions" / "public.two.sql").is_file()
+        assert "One" in (tmp_path / "out" / "functions" / "public.one.sql").read_text()
+    finally:
+        psql(postgres, dbname, "DROP PUBLICATION IF EXISTS pub; DROP ACCESS METHOD IF EXISTS heap2; DROP OWNED BY cache_reader;")
+        psql(postgres, "postgres", "DROP ROLE cache_reader")
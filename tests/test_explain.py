@@ -0,0 +1,40 @@
+import os
+
+from conftest import fake_calls
+from pg_extractor import PGExtractor, PGExtractorOptions
+
+
+def test_explain_writes_nothing(run_extractor, fake_env, tmp_path):
+    before = sorted(os.listdir(str(tmp_path)))
+    result = run_extractor("--getall", "--explain", "--dump_cache=" + str(tmp_path / "cache"), "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    # Only the fakes' call log is new, and the temp dump is gone again
+    assert sorted(os.listdir(str(tmp_path))) == sorted(before + ["calls.log"])
+    assert "Estimated wall time with --jobs 1:" in result.stdout
+    assert len([c for c in fake_calls(fake_env, "pg_dump") if "--format=custom" in c]) == 1
+
+
+def test_explain_uses_current_dump_cache(run_extractor, fake_env, tmp_path):
+    cache_dir = tmp_path / "cache"
+    result = run_extractor("--getfuncs", "--dump_cache=" + str(cache_dir), "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    cache_files = sorted(os.listdir(str(cache_dir)))
+    result = run_extractor("--getfuncs", "--explain", "--dump_cache=" + str(cache_dir), "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    assert "Catalog unchanged. Reusing temp dump from --dump_cache" in result.stdout
+    assert sorted(os.listdir(str(cache_dir))) == cache_files
+
+
+def test_explain_returns_estimates(fake_env, tmp_path, monkeypatch):
+    # explain() sets the PG* variables of this process, so they are put back after the test
+    monkeypatch.setenv("PGDATABASE", "")
+    monkeypatch.chdir(str(tmp_path))
+    options = PGExtractorOptions(dbname="mydb", temp=str(tmp_path), getall=True, jobs=2, quiet=True)
+    result = PGExtractor().explain(options)
+    assert os.listdir(str(tmp_path)) == ["calls.log"]
+    assert result['object_counts']['FUNCTION'] > 0
+    assert result['files'] == sum(result['category_files'].values())
+    assert result['subprocesses'] > result['files']
+    assert result['temp_dump_bytes'] > 0 and result['temp_bytes'] >= result['temp_dump_bytes']
+    assert result['ddl_bytes'] > 0 and result['data_bytes'] == 0
+    assert result['wall_seconds'] >= result['dump_seconds']
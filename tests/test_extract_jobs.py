@@ -0,0 +1,17 @@
+import os
+import time
+
+
+def test_failed_job_stops_running_jobs(run_extractor, fake_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FAIL", "job_detail_p0")
+    monkeypatch.setenv("FAKE_SLEEP", "5")
+    basedir = tmp_path / "out"
+    start = time.time()
+    result = run_extractor("--getall", "--jobs=4", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 2
+    assert "query failed" in result.stdout
+    # The other jobs were stopped instead of being left to finish
+    assert time.time() - start < 5
+    time.sleep(1)
+    left_over = [os.path.join(d, f) for d, dirs, files in os.walk(basedir) for f in files if f.endswith(".tmp")]
+    assert left_over == []
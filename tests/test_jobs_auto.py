@@ -0,0 +1,73 @@
+import json
+import socket
+
+import pg_extractor
+from pg_extractor import ExtractResult, PGExtractor, PGExtractorOptions
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def start_tuner(monkeypatch, tmp_path, jobs):
+    clock = Clock()
+    monkeypatch.setattr(pg_extractor.time, "time", clock.time)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("PGHOST", "dbhost")
+    p = PGExtractor()
+    p.args = PGExtractorOptions(jobs=jobs)
+    p._tune_load()
+    p.tune_cpu_count = 8
+    p._throttle_start(jobs)
+    p._tune_start(jobs)
+    return p, clock
+
+
+def finish_window(p, clock, job_count, seconds):
+    clock.now += seconds
+    for i in range(job_count):
+        p._tune_jobs(ExtractResult("file" + str(i), 100, 0.1, None))
+
+
+def test_tuner_follows_throughput(monkeypatch, tmp_path):
+    p, clock = start_tuner(monkeypatch, tmp_path, 2)
+    monkeypatch.setattr(p, "_tune_child_cpu_time", lambda: None)
+    finish_window(p, clock, 4, 1)
+    assert p.throttle_max_jobs == 3
+    # Throughput went up, so keep going up
+    finish_window(p, clock, 6, 1)
+    assert p.throttle_max_jobs == 4
+    # Throughput dropped, so turn back
+    finish_window(p, clock, 8, 2)
+    assert p.throttle_max_jobs == 3
+    p._tune_save()
+    with open(str(tmp_path / ".pg_extractor_jobs.json")) as fh:
+        assert json.load(fh) == {socket.gethostname() + " dbhost": 3}
+    assert p._tune_load() == 3
+
+
+def test_tuner_backs_off_when_cpus_are_busy(monkeypatch, tmp_path):
+    p, clock = start_tuner(monkeypatch, tmp_path, 4)
+    # Children used 7.6 of the 8 CPUs
+    cpu_time = [0.0]
+    def child_cpu_time():
+        cpu_time[0] += 7.6
+        return cpu_time[0]
+    monkeypatch.setattr(p, "_tune_child_cpu_time", child_cpu_time)
+    p.tune_window_cpu = 0.0
+    finish_window(p, clock, 8, 1)
+    assert p.throttle_max_jobs == 3
+
+
+def test_jobs_auto_starts_with_saved_value(run_extractor, tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("PGHOST", "dbhost")
+    with open(str(tmp_path / ".pg_extractor_jobs.json"), "w") as fh:
+        json.dump({socket.gethostname() + " dbhost": 3, socket.gethostname() + " otherhost": 7}, fh)
+    result = run_extractor("--getall", "--jobs=auto", "--basedir=" + str(tmp_path / "out"))
+    assert result.returncode == 0, result.stdout
+    assert "Automatic --jobs: started with 3," in result.stdout
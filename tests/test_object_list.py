@@ -0,0 +1,20 @@
+import pg_extractor
+from pg_extractor import PGExtractor, PGObject
+
+
+def test_unknown_type_does_not_change_type_table():
+    type_list = pg_extractor.OBJECT_TYPES
+    o = PGObject("1; 0 0", objtype="PUBLICATION", objschema="-", objname="pub", objowner="keith")
+    assert o['objtype'] == "PUBLICATION"
+    assert o.objtype == "PUBLICATION"
+    assert dict(o) == {'objid': "1; 0 0", 'objtype': "PUBLICATION", 'objschema': "-", 'objname': "pub", 'objowner': "keith"}
+    assert pg_extractor.OBJECT_TYPES is type_list and "PUBLICATION" not in pg_extractor.OBJECT_TYPES
+    assert "PUBLICATION" not in pg_extractor.OBJECT_TYPE_CODES
+
+
+def test_object_list(fake_env, tmp_path):
+    object_list = PGExtractor().build_main_object_list(str(tmp_path / "dump.pgr"))
+    foo = [o for o in object_list if o.get('objname') == "foo(integer)" and o['objtype'] == "FUNCTION"][0]
+    assert dict(foo) == {'objid': "220; 1255 16395", 'objtype': "FUNCTION", 'objschema': "public", 'objname': "foo(integer)"
+        , 'objbasename': "foo", 'objowner': "keith"}
+    assert [o['objtype'] for o in object_list if o.get('objname') == "job_detail"][0] == "TABLE"
@@ -0,0 +1,19 @@
+import tarfile
+
+
+def test_archive_makes_no_output_folder(run_extractor, tmp_path):
+    archive = tmp_path / "ddl.tar"
+    result = run_extractor("--getall", "--getroles", "--plan", "--basedir=" + str(tmp_path / "out"), "--output_archive=" + str(archive), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert not (tmp_path / "out").exists()
+    with tarfile.open(str(archive)) as tar:
+        name_list = tar.getnames()
+    assert "functions/public.foo.sql" in name_list
+    assert "apply_plan.json" in name_list
+    assert "roles/keith.role.sql" in name_list
+
+
+def test_archive_keeps_state_files_in_basedir(run_extractor, tmp_path):
+    result = run_extractor("--getall", "--deadline=0", "--basedir=" + str(tmp_path / "out"), "--output_archive=" + str(tmp_path / "ddl.tar"), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert (tmp_path / "out" / "mydb" / ".pg_extractor_carryover").is_file()
@@ -0,0 +1,43 @@
+import json
+
+from conftest import fake_calls
+
+
+def read_plan(basedir):
+    with open(str(basedir / "mydb" / "apply_plan.json")) as fh:
+        return json.load(fh)
+
+
+def wave_of(plan, file_name):
+    return [i for i, wave in enumerate(plan['waves']) if file_name in wave][0]
+
+
+def test_plan_waves(run_extractor, tmp_path):
+    basedir = tmp_path / "out"
+    result = run_extractor("--getall", "--plan", "--basedir=" + str(basedir))
+    assert result.returncode == 0, result.stdout
+    assert "2 files of the apply plan have circular dependencies" in result.stdout
+    plan = read_plan(basedir)
+    assert plan['version'] == 1
+    file_list = [f for wave in plan['waves'] for f in wave]
+    assert len(file_list) == len(set(file_list))
+    # Every object comes after its schema, and partitions after their parent table
+    assert wave_of(plan, "schemata/public.sql") < wave_of(plan, "functions/public.foo.sql")
+    assert wave_of(plan, "schemata/public.sql") < wave_of(plan, "views/public.myview.sql")
+    assert wave_of(plan, "schemata/jobmon.sql") < wave_of(plan, "tables/jobmon.job_detail.sql")
+    assert wave_of(plan, "tables/jobmon.job_detail.sql") < wave_of(plan, "tables/jobmon.job_detail_p0.sql")
+    assert wave_of(plan, "tables/jobmon.job_detail.sql") < wave_of(plan, "tables/jobmon.job_detail_p10.sql")
+    # public.a and public.b have foreign keys to each other
+    assert sorted(plan['cycles']) == ["tables/public.a.sql", "tables/public.b.sql"]
+
+
+def test_apply_plan(run_extractor, fake_env, tmp_path):
+    basedir = tmp_path / "out"
+    result = run_extractor("--getall", "--plan", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    plan = read_plan(basedir)
+    result = run_extractor("--apply_plan=" + str(basedir / "mydb" / "apply_plan.json"), "--quiet")
+    assert result.returncode == 0, result.stdout
+    applied = [c[0][len("--file=" + str(basedir / "mydb") + "/"):] for c in fake_calls(fake_env, "psql")]
+    assert sorted(applied) == sorted(f for wave in plan['waves'] for f in wave)
+    assert [wave_of(plan, f) for f in applied] == sorted(wave_of(plan, f) for f in applied)
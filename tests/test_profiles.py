@@ -0,0 +1,13 @@
+from conftest import fake_calls
+
+
+def test_profiles_read_roles_once(run_extractor, fake_env, tmp_path):
+    profile_file = tmp_path / "profiles.ini"
+    profile_file.write_text("[full]\nbasedir = " + str(tmp_path / "full") + "\ngetall = true\ngetroles = true\n\n"
+        + "[public]\nbasedir = " + str(tmp_path / "public") + "\ngetroles = true\nremove_passwords = true\n")
+    result = run_extractor("--profiles=" + str(profile_file), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert len(fake_calls(fake_env, "pg_dumpall")) == 1
+    assert "PASSWORD 'md5abc'" in (tmp_path / "full" / "mydb" / "roles" / "keith.role.sql").read_text()
+    public_role = (tmp_path / "public" / "mydb" / "roles" / "keith.role.sql").read_text()
+    assert "CREATE ROLE keith;" in public_role and "md5abc" not in public_role
@@ -0,0 +1,25 @@
+import time
+
+
+def test_roles_split_statements(run_extractor, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_COMMENT_LINES", "3")
+    basedir = tmp_path / "out"
+    result = run_extractor("--getroles", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    keith = (basedir / "mydb" / "roles" / "keith.role.sql").read_text()
+    # The semicolons and quotes inside the comment don't end it
+    assert keith.endswith("COMMENT ON ROLE keith IS 'Owner;\n" + "it''s \"line\";\n" * 3 + "end';\n")
+    assert (basedir / "mydb" / "roles" / "My,20,Role.role.sql").read_text() == ("CREATE ROLE \"My Role\";\n"
+        + "ALTER ROLE \"My Role\" WITH NOSUPERUSER PASSWORD 'SCRAM-SHA-256$4096:xx';\nGRANT keith TO \"My Role\" GRANTED BY postgres;\n")
+    assert not (basedir / "mydb" / "roles" / "roles.sql").exists()
+
+
+def test_roles_long_statement(run_extractor, tmp_path, monkeypatch):
+    # Each line is only scanned once, so a statement of many lines takes no longer than the same number of statements
+    monkeypatch.setenv("FAKE_COMMENT_LINES", "200000")
+    basedir = tmp_path / "out"
+    start = time.time()
+    result = run_extractor("--getroles", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    assert time.time() - start < 20
+    assert (basedir / "mydb" / "roles" / "keith.role.sql").read_text().count("it''s \"line\";\n") == 200000
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+
+from conftest import fake_calls, psql, run_script
+
+
+def read_rows(chunk_dir):
+    with open(os.path.join(chunk_dir, "manifest.json")) as fh:
+        manifest = json.load(fh)
+    row_list = []
+    for chunk in manifest['chunks']:
+        with open(os.path.join(chunk_dir, chunk['file'])) as fh:
+            lines = fh.read().splitlines()
+        assert lines[1].startswith("COPY ") and lines[-1] == "\\."
+        row_list.extend(lines[2:-1])
+    return manifest, row_list
+
+
+def test_block_slices(run_extractor, fake_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ROWS", "100")
+    basedir = tmp_path / "out"
+    result = run_extractor("--gettables", "--getdata", "--table_slices=4", "--jobs=4", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    manifest, row_list = read_rows(str(basedir / "mydb" / "tables" / "jobmon.job_detail.chunks"))
+    assert [c['file'] for c in manifest['chunks']] == ["0001.copy", "0002.copy", "0003.copy", "0004.copy"]
+    assert manifest['chunks'][1]['range'] == "ctid >= '(25,0)'::pg_catalog.tid AND ctid < '(50,0)'::pg_catalog.tid"
+    # Every row is in exactly one slice
+    assert row_list == ["%d\tv%d" % (i, i) for i in range(1, 101)]
+    # The DDL and all slices are read in the same snapshot
+    ddl_call = [c for c in fake_calls(fake_env, "pg_dump") if '--table="jobmon"."job_detail"' in c][0]
+    assert "--snapshot=00000003-0000001B-1" in ddl_call
+    assert '--exclude-table-data="jobmon"."job_detail"' in ddl_call
+    slice_calls = [" ".join(c) for c in fake_calls(fake_env, "psql") if c[0].startswith("--command=BEGIN")]
+    assert len(slice_calls) == 8
+    assert all("SET TRANSACTION SNAPSHOT '00000003-0000001B-1'" in c for c in slice_calls)
+
+
+def test_key_slices_before_postgresql_14(run_extractor, fake_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ROWS", "100")
+    monkeypatch.setenv("FAKE_VERSION", "130000")
+    basedir = tmp_path / "out"
+    result = run_extractor("--gettables", "--getdata", "--table_slices=3", "--basedir=" + str(basedir), "--quiet")
+    assert result.returncode == 0, result.stdout
+    # public.b has an integer primary key, jobmon.job_detail has none and is not split
+    manifest, row_list = read_rows(str(basedir / "mydb" / "tables" / "public.b.chunks"))
+    assert [c['range'] for c in manifest['chunks']] == ['"id" < 34', '"id" >= 34 AND "id" < 67', '"id" >= 67']
+    assert row_list == ["%d\tv%d" % (i, i) for i in range(1, 101)]
+    assert not (basedir / "mydb" / "tables" / "jobmon.job_detail.chunks").exists()
+
+
+def test_slices_load_the_same(postgres, new_database, tmp_path):
+    source = new_database("source")
+    psql(postgres, source, "CREATE TABLE public.big (id integer PRIMARY KEY, v text, g integer GENERATED ALWAYS AS (id * 2) STORED);"
+        + " INSERT INTO public.big (id, v) SELECT i, pg_catalog.repeat('x', i % 50) FROM pg_catalog.generate_series(1, 20000) i;"
+        + " DELETE FROM public.big WHERE id % 7 = 0;")
+    basedir = tmp_path / "out"
+    result = run_script(postgres, ["--dbname=" + source, "--basedir=" + str(basedir), "--nodbnamedir", "--gettables", "--getdata"
+        , "--table_slices=3", "--slice_min_size=0", "--jobs=3", "--quiet"], cwd=str(tmp_path))
+    assert result.returncode == 0, result.stdout
+    chunk_dir = basedir / "tables" / "public.big.chunks"
+    assert sorted(os.listdir(str(chunk_dir))) == ["0001.copy", "0002.copy", "0003.copy", "manifest.json"]
+
+    target = new_database("target")
+    for f in [basedir / "tables" / "public.big.sql"] + [chunk_dir / c for c in ("0001.copy", "0002.copy", "0003.copy")]:
+        subprocess.check_output(["psql", "--no-psqlrc", "--quiet", "--set=ON_ERROR_STOP=1", "--dbname=" + target, "--file=" + str(f)]
+            , env=postgres, stderr=subprocess.STDOUT)
+    check_sql = "SELECT pg_catalog.count(*), pg_catalog.md5(pg_catalog.string_agg(b::text, ',' ORDER BY id)) FROM public.big b"
+    assert psql(postgres, target, check_sql) == psql(postgres, source, check_sql)
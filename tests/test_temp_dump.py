@@ -0,0 +1,25 @@
+from conftest import psql, run_script
+from pg_extractor import PGExtractor, PGExtractorOptions
+
+
+def test_table_filter_is_quoted(tmp_path):
+    include_file = tmp_path / "tables.txt"
+    include_file.write_text('public.we"ird\nmy"schema.orders\n')
+    p = PGExtractor()
+    p.args = PGExtractorOptions(gettables=True, getdata=True, getsequences=True, table_include_file=str(include_file))
+    option_list = [o for option_list, reason in p._plan_temp_dump() for o in option_list]
+    assert option_list == ['--exclude-table-data="public"."we""ird"', '--exclude-table-data="my""schema"."orders"']
+    p.args = PGExtractorOptions(gettables=True, table_include_file=str(include_file))
+    option_list = [o for option_list, reason in p._plan_temp_dump() for o in option_list]
+    assert option_list == ["--schema-only", '--table="public"."we""ird"', '--table="my""schema"."orders"']
+
+
+def test_table_with_quote_in_name(postgres, new_database, tmp_path):
+    dbname = new_database("source")
+    psql(postgres, dbname, 'CREATE TABLE public."we""ird" (id integer); CREATE TABLE public.other (id integer);')
+    basedir = tmp_path / "out"
+    result = run_script(postgres, ["--dbname=" + dbname, "--basedir=" + str(basedir), "--nodbnamedir", "--gettables"
+        , '--table_include=public.we"ird', "--quiet"], cwd=str(tmp_path))
+    assert result.returncode == 0, result.stdout
+    assert [f.name for f in (basedir / "tables").iterdir()] == ["public.we,22,ird.sql"]
+    assert 'CREATE TABLE public."we""ird"' in (basedir / "tables" / "public.we,22,ird.sql").read_text()